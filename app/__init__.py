@@ -5,6 +5,7 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from dotenv import load_dotenv
 
+from . import assets
 from .config import DevConfig, ProdConfig
 
 # Initialize extensions
@@ -35,11 +36,17 @@ def create_app(config_name: str | None = None) -> Flask:
 
     db.init_app(app)
     migrate.init_app(app, db)
+    assets.init_app(app)
 
-    # Ensure models loaded so tables can be created
-    from app import models  # noqa
+    # Importing schema loads the models so tables can be created
+    from app import schema
+    from app.estimates import totals as estimate_totals
+    from app.inventory import typeahead
     with app.app_context():
-        db.create_all()
+        # existing databases are changed by `flask schema upgrade`, run once
+        schema.create_or_check()
+        if app.config.get('TYPEAHEAD_ENABLED'):
+            typeahead.rebuild()
 
     @app.route('/')
     def index():
@@ -54,11 +61,23 @@ def create_app(config_name: str | None = None) -> Flask:
         return render_template('errors/500.html'), 500
 
     from app.bundles.routes import bp as bundles_bp
+    from app.estimates import push as estimate_push
     from app.estimates.routes import bp as estimates_bp
     from app.integrations.repairshopr_export import rs_export_cli
+    from app.integrations.repairshopr_sync import rs_sync_cli
+    from app.integrations.repairshopr_webhooks import bp as rs_webhooks_bp
+    from app.integrations.repairshopr_webhooks import rs_webhook_cli
 
     app.register_blueprint(bundles_bp, url_prefix='/bundles')
     app.register_blueprint(estimates_bp, url_prefix='/estimates')
+    app.register_blueprint(rs_webhooks_bp, url_prefix='/webhooks/repairshopr')
+    estimate_push.init_app(app)
     app.cli.add_command(rs_export_cli)
+    app.cli.add_command(rs_sync_cli)
+    app.cli.add_command(rs_webhook_cli)
+    app.cli.add_command(estimate_totals.estimates_cli)
+    app.cli.add_command(estimate_push.push_jobs_cli)
+    app.cli.add_command(assets.assets_cli)
+    app.cli.add_command(schema.schema_cli)
 
     return app
@@ -0,0 +1,281 @@
+"""Caching for RepairShopr lookups.
+
+:class:`SearchCache` implements TTL and stale-while-revalidate semantics on
+top of a storage backend.  :class:`MemoryBackend` keeps entries in the
+current process; :class:`SQLiteBackend` stores them in a file shared by
+every worker on the host, so an entry fetched by one gunicorn worker is
+warm for all of them and survives worker restarts.  ``RS_CACHE_BACKEND``
+(``memory`` or ``sqlite``) picks the backend used by :func:`make_backend`.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from cachetools import TTLCache
+
+logger = logging.getLogger(__name__)
+
+CACHE_BACKEND = os.getenv("RS_CACHE_BACKEND", "memory")
+CACHE_PATH = os.getenv("RS_CACHE_PATH") or os.path.join(
+    os.path.dirname(__file__), "..", "..", "instance", "rs_cache.sqlite"
+)
+
+
+def normalize_query(query) -> str:
+    """Collapse whitespace and case so equivalent searches share a key."""
+    return " ".join(str(query or "").split()).casefold()
+
+
+def query_matches(key: str, *texts) -> bool:
+    """True if every word of the normalised query ``key`` occurs in ``texts``.
+
+    A loose test (substrings, any field) used to find the cached searches a
+    changed record might now appear in or drop out of.
+    """
+    haystack = normalize_query(" ".join(str(t) for t in texts if t))
+    return all(word in haystack for word in key.split())
+
+
+class MemoryBackend:
+    """Per-process LRU store with TTL expiry."""
+
+    def __init__(self, maxsize: int, max_age: float, timer=time.time) -> None:
+        self.maxsize = maxsize
+        self._data = TTLCache(maxsize=maxsize, ttl=max_age, timer=timer)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            return self._data.get(key)
+
+    def set(self, key, value, stored_at: float) -> None:
+        with self._lock:
+            self._data[key] = (value, stored_at)
+
+    def delete(self, key) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def items(self) -> list:
+        """``(key, value)`` of every live entry."""
+        with self._lock:
+            return [(k, v[0]) for k, v in self._data.items()]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def size(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+
+class SQLiteBackend:
+    """Store shared between processes through an on-disk SQLite file.
+
+    Values must be JSON serialisable.  Each namespace carries a generation
+    number; :meth:`clear` bumps it, which every process sees on its next
+    read, and rows from older generations are purged lazily on write.  The
+    oldest entries are evicted once a namespace exceeds ``maxsize``.
+    """
+
+    def __init__(self, path: str, namespace: str, maxsize: int, max_age: float) -> None:
+        self.path = os.path.abspath(path)
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self.max_age = max_age
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entry ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                "stored_at REAL NOT NULL, generation INTEGER NOT NULL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_cache_entry_age "
+                "ON cache_entry (namespace, stored_at)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_generation ("
+                "namespace TEXT PRIMARY KEY, generation INTEGER NOT NULL)"
+            )
+            conn.execute(
+                "INSERT OR IGNORE INTO cache_generation VALUES (?, 0)",
+                (self.namespace,),
+            )
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute(
+            "SELECT e.value, e.stored_at FROM cache_entry e "
+            "JOIN cache_generation g ON g.namespace = e.namespace "
+            "AND g.generation = e.generation "
+            "WHERE e.namespace = ? AND e.key = ? AND e.stored_at > ?",
+            (self.namespace, key, time.time() - self.max_age),
+        ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, key, value, stored_at: float) -> None:
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entry "
+                "SELECT ?, ?, ?, ?, generation FROM cache_generation WHERE namespace = ?",
+                (self.namespace, key, json.dumps(value), stored_at, self.namespace),
+            )
+            conn.execute(
+                "DELETE FROM cache_entry WHERE namespace = ? AND (stored_at <= ? "
+                "OR generation < (SELECT generation FROM cache_generation "
+                "WHERE namespace = ?))",
+                (self.namespace, time.time() - self.max_age, self.namespace),
+            )
+            conn.execute(
+                "DELETE FROM cache_entry WHERE namespace = ? AND key IN ("
+                "SELECT key FROM cache_entry WHERE namespace = ? "
+                "ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                (self.namespace, self.namespace, self.maxsize),
+            )
+
+    def delete(self, key) -> None:
+        self._conn().execute(
+            "DELETE FROM cache_entry WHERE namespace = ? AND key = ?",
+            (self.namespace, key),
+        )
+
+    def items(self) -> list:
+        rows = self._conn().execute(
+            "SELECT e.key, e.value FROM cache_entry e JOIN cache_generation g "
+            "ON g.namespace = e.namespace AND g.generation = e.generation "
+            "WHERE e.namespace = ? AND e.stored_at > ?",
+            (self.namespace, time.time() - self.max_age),
+        ).fetchall()
+        return [(key, json.loads(value)) for key, value in rows]
+
+    def clear(self) -> None:
+        self._conn().execute(
+            "UPDATE cache_generation SET generation = generation + 1 WHERE namespace = ?",
+            (self.namespace,),
+        )
+
+    def size(self) -> int:
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM cache_entry e JOIN cache_generation g "
+            "ON g.namespace = e.namespace AND g.generation = e.generation "
+            "WHERE e.namespace = ? AND e.stored_at > ?",
+            (self.namespace, time.time() - self.max_age),
+        ).fetchone()[0]
+
+
+def make_backend(namespace: str, maxsize: int, max_age: float):
+    """Build the backend selected by ``RS_CACHE_BACKEND``."""
+    if CACHE_BACKEND == "sqlite":
+        return SQLiteBackend(CACHE_PATH, namespace, maxsize, max_age)
+    return MemoryBackend(maxsize, max_age)
+
+
+class SearchCache:
+    """Bounded cache with TTL expiry and stale-while-revalidate reads.
+
+    Entries are fresh for ``ttl`` seconds.  For a further ``stale_ttl``
+    seconds they are still served, but the first stale read schedules a
+    background refresh so the next caller gets current data.  After that
+    the entry is dropped and the next read is a plain miss.  Storage is
+    delegated to ``backend`` (an in-process LRU by default).
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 256,
+        ttl: float = 60,
+        stale_ttl: float = 300,
+        timer=time.time,
+        backend=None,
+    ) -> None:
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.timer = timer
+        self.backend = backend or MemoryBackend(maxsize, ttl + stale_ttl, timer)
+        self._lock = threading.Lock()
+        self._refreshing: set = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    def lookup(self, key, refresh=None):
+        """Return ``(found, value)`` for ``key``.
+
+        ``refresh`` is a zero-argument callable run on a background thread
+        when a stale entry is served; it is expected to call :meth:`set`.
+        """
+        now = self.timer()
+        entry = self.backend.get(key)
+        with self._lock:
+            if entry is None or now - entry[1] >= self.ttl + self.stale_ttl:
+                self.misses += 1
+                return False, None
+            value, stored_at = entry
+            if now - stored_at < self.ttl:
+                self.hits += 1
+                return True, value
+            self.stale_hits += 1
+            start = refresh is not None and key not in self._refreshing
+            if start:
+                self._refreshing.add(key)
+        if start:
+            threading.Thread(
+                target=self._run_refresh, args=(key, refresh), daemon=True
+            ).start()
+        return True, value
+
+    def _run_refresh(self, key, refresh) -> None:
+        try:
+            refresh()
+            self.refreshes += 1
+        except Exception:  # keep serving the stale copy
+            logger.exception("Background refresh failed for %r", key)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def set(self, key, value) -> None:
+        self.backend.set(key, value, self.timer())
+
+    def invalidate(self, key) -> None:
+        self.backend.delete(key)
+
+    def invalidate_where(self, predicate) -> int:
+        """Drop entries for which ``predicate(key, value)`` is true; returns the count."""
+        stale = [key for key, value in self.backend.items() if predicate(key, value)]
+        for key in stale:
+            self.backend.delete(key)
+        return len(stale)
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self.backend).__name__,
+            "size": self.backend.size(),
+            "maxsize": self.backend.maxsize,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+        }
@@ -1,56 +1,232 @@
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
+from requests.adapters import HTTPAdapter
 from requests.exceptions import HTTPError, RequestException
 
+from app.api.cache import SearchCache, make_backend, normalize_query, query_matches
+from app.api.singleflight import SingleFlight
+from app.integrations import repairshopr_export as rs_export
+
 API_URL = os.getenv('REPAIRSHOPR_API_URL') or \
           f"https://{os.getenv('REPAIRSHOPR_SUBDOMAIN')}.repairshopr.com/api/v1"
 API_KEY = os.getenv('REPAIRSHOPR_API_KEY')
 
+# (connect, read) timeouts so a hung RepairShopr call can't pin a worker.
+TIMEOUT = (
+    float(os.getenv('RS_CONNECT_TIMEOUT', '3.05')),
+    float(os.getenv('RS_READ_TIMEOUT', '10')),
+)
+POOL_SIZE = int(os.getenv('RS_POOL_SIZE', '4'))
+
+_local = threading.local()
+
+# Identical concurrent lookups (same endpoint and params, or the same
+# normalised product search) share one upstream call.
+_flight = SingleFlight()
+
+
+def _session():
+    """Return this thread's keep-alive session.
+
+    ``requests.Session`` isn't safe to share between threads, so each thread
+    (request worker or lookup pool thread) gets its own with a small
+    connection pool that survives across calls.
+    """
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({
+            'Authorization': f'Bearer {API_KEY}',
+            'Accept': 'application/json',
+        })
+        _local.session = session
+    return session
+
+
+def _request(method, path, **kwargs):
+    """Issue one rate-limited API call and return the decoded JSON body.
+
+    Every call draws from the process-wide token bucket shared with the
+    exporter.  Concurrent GETs for the same path and params are coalesced
+    into a single call whose result every waiter shares, so callers must not
+    mutate the returned payload.  HTTP and network errors propagate to the
+    caller.
+    """
+    def call():
+        rs_export.bucket.acquire()
+        resp = _session().request(
+            method, f"{API_URL}{path}", timeout=TIMEOUT, **kwargs
+        )
+        resp.raise_for_status()
+        return resp.json()
+
+    if method != 'GET':
+        return call()
+    params = kwargs.get('params') or {}
+    key = ('GET', path, tuple(sorted((k, str(v)) for k, v in params.items())))
+    return _flight.do(key, call)
+
+
+def request_stats():
+    """Counters for upstream calls made and concurrent duplicates coalesced."""
+    return _flight.stats()
+
+# Product searches are cached per normalised query.  Fresh entries are served
+# directly; stale ones are served while a background refresh runs.  Set
+# RS_CACHE_BACKEND=sqlite to share the cache between gunicorn workers.
+SEARCH_CACHE_SIZE = int(os.getenv('RS_SEARCH_CACHE_SIZE', '512'))
+SEARCH_CACHE_TTL = float(os.getenv('RS_SEARCH_CACHE_TTL', '60'))
+SEARCH_CACHE_STALE = float(os.getenv('RS_SEARCH_CACHE_STALE', '300'))
+product_cache = SearchCache(
+    ttl=SEARCH_CACHE_TTL,
+    stale_ttl=SEARCH_CACHE_STALE,
+    backend=make_backend(
+        'products', SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL + SEARCH_CACHE_STALE
+    ),
+)
+
+
 def get_products(query):
     """Returns a list of product dicts from RepairShopr matching ``query``.
 
+    Results are served from :data:`product_cache` when possible.  Only
+    complete result sets are cached so a transient API failure is retried on
+    the next search rather than remembered.
+    """
+    query = " ".join(str(query or "").split())
+    key = normalize_query(query)
+    found, cached = product_cache.lookup(
+        key, refresh=lambda: _refresh_products(key, query)
+    )
+    if found:
+        return list(cached)
+    return list(_flight.do(('search', key), lambda: _refresh_products(key, query)))
+
+
+def _refresh_products(key, query):
+    results, complete = _fetch_products(query)
+    if complete:
+        product_cache.set(key, results)
+    return results
+
+
+def invalidate_products(query=None):
+    """Drop the cached results for ``query``, or every search if omitted."""
+    if query is None:
+        product_cache.clear()
+    else:
+        product_cache.invalidate(normalize_query(query))
+
+
+def _lists_id(results, record_id) -> bool:
+    return isinstance(results, list) and any(
+        isinstance(r, dict) and r.get('id') == record_id for r in results
+    )
+
+
+def invalidate_product(record_id, *texts) -> int:
+    """Drop cached searches a change to product ``record_id`` may affect.
+
+    That is searches whose results include it, and searches whose query
+    matches ``texts`` (its old and new name, SKU and so on).
+    """
+    return product_cache.invalidate_where(
+        lambda key, results: _lists_id(results, record_id) or query_matches(key, *texts)
+    )
+
+
+# Customer searches and lookups the local mirror couldn't answer.
+CUSTOMER_CACHE_TTL = float(os.getenv('RS_CUSTOMER_CACHE_TTL', '120'))
+CUSTOMER_CACHE_STALE = float(os.getenv('RS_CUSTOMER_CACHE_STALE', '600'))
+customer_cache = SearchCache(
+    ttl=CUSTOMER_CACHE_TTL,
+    stale_ttl=CUSTOMER_CACHE_STALE,
+    backend=make_backend(
+        'customers', SEARCH_CACHE_SIZE, CUSTOMER_CACHE_TTL + CUSTOMER_CACHE_STALE
+    ),
+)
+
+
+def product_cache_stats():
+    return product_cache.stats()
+
+
+# Search fields queried for every product lookup.  The RepairShopr API
+# supports searching by different fields depending on the parameter name;
+# to keep the search fast we limit lookups to name and SKU only.
+PRODUCT_SEARCH_FIELDS = ('name', 'sku')
+
+# The per-field lookups run concurrently so a search costs one round-trip.
+_lookup_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv('RS_LOOKUP_WORKERS', '4')),
+    thread_name_prefix='rs-lookup',
+)
+
+
+def _fetch_products(query):
+    """Query RepairShopr directly and return ``(products, complete)``.
+
     RepairShopr's product endpoint can search by different fields (name,
     description, SKU, etc.).  To make our search more forgiving we attempt all
-    of these lookups and merge the unique results.  If one lookup fails we log
-    the error and continue trying the others so a partial failure doesn't
-    prevent returning results.
+    of these lookups in parallel and merge the unique results in field order.
+    If one lookup fails we log the error and keep the others so a partial
+    failure doesn't prevent returning results; ``complete`` is then ``False``.
     """
-    headers = {
-        'Authorization': f'Bearer {API_KEY}',
-        'Accept': 'application/json'
-    }
+    futures = [
+        _lookup_pool.submit(_fetch_product_list, {field: query})
+        for field in PRODUCT_SEARCH_FIELDS
+    ]
 
     results = []
     seen_ids = set()
+    complete = True
+    for future in futures:
+        products = future.result()
+        if products is None:
+            complete = False
+            continue
+        for p in products:
+            pid = p.get('id')
+            if pid not in seen_ids:
+                results.append(p)
+                seen_ids.add(pid)
 
-    # Try multiple search parameter variations.  The RepairShopr API supports
-    # searching by different fields depending on the parameter name.  To keep
-    # the search fast we limit lookups to name and SKU only.
-    param_sets = [
-        {'name': query},  # explicit name search
-        {'sku': query},   # SKU lookup
-    ]
+    return results, complete
 
-    for params in param_sets:
-        try:
-            resp = requests.get(f"{API_URL}/products", params=params, headers=headers)
-            resp.raise_for_status()
-            payload = resp.json()
-            products = payload.get('products', payload) or []
-            for p in products:
-                pid = p.get('id')
-                if pid not in seen_ids:
-                    results.append(p)
-                    seen_ids.add(pid)
-        except HTTPError as e:
-            if e.response.status_code == 401:
-                print("🚨 401 Unauthorized from RepairShopr. Check your API key.")
-            else:
-                print(f"⚠️ RepairShopr API error ({e.response.status_code}): {e}")
-        except RequestException as e:
-            print(f"⚠️ RepairShopr network error: {e}")
 
-    return results
+def _fetch_product_list(params):
+    """Run one ``/products`` lookup; ``None`` signals a failed request."""
+    try:
+        payload = _request('GET', '/products', params=params)
+        return payload.get('products', payload) or []
+    except HTTPError as e:
+        if e.response.status_code == 401:
+            print("🚨 401 Unauthorized from RepairShopr. Check your API key.")
+        else:
+            print(f"⚠️ RepairShopr API error ({e.response.status_code}): {e}")
+    except RequestException as e:
+        print(f"⚠️ RepairShopr network error: {e}")
+    return None
+
+def summarize_product(p):
+    """Trim a raw product payload to the fields the pickers display."""
+    desc = (p.get('description') or '').strip()
+    if len(desc) > 100:
+        desc = desc[:100] + '…'
+    return {
+        'id':            p['id'],
+        'name':          p.get('name'),
+        'description':   desc,
+        'price_cost':    float(p.get('price_cost') or 0),
+        'price_retail':  float(p.get('price_retail') or 0),
+        'quantity':      float(p.get('quantity') or 0)
+    }
 
 def search_products(query):
     """
@@ -58,70 +234,92 @@ def search_products(query):
       id, name, description (<=100 chars), price_cost, price_retail, quantity
     """
     raw = get_products(query) or []
-    out = []
-    for p in raw:
-        desc = (p.get('description') or '').strip()
-        if len(desc) > 100:
-            desc = desc[:100] + '…'
-        out.append({
-            'id':            p['id'],
-            'name':          p.get('name'),
-            'description':   desc, 
-            'price_cost':    float(p.get('price_cost', 0)),    # cost :contentReference[oaicite:1]{index=1}
-            'price_retail':  float(p.get('price_retail', 0)),  # retail :contentReference[oaicite:2]{index=2}
-            'quantity':      float(p.get('quantity', 0))
-        })
-    return out
+    return [summarize_product(p) for p in raw]
 
-def search_customers(query):
-    """Search customers by name or email."""
-    headers = {
-        'Authorization': f'Bearer {API_KEY}',
-        'Accept': 'application/json'
-    }
+def get_product(product_id):
+    """Fetch a single product by its RepairShopr id."""
     try:
-        resp = requests.get(f"{API_URL}/customers", params={'search': query}, headers=headers)
-        resp.raise_for_status()
-        payload = resp.json()
-        return payload.get('customers', payload)
+        payload = _request('GET', f'/products/{product_id}')
+        return payload.get('product')
     except HTTPError as e:
         print(f"⚠️ RepairShopr API error ({e.response.status_code}): {e}")
     except RequestException as e:
         print(f"⚠️ RepairShopr network error: {e}")
-    return []
+    return None
+
+def search_customers(query):
+    """Search customers by name or email.
+
+    Successful results are cached per normalised query in
+    :data:`customer_cache`; failures return ``[]`` and are not cached.
+    """
+    key = f"search:{normalize_query(query)}"
+
+    def load():
+        try:
+            payload = _request('GET', '/customers', params={'search': query})
+        except HTTPError as e:
+            print(f"⚠️ RepairShopr API error ({e.response.status_code}): {e}")
+            return None
+        except RequestException as e:
+            print(f"⚠️ RepairShopr network error: {e}")
+            return None
+        customers = payload.get('customers', payload)
+        customer_cache.set(key, customers)
+        return customers
+
+    found, cached = customer_cache.lookup(key, refresh=load)
+    if found:
+        return cached
+    return load() or []
+
 
 def get_customer(customer_id):
     """Fetch a single customer's full details."""
-    headers = {
-        'Authorization': f'Bearer {API_KEY}',
-        'Accept': 'application/json'
-    }
-    try:
-        resp = requests.get(f"{API_URL}/customers/{customer_id}", headers=headers)
-        resp.raise_for_status()
-        payload = resp.json()
-        return payload.get('customer')
-    except HTTPError as e:
-        print(f"⚠️ RepairShopr API error ({e.response.status_code}): {e}")
-    except RequestException as e:
-        print(f"⚠️ RepairShopr network error: {e}")
-    return None
+    key = f"id:{customer_id}"
+
+    def load():
+        try:
+            payload = _request('GET', f'/customers/{customer_id}')
+        except HTTPError as e:
+            print(f"⚠️ RepairShopr API error ({e.response.status_code}): {e}")
+            return None
+        except RequestException as e:
+            print(f"⚠️ RepairShopr network error: {e}")
+            return None
+        customer = payload.get('customer')
+        if customer is not None:
+            customer_cache.set(key, customer)
+        return customer
+
+    found, cached = customer_cache.lookup(key, refresh=load)
+    if found:
+        return cached
+    return load()
+
+
+def invalidate_customers():
+    """Drop every cached customer search and lookup."""
+    customer_cache.clear()
+
+
+def invalidate_customer(record_id, *texts) -> int:
+    """Drop the cached lookup of customer ``record_id`` and the searches it may affect."""
+    def affected(key, value):
+        if key == f"id:{record_id}":
+            return True
+        if not key.startswith("search:"):
+            return False
+        return _lists_id(value, record_id) or query_matches(key[len("search:"):], *texts)
+    return customer_cache.invalidate_where(affected)
 
 
 def get_last_estimate():
     """Return the most recently created estimate from RepairShopr."""
-    headers = {
-        'Authorization': f'Bearer {API_KEY}',
-        'Accept': 'application/json'
-    }
     try:
-        resp = requests.get(
-            f"{API_URL}/estimates",
-            params={'per_page': 1, 'sort': 'id DESC'},
-            headers=headers,
+        payload = _request(
+            'GET', '/estimates', params={'per_page': 1, 'sort': 'id DESC'}
         )
-        resp.raise_for_status()
-        payload = resp.json()
         ests = payload.get('estimates') or payload.get('data') or []
         return ests[0] if ests else None
     except HTTPError as e:
@@ -131,13 +329,16 @@ def get_last_estimate():
     return None
 
 
+class EstimateNumberTaken(Exception):
+    """RepairShopr refused an estimate because its number is already used."""
+
+
 def create_estimate(customer_id, line_items, number=None):
-    """Create a new estimate with ``line_items`` in RepairShopr."""
-    headers = {
-        'Authorization': f'Bearer {API_KEY}',
-        'Accept': 'application/json',
-        'Content-Type': 'application/json',
-    }
+    """Create a new estimate with ``line_items`` in RepairShopr.
+
+    Raises :class:`EstimateNumberTaken` when ``number`` is rejected as a
+    duplicate; other errors are reported and return ``None``.
+    """
     payload = {
         'estimate': {
             'customer_id': customer_id,
@@ -147,11 +348,13 @@ def create_estimate(customer_id, line_items, number=None):
     if number is not None:
         payload['estimate']['number'] = number
     try:
-        resp = requests.post(f"{API_URL}/estimates", headers=headers, json=payload)
-        resp.raise_for_status()
-        data = resp.json()
+        data = _request('POST', '/estimates', json=payload)
         return data.get('estimate', data)
     except HTTPError as e:
+        resp = e.response
+        if (number is not None and resp is not None and resp.status_code == 422
+                and 'number' in (resp.text or '').lower()):
+            raise EstimateNumberTaken(number) from e
         print(f"⚠️ RepairShopr API error ({e.response.status_code}): {e}")
     except RequestException as e:
         print(f"⚠️ RepairShopr network error: {e}")
@@ -0,0 +1,162 @@
+"""Static asset fingerprinting and response compression.
+
+* ``url_for('static', ...)`` gains a ``v=<content hash>`` argument, so every
+  template emits a URL that changes whenever the file does.  Requests that
+  carry the current hash are served with a one-year ``immutable`` cache
+  lifetime; anything else falls back to normal revalidation.
+* ``flask assets precompress`` (``make assets``) writes ``.gz`` and, when
+  the optional ``brotli`` package is installed, ``.br`` copies of the CSS
+  and JS next to the originals.  The static view serves those to clients
+  that accept them, so assets are never compressed per request.
+* HTML and JSON responses of at least ``COMPRESS_MIN_SIZE`` bytes (default
+  1024) are compressed on the fly with brotli or gzip at a fast level.
+  Compressed responses get ``Vary: Accept-Encoding`` and a weak ETag.
+"""
+import gzip
+import hashlib
+import os
+
+import click
+from flask import current_app, request, send_from_directory
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "5"))
+BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "4"))
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+DYNAMIC_TYPES = {"application/json", "text/html"}
+STATIC_EXTENSIONS = (".css", ".js")
+SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+_hashes = {}  # path -> (mtime, hash)
+
+
+def asset_hash(static_folder: str, filename: str):
+    """Short content hash of a static file (``None`` if it doesn't exist)."""
+    path = os.path.join(static_folder, filename)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    cached = _hashes.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(path, "rb") as fh:
+        digest = hashlib.sha256(fh.read()).hexdigest()[:12]
+    _hashes[path] = (mtime, digest)
+    return digest
+
+
+def _encodings():
+    """Acceptable content codings in order of preference."""
+    accepted = request.accept_encodings
+    return [e for e in ("br", "gzip")
+            if (e != "br" or brotli is not None) and accepted[e]]
+
+
+def compress(data: bytes, encoding: str, precompress: bool = False) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=11 if precompress else BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=9 if precompress else GZIP_LEVEL, mtime=0)
+
+
+def _is_fresh(source: str, packed: str) -> bool:
+    """True if ``packed`` was written by :func:`precompress` from ``source`` as it is now."""
+    try:
+        return os.stat(packed).st_mtime_ns == os.stat(source).st_mtime_ns
+    except OSError:
+        return False
+
+
+def _static_view(app):
+    def static(filename):
+        encodings = _encodings() if filename.endswith(STATIC_EXTENSIONS) else []
+        for encoding in encodings:
+            packed = filename + SUFFIXES[encoding]
+            if _is_fresh(os.path.join(app.static_folder, filename),
+                         os.path.join(app.static_folder, packed)):
+                mimetype = "text/css" if filename.endswith(".css") else "text/javascript"
+                resp = send_from_directory(app.static_folder, packed, mimetype=mimetype)
+                resp.headers["Content-Encoding"] = encoding
+                break
+        else:
+            resp = app.send_static_file(filename)
+        resp.vary.add("Accept-Encoding")
+        version = request.args.get("v")
+        if version and version == asset_hash(app.static_folder, filename):
+            resp.headers["Cache-Control"] = IMMUTABLE
+            resp.expires = None
+        return resp
+    return static
+
+
+def _compress_response(resp):
+    if (resp.status_code != 200 or resp.direct_passthrough or resp.is_streamed
+            or "Content-Encoding" in resp.headers
+            or resp.mimetype not in DYNAMIC_TYPES):
+        return resp
+    data = resp.get_data()
+    if len(data) < MIN_SIZE:
+        return resp
+    encodings = _encodings()
+    resp.vary.add("Accept-Encoding")
+    if not encodings:
+        return resp
+    resp.set_data(compress(data, encodings[0]))
+    resp.headers["Content-Encoding"] = encodings[0]
+    etag, weak = resp.get_etag()
+    if etag and not weak:
+        resp.set_etag(etag, weak=True)
+    return resp
+
+
+def init_app(app) -> None:
+    @app.url_defaults
+    def _fingerprint(endpoint, values):
+        if endpoint == "static" and "filename" in values and "v" not in values:
+            digest = asset_hash(app.static_folder, values["filename"])
+            if digest:
+                values["v"] = digest
+
+    app.view_functions["static"] = _static_view(app)
+    app.after_request(_compress_response)
+
+
+def precompress(static_folder: str) -> list:
+    """Write compressed copies of every CSS/JS file; returns the files written."""
+    written = []
+    encodings = ["gzip"] + (["br"] if brotli is not None else [])
+    for root, _, files in os.walk(static_folder):
+        for name in files:
+            if not name.endswith(STATIC_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            with open(path, "rb") as fh:
+                data = fh.read()
+            for encoding in encodings:
+                target = path + SUFFIXES[encoding]
+                with open(target, "wb") as fh:
+                    fh.write(compress(data, encoding, precompress=True))
+                # stamped with the source's mtime so edits make it stale
+                st = os.stat(path)
+                os.utime(target, ns=(st.st_atime_ns, st.st_mtime_ns))
+                written.append(target)
+    return written
+
+
+@click.group("assets")
+def assets_cli() -> None:
+    """Static asset commands."""
+
+
+@assets_cli.command("precompress")
+def precompress_command() -> None:
+    """Write .gz (and .br) copies of the CSS and JS for the static view."""
+    written = precompress(current_app.static_folder)
+    click.echo(f"Wrote {len(written)} compressed assets"
+               + ("" if brotli is not None else " (gzip only; install brotli for .br)"))
@@ -0,0 +1,197 @@
+"""Versioned cache of serialized bundles.
+
+Every bundle carries a ``version`` that is replaced in the same transaction
+as any change to it or its items, including its creation.  Versions are
+drawn from one database-wide counter rather than counted per bundle, so a
+``(bundle_id, version)`` pair is never reused, not even when a deleted
+bundle's id is handed to a new one.  Serialized bundles (the search summary
+and the clone item list) are kept in a per-process LRU keyed by that pair,
+so a request only has to read the current versions to know which cached
+payloads are still valid; stale ones simply stop being hit and age out.
+Misses are built from plain column rows, never ORM objects.  Bulk writes
+that bypass the ORM must call :func:`bump_versions`.
+"""
+import logging
+import os
+import threading
+
+from cachetools import LRUCache
+from sqlalchemy import event, func, insert, inspect, select, text, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
+
+from app import db
+from app.models import Bundle, BundleItem, BundleVersionCounter
+
+logger = logging.getLogger(__name__)
+
+CACHE_SIZE = int(os.getenv("BUNDLE_CACHE_SIZE", "512"))
+
+_cache = LRUCache(maxsize=CACHE_SIZE)
+_lock = threading.Lock()
+
+_HEAD_COLUMNS = (Bundle.id, Bundle.version, Bundle.name, Bundle.description)
+_ITEM_COLUMNS = (
+    BundleItem.bundle_id, BundleItem.id, BundleItem.product_id, BundleItem.product_name,
+    BundleItem.description, BundleItem.quantity, BundleItem.unit_price, BundleItem.retail,
+)
+
+
+_counter = BundleVersionCounter.__table__
+
+
+def _next_version(connection) -> int:
+    """Advance the version counter and return its new value."""
+    value = connection.execute(
+        update(_counter).where(_counter.c.id == 1)
+        .values(value=_counter.c.value + 1).returning(_counter.c.value)
+    ).scalar()
+    if value is None:  # first use: start above every version already stored
+        connection.execute(insert(_counter).from_select(
+            ["id", "value"],
+            select(1, func.coalesce(func.max(Bundle.__table__.c.version), 0) + 1),
+        ))
+        value = connection.execute(select(_counter.c.value)).scalar()
+    return value
+
+
+def bump_versions(connection, bundle_ids) -> None:
+    ids = sorted({i for i in bundle_ids if i is not None})
+    if ids:
+        connection.execute(
+            update(Bundle.__table__)
+            .where(Bundle.__table__.c.id.in_(ids))
+            .values(version=_next_version(connection))
+        )
+
+
+@event.listens_for(Session, "after_flush")
+def _collect(session, flush_context):
+    touched = session.info.setdefault("bundle_versions", set())
+    touched.update(obj.id for obj in session.new if isinstance(obj, Bundle))
+    for obj in (*session.dirty, *session.deleted):
+        if isinstance(obj, Bundle) and session.is_modified(obj, include_collections=False):
+            touched.add(obj.id)
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, BundleItem):
+            touched.add(obj.bundle_id)
+            touched.update(inspect(obj).attrs.bundle_id.history.deleted or ())
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def _apply(session, flush_context):
+    touched = session.info.pop("bundle_versions", None)
+    if not touched:
+        return
+    bump_versions(session.connection(), touched)
+    for bundle_id in touched - {None}:
+        obj = session.identity_map.get(identity_key(Bundle, bundle_id))
+        if obj is not None:
+            session.expire(obj, ["version"])
+
+
+def ensure_version_column() -> None:
+    """Add ``bundle.version`` to databases that predate it."""
+    with db.engine.begin() as conn:
+        existing = {c["name"] for c in inspect(conn).get_columns("bundle")}
+        if "version" in existing:
+            return
+        conn.execute(text("ALTER TABLE bundle ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+    logger.info("Added bundle version column")
+
+
+def _build(heads) -> dict:
+    """Serialize bundles from ``(id, version, name, description)`` rows."""
+    items = {h.id: [] for h in heads}
+    rows = db.session.query(*_ITEM_COLUMNS) \
+        .filter(BundleItem.bundle_id.in_(items)).order_by(BundleItem.id)
+    for r in rows:
+        items[r.bundle_id].append({
+            'id'          : r.id,
+            'product_id'  : r.product_id,
+            'name'        : r.product_name,
+            'description' : r.description or '',
+            'quantity'    : r.quantity,
+            'unit_price'  : r.unit_price,
+            'retail'      : r.retail,
+            'type'        : 'product',
+        })
+    built = {}
+    for h in heads:
+        lines = items[h.id]
+        built[h.id] = {
+            'summary': {
+                'id'          : h.id,
+                'name'        : h.name,
+                'description' : (h.description or '')[:100],
+                'cost'        : float(sum(i['unit_price'] or 0 for i in lines)),
+                'retail'      : float(sum(i['retail'] or 0 for i in lines)),
+                'type'        : 'bundle',
+            },
+            'items': lines,
+        }
+    return built
+
+
+def payloads(heads) -> dict:
+    """``{bundle_id: payload}`` for ``(id, version, name, description)`` rows.
+
+    A payload is ``{'summary': {...}, 'items': [...]}``.  Treat it as
+    read-only: it is shared with later requests.
+    """
+    out, missing = {}, []
+    with _lock:
+        for h in heads:
+            hit = _cache.get((h.id, h.version))
+            if hit is None:
+                missing.append(h)
+            else:
+                out[h.id] = hit
+    if missing:
+        built = _build(missing)
+        with _lock:
+            for h in missing:
+                _cache[(h.id, h.version)] = built[h.id]
+        out.update(built)
+    return out
+
+
+def search_heads(q: str) -> list:
+    """``(id, version, name, description)`` of bundles whose name contains ``q``."""
+    if not q:
+        return []
+    return db.session.query(*_HEAD_COLUMNS) \
+        .filter(Bundle.name.ilike(f"%{q}%")).order_by(Bundle.name).all()
+
+
+def summaries(heads) -> list:
+    found = payloads(heads)
+    return [found[h.id]['summary'] for h in heads]
+
+
+def head(bundle_id: int):
+    """The ``(id, version, name, description)`` row of one bundle, or ``None``."""
+    return db.session.query(*_HEAD_COLUMNS).filter(Bundle.id == bundle_id).first()
+
+
+def clone_items(bundle_id: int, qty: int = 1, bundle_head=None):
+    """Serialized items of one bundle scaled by ``qty`` (``None`` if unknown)."""
+    bundle_head = bundle_head or head(bundle_id)
+    if bundle_head is None:
+        return None
+    items = payloads([bundle_head])[bundle_id]['items']
+    if qty == 1:
+        return items
+    return [{**it, 'quantity': (it['quantity'] or 0) * qty} for it in items]
+
+
+def evict(bundle_id: int) -> None:
+    """Drop every cached payload of ``bundle_id`` (e.g. once it is deleted)."""
+    with _lock:
+        for key in [k for k in _cache if k[0] == bundle_id]:
+            del _cache[key]
+
+
+def clear() -> None:
+    with _lock:
+        _cache.clear()
@@ -1,17 +1,34 @@
 # app/bundles/routes.py
 
 from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for
+from sqlalchemy import update
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
 from app import db
 from app.models import Bundle, BundleItem
-from app.bundles.utils import search_products
+from app.bundles import payloads as bundle_payloads
+from app.bundles.utils import (
+    lookup_products,
+    lookup_products_by_name,
+    search_product_page,
+)
+from app.http_cache import etag_for, hashed_json, versioned_json
+from app.inventory import PAGE_SIZE, parse_stock_request, stock_levels
+from app.pagination import clamp_page, keyset_page
 
 bp = Blueprint('bundles', __name__, template_folder='templates/bundles')
 
 @bp.route('/', methods=['GET'])
 def list_bundles():
-    bundles = Bundle.query.order_by(Bundle.name).all()
-    return render_template('bundles/list.html', bundles=bundles)
+    # Names are unique, so they double as the keyset cursor.
+    bundles, next_name, prev_name = keyset_page(
+        Bundle.query, Bundle.name,
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+        limit=request.args.get('limit', type=int),
+    )
+    return render_template('bundles/list.html', bundles=bundles,
+                           next_name=next_name, prev_name=prev_name)
 
 @bp.route('/create', methods=['GET', 'POST'])
 def create_bundle():
@@ -48,12 +65,8 @@ def edit_bundle(bundle_id):
             flash('Bundle updated', 'success')
         return redirect(url_for('bundles.edit_bundle', bundle_id=bundle.id))
 
-    # GET: render edit page with totals and current stock levels
-    for it in bundle.items:
-        prod = next((p for p in search_products(it.product_name)
-                     if p.get('name') == it.product_name), None)
-        it.stock = prod.get('stock', 0) if prod else 0
-
+    # GET: render edit page with totals; stock levels are fetched by the
+    # page in one batch request to /stock after it loads.
     total_cost   = sum(i.unit_price * i.quantity   for i in bundle.items)
     total_retail = sum(i.retail * i.quantity for i in bundle.items)
     return render_template(
@@ -73,6 +86,7 @@ def delete_bundle(bundle_id):
     # 2) Now delete the bundle itself
     db.session.delete(bundle)
     db.session.commit()
+    bundle_payloads.evict(bundle_id)
 
     flash(f"Bundle '{bundle.name}' and its items deleted", 'success')
     return redirect(url_for('bundles.list_bundles'))
@@ -80,9 +94,26 @@ def delete_bundle(bundle_id):
 @bp.route('/search')
 def bundles_search():
     q = request.args.get('q', '')
-    page = int(request.args.get('page', 1))
-    products = search_products(q, page=page)
-    return jsonify(products=products)
+    page = clamp_page(request.args.get('page', 1, type=int))
+    limit = request.args.get('limit', PAGE_SIZE, type=int)
+    products, has_more = search_product_page(
+        q, page=page, limit=limit, fields=request.args.get('fields')
+    )
+    return hashed_json({'products': products, 'page': page, 'has_more': has_more})
+
+@bp.route('/stock', methods=['POST'])
+def stock_lookup():
+    """
+    Batch stock levels for bundle items.
+    Accepts { names: [...], ids: [...] } and returns
+    { names: {name: qty}, ids: {id: qty} }.
+    """
+    try:
+        names, ids = parse_stock_request(request.get_json() or {})
+    except (TypeError, ValueError) as e:
+        return jsonify(error=str(e)), 400
+    levels = stock_levels(names=names, ids=ids)
+    return jsonify(**levels)
 
 @bp.route('/<int:bundle_id>/add-item', methods=['POST'])
 def add_bundle_item(bundle_id):
@@ -92,13 +123,17 @@ def add_bundle_item(bundle_id):
     if data.get('type') != 'product':
         return jsonify(error='Invalid type'), 400
 
-    prod = next((p for p in search_products(data['q'])
-                 if str(p['id']) == str(data['id'])), None)
+    try:
+        product_id = int(data['id'])
+    except (KeyError, TypeError, ValueError):
+        return jsonify(error='Invalid product id'), 400
+    prod = lookup_products([product_id]).get(product_id)
     if not prod:
         return jsonify(error='Not found'), 404
 
     it = BundleItem(
         bundle_id    = bundle.id,
+        product_id   = product_id,
         product_name = prod['name'],
         description  = prod['description'],
         quantity     = data.get('quantity', 1),
@@ -131,42 +166,48 @@ def update_bundle_item(bundle_id, item_id):
 
 @bp.route('/<int:bundle_id>/refresh', methods=['POST'])
 def refresh_bundle(bundle_id):
-    """Update bundle items with current cost and stock from RepairShopr."""
-    bundle = Bundle.query.get_or_404(bundle_id)
+    """Update bundle items with current cost and stock from RepairShopr.
+
+    Distinct product ids are resolved in one batch.  Older items saved
+    before ids were recorded are resolved by one batch of exact-name
+    lookups and have their id backfilled.  Changed items are written with
+    one bulk UPDATE and each resolved item reports its cost ``delta``.
+    """
+    bundle = Bundle.query.options(selectinload(Bundle.items)) \
+        .filter_by(id=bundle_id).first_or_404()
+    by_id = lookup_products({it.product_id for it in bundle.items if it.product_id})
+    by_name = lookup_products_by_name(
+        {it.product_name for it in bundle.items if not it.product_id})
+    changes = []
     updated = []
     for it in bundle.items:
-        prod = next((p for p in search_products(it.product_name)
-                     if p.get('name') == it.product_name), None)
-        if prod:
-            new_cost = prod.get('cost', it.unit_price)
-            it.unit_price = new_cost
-            updated.append({
-                'id': it.id,
-                'cost': new_cost,
-                'stock': prod.get('stock', 0)
-            })
+        prod = by_id.get(it.product_id) if it.product_id else by_name.get(it.product_name)
+        if not prod:
+            continue
+        new_cost = prod.get('cost', it.unit_price)
+        product_id = it.product_id or prod.get('id')
+        if new_cost != it.unit_price or product_id != it.product_id:
+            changes.append({'id': it.id, 'product_id': product_id, 'unit_price': new_cost})
+        updated.append({
+            'id': it.id,
+            'cost': new_cost,
+            'stock': prod.get('stock', 0),
+            'delta': new_cost - (it.unit_price or 0),
+        })
+    if changes:
+        db.session.execute(update(BundleItem), changes)
+        bundle_payloads.bump_versions(db.session.connection(), [bundle.id])
     db.session.commit()
-    return jsonify(items=updated)
+    return jsonify(items=updated, changed=len(changes))
 
 @bp.route('/search-bundles')
 def search_bundles():
     """
     AJAX endpoint for saved-bundle search.
     Returns JSON: { bundles: [ { id, name, description, cost, retail, type }, … ] }
+    Summaries come from the versioned bundle payload cache.
     """
     q = request.args.get('q', '').strip()
-    term = f"%{q}%"
-    bundles = Bundle.query.filter(Bundle.name.ilike(term)).all() if q else []
-    results = []
-    for b in bundles:
-        total_cost   = sum(item.unit_price for item in b.items)
-        total_retail = sum(item.retail     for item in b.items)
-        results.append({
-            'id'          : b.id,
-            'name'        : b.name,
-            'description' : (b.description or '')[:100],
-            'cost'        : float(total_cost),
-            'retail'      : float(total_retail),
-            'type'        : 'bundle'
-        })
-    return jsonify(bundles=results)
+    heads = bundle_payloads.search_heads(q)
+    etag = etag_for('bundle-search', q, [(h.id, h.version) for h in heads])
+    return versioned_json(etag, lambda: {'bundles': bundle_payloads.summaries(heads)})
@@ -1,29 +1,61 @@
 # app/bundles/utils.py
 """Helpers for bundle-related product search."""
 
-from app.api.repairshopr import search_products as _search_products
+from app.inventory import (
+    PAGE_SIZE,
+    products_by_id,
+    products_by_name,
+    project,
+)
+from app.inventory import search_product_page as _search_product_page
 
 
-def search_products(q: str, page: int = 1) -> list:
-    """Search for products via the RepairShopr API.
+def _to_row(p: dict) -> dict:
+    return {
+        "id": p.get("id"),
+        "name": p.get("name"),
+        "description": p.get("description"),
+        "cost": float(p.get("price_cost", 0.0)),
+        "retail": float(p.get("price_retail", 0.0)),
+        "stock": float(p.get("quantity", 0.0)),
+        "type": "product",
+    }
 
-    The previous implementation queried a local inventory mirror and only
-    contacted the API on cache misses.  This reverts to the simpler behaviour
-    of hitting the API directly for every search.  The ``page`` argument is
-    accepted for compatibility but currently unused as the API endpoint does
-    not support pagination for these lookups.
+
+def search_product_page(q: str, page: int = 1, limit: int = PAGE_SIZE, fields=None):
+    """One page of product search results, local mirror first.
+
+    Matches come from the in-memory typeahead index (when enabled) or the
+    full-text index over ``rs_product``; the RepairShopr API is only
+    queried when the mirror has nothing.
+
+    Returns ``(rows, has_more)``.  Pages are cut from one cached ranking per
+    query, and ``fields`` optionally limits the keys of each row.
     """
 
-    rows = _search_products(q or "")
-    return [
-        {
-            "id": p.get("id"),
-            "name": p.get("name"),
-            "description": p.get("description"),
-            "cost": float(p.get("price_cost", 0.0)),
-            "retail": float(p.get("price_retail", 0.0)),
-            "stock": float(p.get("quantity", 0.0)),
-            "type": "product",
-        }
-        for p in rows
-    ]
+    rows, has_more = _search_product_page(q or "", page=page, limit=limit)
+    return project([_to_row(p) for p in rows], fields), has_more
+
+
+def search_products(q: str, page: int = 1, limit: int = PAGE_SIZE, fields=None) -> list:
+    """Rows of :func:`search_product_page` without the paging flag."""
+    return search_product_page(q, page=page, limit=limit, fields=fields)[0]
+
+
+def lookup_products(ids) -> dict:
+    """Current product data keyed by RepairShopr product id.
+
+    Uses the mirror first and ``/products/{id}`` for the rest; rows have the
+    same shape as :func:`search_products`.
+    """
+    return {pid: _to_row(p) for pid, p in products_by_id(ids).items()}
+
+
+def lookup_products_by_name(names) -> dict:
+    """Current product data keyed by exact product name.
+
+    For lines saved before product ids were recorded.  Distinct names are
+    resolved against the mirror first and the rest searched on the API
+    concurrently; rows have the same shape as :func:`search_products`.
+    """
+    return {name: _to_row(p) for name, p in products_by_name(names).items()}
@@ -6,6 +6,11 @@ class BaseConfig:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SESSION_COOKIE_SAMESITE = 'Lax'
     SESSION_COOKIE_SECURE = False
+    # Keep an in-memory prefix index of rs_product for the product pickers
+    TYPEAHEAD_ENABLED = os.getenv('RS_TYPEAHEAD', 'false').lower() == 'true'
+    # Threads per process that push estimates to RepairShopr; 0 leaves the
+    # queue to `flask push-jobs run`
+    PUSH_WORKERS = int(os.getenv('RS_PUSH_WORKERS', '2'))
 
 class DevConfig(BaseConfig):
     DEBUG = True
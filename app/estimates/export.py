@@ -0,0 +1,162 @@
+"""Streaming export of estimates and their line items.
+
+Rows are read with one ``estimate LEFT JOIN estimate_item`` query executed
+with ``yield_per``, so the driver hands them over in fixed-size chunks and
+nothing holds the whole result.  Each chunk is encoded and handed to the
+caller (an HTTP generator response or a file) before the next one is
+fetched, which keeps memory flat no matter how many lines are exported.
+
+* ``csv``: one row per line item, the estimate columns repeated on each.
+  Estimates without items get a single row with the item columns empty.
+* ``jsonl``: one object per estimate with its lines under ``items``.
+
+Filters: ``statuses`` (any of), and ``since``/``until`` on
+``Estimate.created_at`` (``until`` exclusive).  Estimates created before
+the column existed have no date and are only included when no date filter
+is given.
+"""
+import contextlib
+import csv
+import io
+import json
+import logging
+import os
+import sys
+from datetime import date, datetime
+
+import click
+from sqlalchemy import inspect, select, text
+
+from app import db
+from app.estimates.totals import estimates_cli
+from app.models import Estimate, EstimateItem
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+FORMATS = ("csv", "jsonl")
+MIMETYPES = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+
+_estimate = Estimate.__table__
+_item = EstimateItem.__table__
+
+ESTIMATE_COLUMNS = (
+    "id", "customer_id", "customer_name", "customer_address", "status",
+    "created_at", "total_cost", "total_retail",
+)
+ITEM_COLUMNS = (
+    "id", "parent_id", "type", "object_id", "product_id", "name", "description",
+    "quantity", "unit_price", "retail", "notes",
+)
+CSV_HEADER = [f"estimate_{c}" for c in ESTIMATE_COLUMNS] + [f"item_{c}" for c in ITEM_COLUMNS]
+
+
+def ensure_created_at_column() -> None:
+    """Add ``estimate.created_at`` to databases that predate it."""
+    with db.engine.begin() as conn:
+        existing = {c["name"] for c in inspect(conn).get_columns("estimate")}
+        if "created_at" in existing:
+            return
+        conn.execute(text("ALTER TABLE estimate ADD COLUMN created_at DATETIME"))
+        conn.execute(text("CREATE INDEX ix_estimate_created_at ON estimate (created_at)"))
+    logger.info("Added estimate created_at column")
+
+
+def parse_day(value):
+    """``YYYY-MM-DD`` (or a full ISO timestamp) to a datetime; ``None`` stays ``None``."""
+    return datetime.fromisoformat(value) if value else None
+
+
+def _statement(statuses=None, since=None, until=None):
+    stmt = (
+        select(
+            *(_estimate.c[c].label(f"estimate_{c}") for c in ESTIMATE_COLUMNS),
+            *(_item.c[c].label(f"item_{c}") for c in ITEM_COLUMNS),
+        )
+        .select_from(_estimate.outerjoin(_item, _item.c.estimate_id == _estimate.c.id))
+        .order_by(_estimate.c.id, _item.c.id)
+    )
+    if statuses:
+        stmt = stmt.where(_estimate.c.status.in_(list(statuses)))
+    if since is not None:
+        stmt = stmt.where(_estimate.c.created_at >= since)
+    if until is not None:
+        stmt = stmt.where(_estimate.c.created_at < until)
+    return stmt
+
+
+def _rows(statuses=None, since=None, until=None):
+    """Joined rows in ``(estimate id, item id)`` order, ``CHUNK_SIZE`` at a time."""
+    result = db.session.execute(
+        _statement(statuses, since, until).execution_options(yield_per=CHUNK_SIZE)
+    )
+    try:
+        yield from result.partitions()
+    finally:
+        result.close()
+
+
+def _plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _csv_chunks(partitions):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(CSV_HEADER)
+    for rows in partitions:
+        writer.writerows([_plain(v) for v in row] for row in rows)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def _jsonl_chunks(partitions):
+    current, lines = None, []
+    for rows in partitions:
+        for row in rows:
+            m = row._mapping
+            if current is None or current["id"] != m["estimate_id"]:
+                if current is not None:
+                    lines.append(json.dumps(current))
+                current = {c: _plain(m[f"estimate_{c}"]) for c in ESTIMATE_COLUMNS}
+                current["items"] = []
+            if m["item_id"] is not None:
+                current["items"].append({c: _plain(m[f"item_{c}"]) for c in ITEM_COLUMNS})
+        # only finished estimates are written; the open one may continue
+        # into the next chunk
+        if lines:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if current is not None:
+        yield json.dumps(current) + "\n"
+
+
+def export_chunks(fmt="csv", statuses=None, since=None, until=None):
+    """Yield the export as text chunks of roughly ``CHUNK_SIZE`` rows each."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}")
+    partitions = _rows(statuses, since, until)
+    encode = _csv_chunks if fmt == "csv" else _jsonl_chunks
+    return encode(partitions)
+
+
+@estimates_cli.command("export")
+@click.option("--format", "fmt", type=click.Choice(FORMATS), default="csv", show_default=True)
+@click.option("--status", "statuses", multiple=True, help="Only these statuses (repeatable).")
+@click.option("--since", type=click.DateTime(), help="Created on or after this date.")
+@click.option("--until", type=click.DateTime(), help="Created before this date.")
+@click.option("-o", "--output", type=click.Path(dir_okay=False, writable=True),
+              help="File to write (default: stdout).")
+def export_command(fmt, statuses, since, until, output) -> None:
+    """Export estimates with their line items as CSV or JSON lines."""
+    with (
+        open(output, "w", newline="", encoding="utf-8") if output
+        else contextlib.nullcontext(sys.stdout)
+    ) as out:
+        for chunk in export_chunks(fmt, statuses, since, until):
+            out.write(chunk)
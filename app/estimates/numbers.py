@@ -0,0 +1,91 @@
+"""Local allocator for RepairShopr estimate numbers.
+
+Pushing used to ask RepairShopr for its latest estimate before every create
+just to add one to its number, which cost a round-trip per push and let two
+simultaneous pushes pick the same number.  Numbers now come from the
+``estimate_number_seq`` row, incremented atomically with
+``UPDATE … RETURNING`` so concurrent workers and processes never share one.
+
+The sequence is seeded from RepairShopr's latest estimate the first time it
+is needed.  It is checked against RepairShopr again every
+``RS_ESTIMATE_NUMBER_RESYNC`` seconds (default 3600) and whenever
+RepairShopr rejects a number as taken (estimates created outside the app).
+A resync only ever moves the sequence forward.
+"""
+import logging
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, update
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.api import repairshopr as rs_api
+from app.models import EstimateNumberSequence, utcnow
+
+logger = logging.getLogger(__name__)
+
+SEQUENCE = "repairshopr"
+RESYNC_INTERVAL = float(os.getenv("RS_ESTIMATE_NUMBER_RESYNC", "3600"))
+
+_seq = EstimateNumberSequence.__table__
+
+
+def _upstream_next():
+    """One past RepairShopr's latest estimate number, or ``None``."""
+    last = rs_api.get_last_estimate()
+    if not last:
+        return None
+    try:
+        return int(last.get('number', 0)) + 1
+    except (TypeError, ValueError):
+        return None
+
+
+def resync(now: datetime | None = None):
+    """Move the sequence up to RepairShopr's next number.
+
+    Returns the sequence's next number, or ``None`` if it has never been
+    seeded and RepairShopr could not be reached.
+    """
+    now = now or utcnow()
+    upstream = _upstream_next()
+    if upstream is None:
+        row = db.session.get(EstimateNumberSequence, SEQUENCE)
+        return row.next_number if row else None
+    moved = db.session.execute(
+        update(_seq)
+        .where(_seq.c.name == SEQUENCE)
+        .values(next_number=case((_seq.c.next_number < upstream, upstream),
+                                 else_=_seq.c.next_number),
+                seeded_at=now)
+    ).rowcount
+    if not moved:
+        db.session.add(EstimateNumberSequence(name=SEQUENCE, next_number=upstream,
+                                              seeded_at=now))
+        try:
+            db.session.commit()
+        except IntegrityError:  # another worker seeded it first
+            db.session.rollback()
+            return resync(now)
+    db.session.commit()
+    return db.session.get(EstimateNumberSequence, SEQUENCE, populate_existing=True).next_number
+
+
+def allocate(now: datetime | None = None):
+    """Hand out the next estimate number (``None`` if it can't be seeded)."""
+    now = now or utcnow()
+    row = db.session.get(EstimateNumberSequence, SEQUENCE, populate_existing=True)
+    stale = row is None or row.seeded_at is None or \
+        row.seeded_at < now - timedelta(seconds=RESYNC_INTERVAL)
+    if stale and resync(now) is None:
+        logger.warning("No estimate number available; pushing without one")
+        return None
+    number = db.session.execute(
+        update(_seq)
+        .where(_seq.c.name == SEQUENCE)
+        .values(next_number=_seq.c.next_number + 1)
+        .returning(_seq.c.next_number - 1)
+    ).scalar_one()
+    db.session.commit()
+    return number
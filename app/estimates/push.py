@@ -0,0 +1,299 @@
+"""Background pushes of estimates to RepairShopr.
+
+``POST /estimates/<id>/push`` only records a :class:`~app.models.PushJob`
+and returns; the upstream calls run on a small pool of worker threads
+(``RS_PUSH_WORKERS`` per process, default 2) so web workers are never held
+up by RepairShopr rate limiting.  The UI polls
+``/estimates/push-jobs/<job_id>`` for the outcome.
+
+* A client-supplied ``Idempotency-Key`` maps to exactly one job, and an
+  estimate never has more than one unfinished job (a partial unique index
+  backs this up against concurrent requests), so repeated clicks don't
+  create duplicate estimates upstream.
+* The line items are snapshotted when the job is queued.  The estimate
+  number comes from :mod:`app.estimates.numbers` on the first attempt and
+  is reused by retries.
+* Failed attempts are retried with exponential backoff up to
+  ``RS_PUSH_MAX_ATTEMPTS`` times.
+* Jobs are claimed with a conditional ``UPDATE``, so several processes can
+  share the table.  A process starts its threads with the first push it
+  queues, or with its first request if jobs were unfinished at startup, so
+  jobs survive a restart.  With ``RS_PUSH_WORKERS=0`` no threads are
+  started and ``flask push-jobs run`` drains the queue instead.
+"""
+import logging
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from app import db
+from app.api import repairshopr as rs_api
+from app.estimates import numbers
+from app.models import PushJob, utcnow
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = int(os.getenv("RS_PUSH_MAX_ATTEMPTS", "5"))
+BACKOFF = float(os.getenv("RS_PUSH_BACKOFF", "5"))
+MAX_BACKOFF = float(os.getenv("RS_PUSH_MAX_BACKOFF", "300"))
+POLL_INTERVAL = float(os.getenv("RS_PUSH_POLL", "5"))
+# A job still "running" after this long belonged to a worker that died.
+LEASE = float(os.getenv("RS_PUSH_LEASE", "600"))
+
+PENDING = ("queued", "retrying")
+UNFINISHED = PENDING + ("running",)
+
+_wake = threading.Event()
+_threads = []
+_threads_lock = threading.Lock()
+
+
+def line_items(est) -> list:
+    """RepairShopr line items for the product lines of ``est``."""
+    items = []
+    for it in est.items:
+        if it.type != 'product':
+            continue
+        # Older top-level lines only carry the product id in object_id;
+        # bundle children there point at a BundleItem instead.
+        product_id = it.product_id or (it.object_id if it.parent_id is None else None)
+        items.append({
+            'name': it.name,
+            'quantity': it.quantity,
+            'price': it.retail,
+            'cost': it.unit_price,
+            'product_id': product_id,
+        })
+    return items
+
+
+def _unfinished(estimate_id: int) -> PushJob | None:
+    return PushJob.query.filter(PushJob.estimate_id == estimate_id,
+                                PushJob.status.in_(UNFINISHED)).first()
+
+
+def _existing(estimate_id: int, key: str | None) -> PushJob | None:
+    """The job ``enqueue`` should hand back instead of creating one.
+
+    A key whose job failed is not reused, so the user can push again.
+    """
+    if key:
+        job = PushJob.query.filter_by(idempotency_key=key).first()
+        if job is not None and job.status != 'failed':
+            return job
+    return _unfinished(estimate_id)
+
+
+def enqueue(est, key: str | None = None) -> tuple[PushJob, bool]:
+    """Queue a push of ``est``; returns ``(job, created)``.
+
+    An existing job is returned instead when ``key`` was seen before on a
+    job that hasn't failed, or the estimate already has an unfinished push.
+    """
+    job = _existing(est.id, key)
+    if job is not None:
+        return job, False
+    if key:  # the new job takes the key over from a failed one
+        db.session.execute(
+            update(PushJob)
+            .where(PushJob.idempotency_key == key, PushJob.status == 'failed')
+            .values(idempotency_key=None)
+        )
+    job = PushJob(
+        estimate_id=est.id,
+        idempotency_key=key or None,
+        status='queued',
+        payload={'customer_id': est.customer_id, 'line_items': line_items(est)},
+        next_attempt_at=utcnow(),
+    )
+    db.session.add(job)
+    try:
+        db.session.commit()
+    except IntegrityError:  # the same key or another push of est raced us in
+        db.session.rollback()
+        return _existing(est.id, key), False
+    start_workers(current_app._get_current_object())
+    _wake.set()
+    return job, True
+
+
+def backoff(attempts: int) -> float:
+    """Seconds to wait before retry number ``attempts``."""
+    delay = min(BACKOFF * 2 ** max(attempts - 1, 0), MAX_BACKOFF)
+    return delay + random.uniform(0, delay / 4)
+
+
+def run_job(job: PushJob) -> None:
+    """Make one attempt at ``job`` (already claimed) and record the outcome."""
+    retry_now = give_up = False
+    try:
+        if job.number is None:
+            job.number = numbers.allocate()
+            db.session.commit()
+        payload = job.payload or {}
+        created = rs_api.create_estimate(
+            payload.get('customer_id'), payload.get('line_items') or [], number=job.number
+        )
+        error = None if created else 'RepairShopr did not accept the estimate'
+    except rs_api.EstimateNumberTaken:
+        created = None
+        error = f'Estimate number {job.number} is already taken'
+        # On a first attempt the number was simply stale: resync and try a
+        # fresh one.  After an earlier failed attempt it may be our own
+        # estimate, so leave that for a person to check.
+        if job.attempts == 1:
+            numbers.resync()
+            job.number = numbers.allocate()
+            retry_now = True
+        else:
+            give_up = True
+    except Exception as e:
+        db.session.rollback()
+        logger.exception("Push job %s failed", job.id)
+        created, error = None, str(e)
+    now = utcnow()
+    if created:
+        job.status = 'succeeded'
+        job.result = created
+        job.rs_estimate_id = created.get('id')
+        job.error = None
+        job.finished_at = now
+    elif give_up or job.attempts >= MAX_ATTEMPTS:
+        job.status = 'failed'
+        job.error = error
+        job.finished_at = now
+    else:
+        job.status = 'retrying'
+        job.error = error
+        job.next_attempt_at = now if retry_now else \
+            now + timedelta(seconds=backoff(job.attempts))
+    db.session.commit()
+
+
+def _expire_leases(now: datetime) -> None:
+    # The upstream call may or may not have gone through, so an abandoned
+    # job is failed rather than retried.
+    db.session.execute(
+        update(PushJob)
+        .where(PushJob.status == 'running',
+               PushJob.started_at < now - timedelta(seconds=LEASE))
+        .values(status='failed', finished_at=now,
+                error='Interrupted; check RepairShopr before pushing again')
+    )
+    db.session.commit()
+
+
+def process_next(now: datetime | None = None) -> bool:
+    """Claim and run the next due job; returns ``False`` if none was due."""
+    now = now or utcnow()
+    _expire_leases(now)
+    job = (PushJob.query
+           .filter(PushJob.status.in_(PENDING), PushJob.next_attempt_at <= now)
+           .order_by(PushJob.next_attempt_at, PushJob.id)
+           .first())
+    if job is None:
+        return False
+    claimed = db.session.execute(
+        update(PushJob)
+        .where(PushJob.id == job.id, PushJob.status == job.status)
+        .values(status='running', started_at=now, attempts=PushJob.attempts + 1)
+    ).rowcount
+    db.session.commit()
+    if claimed:
+        db.session.refresh(job)
+        run_job(job)
+    return True
+
+
+def _worker(app) -> None:
+    while True:
+        busy = False
+        with app.app_context():
+            try:
+                busy = process_next()
+            except Exception:
+                db.session.rollback()
+                logger.exception("Push worker error")
+        if not busy:
+            _wake.wait(POLL_INTERVAL)
+            _wake.clear()
+
+
+def start_workers(app) -> int:
+    """Start this process's push worker threads once; returns how many run."""
+    count = app.config.get('PUSH_WORKERS', 0)
+    with _threads_lock:
+        while len(_threads) < count:
+            t = threading.Thread(target=_worker, args=(app,), daemon=True,
+                                 name=f'rs-push-{len(_threads)}')
+            t.start()
+            _threads.append(t)
+        return len(_threads)
+
+
+def init_app(app) -> None:
+    """Resume jobs a previous process left unfinished.
+
+    Workers otherwise start with the first push a process queues, so jobs
+    left queued or retrying by a restart or deploy would wait for someone
+    to push another estimate.  The check runs once at startup; the threads
+    start with the first request, so CLI commands never run them.
+    """
+    if not app.config.get('PUSH_WORKERS', 0):
+        return
+    with app.app_context():
+        try:
+            unfinished = PushJob.query.filter(PushJob.status.in_(UNFINISHED)).first()
+        except OperationalError:  # no push_job table until `flask schema upgrade`
+            db.session.rollback()
+            return
+    if unfinished is None:
+        return
+
+    @app.before_request
+    def _resume_push_jobs():
+        if len(_threads) < app.config.get('PUSH_WORKERS', 0):
+            start_workers(app)
+
+
+def job_status(job: PushJob) -> dict:
+    return {
+        'id': job.id,
+        'estimate_id': job.estimate_id,
+        'status': job.status,
+        'attempts': job.attempts,
+        'next_attempt_at': (job.next_attempt_at.isoformat()
+                            if job.status == 'retrying' else None),
+        'rs_estimate_id': job.rs_estimate_id,
+        'estimate': job.result,
+        'error': job.error,
+    }
+
+
+@click.group("push-jobs")
+def push_jobs_cli() -> None:
+    """RepairShopr estimate push queue commands."""
+
+
+@push_jobs_cli.command("run")
+@click.option("--once", is_flag=True, help="Drain the due jobs and exit.")
+def run_command(once: bool) -> None:
+    """Process queued pushes until interrupted."""
+    try:
+        while True:
+            done = 0
+            while process_next():
+                done += 1
+            if once:
+                click.echo(f"Processed {done} push jobs")
+                break
+            time.sleep(POLL_INTERVAL)
+    except KeyboardInterrupt:
+        click.echo("push worker stopped")
@@ -1,15 +1,24 @@
 # app/estimates/routes.py
 
-from flask import Blueprint, render_template, request, jsonify, url_for, redirect, flash
+from flask import (Blueprint, Response, render_template, request, jsonify, url_for, redirect,
+                   flash, abort, stream_with_context)
+from sqlalchemy import insert, update
+from sqlalchemy.orm import joinedload, selectinload
 from app import db
-from app.models import Estimate, EstimateItem, Bundle
+from app.models import Estimate, EstimateItem, Bundle, PushJob, utcnow
+from app.bundles import payloads as bundle_payloads
+from app.estimates import export, push
+from app.estimates.totals import recompute_totals
 from app.estimates.utils import (
-    search_products,
+    lookup_products,
+    lookup_products_by_name,
+    search_product_page,
     search_customers_util,
-    clone_bundle_to_items,
-    search_bundles,
+    bundle_child_rows,
 )
-from app.api import repairshopr as rs_api
+from app.http_cache import etag_for, hashed_json, versioned_json
+from app.inventory import PAGE_SIZE, parse_stock_request, stock_levels
+from app.pagination import clamp_page, keyset_page
 
 # No more template_folder; use the app's templates/estimates directory
 bp = Blueprint('estimates', __name__, url_prefix='/estimates')
@@ -17,8 +26,53 @@ bp = Blueprint('estimates', __name__, url_prefix='/estimates')
 
 @bp.route('/')
 def list_estimates():
-    ests = Estimate.query.order_by(Estimate.id.desc()).all()
-    return render_template('estimates/list.html', estimates=ests)
+    """
+    Newest estimates first, one keyset page at a time.
+    Query args: status, customer (id or part of the name), after/before
+    (id cursors) and limit.
+    """
+    status   = request.args.get('status') or None
+    customer = (request.args.get('customer') or '').strip()
+    query = Estimate.query
+    if status:
+        query = query.filter(Estimate.status == status)
+    if customer.isdigit():
+        query = query.filter(Estimate.customer_id == int(customer))
+    elif customer:
+        query = query.filter(Estimate.customer_name.ilike(f'%{customer}%'))
+    # Totals are stored on the estimate, so no line items are loaded here.
+    ests, next_id, prev_id = keyset_page(
+        query, Estimate.id,
+        after=request.args.get('after', type=int),
+        before=request.args.get('before', type=int),
+        limit=request.args.get('limit', type=int),
+        descending=True,
+    )
+    filters = {k: v for k, v in (('status', status), ('customer', customer)) if v}
+    return render_template('estimates/list.html', estimates=ests,
+                           filters=filters, next_id=next_id, prev_id=prev_id)
+
+
+@bp.route('/export')
+def export_estimates():
+    """
+    Stream every matching estimate with its line items.
+    Query args: format (csv or jsonl), status (repeatable), since/until
+    (YYYY-MM-DD, on the creation date; until is exclusive).
+    """
+    fmt = request.args.get('format', 'csv')
+    if fmt not in export.FORMATS:
+        return jsonify(error=f'format must be one of {", ".join(export.FORMATS)}'), 400
+    try:
+        since = export.parse_day(request.args.get('since'))
+        until = export.parse_day(request.args.get('until'))
+    except ValueError:
+        return jsonify(error='since/until must be YYYY-MM-DD dates'), 400
+    statuses = [s for s in request.args.getlist('status') if s]
+    chunks = export.export_chunks(fmt, statuses, since, until)
+    filename = f'estimates-{utcnow():%Y%m%d}.{fmt}'
+    return Response(stream_with_context(chunks), mimetype=export.MIMETYPES[fmt],
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
 
 
 @bp.route('/create', methods=['GET'])
@@ -42,26 +96,34 @@ def edit_estimate(estimate_id):
         db.session.commit()
         return jsonify(success=True)
 
-    # Lookup stock levels for each product line so the template can highlight
-    # out-of-stock items.
-    for it in est.items:
-        if it.type == 'product':
-            prod = next((p for p in search_products(it.name)
-                         if p.get('name') == it.name), None)
-            it.stock = prod.get('stock', 0) if prod else 0
-
-    top_items = EstimateItem.query.filter_by(estimate_id=est.id, parent_id=None).all()
-    total_cost   = sum(it.unit_price * it.quantity for it in top_items)
-    total_retail = sum(it.retail * it.quantity for it in top_items)
+    # Stock levels are filled in by the page with one call to /stock so a
+    # slow RepairShopr API never blocks rendering.
+    top_items = EstimateItem.query.options(selectinload(EstimateItem.children)) \
+        .filter_by(estimate_id=est.id, parent_id=None).all()
     return render_template(
         'estimates/form.html',
         estimate=est,
         items=top_items,
-        total_cost=total_cost,
-        total_retail=total_retail,
+        total_cost=est.total_cost,
+        total_retail=est.total_retail,
     )
 
 
+@bp.route('/stock', methods=['POST'])
+def stock_lookup():
+    """
+    Batch stock levels for line items.
+    Accepts { names: [...], ids: [...] } and returns
+    { names: {name: qty}, ids: {id: qty} }.
+    """
+    try:
+        names, ids = parse_stock_request(request.get_json() or {})
+    except (TypeError, ValueError) as e:
+        return jsonify(error=str(e)), 400
+    levels = stock_levels(names=names, ids=ids)
+    return jsonify(**levels)
+
+
 @bp.route('/search-customer')
 def search_customer():
     q = request.args.get('q', '')
@@ -72,13 +134,18 @@ def search_customer():
 @bp.route('/search')
 def search_for_items():
     """
-    Product-only search.
-    Returns { products: [ {id,name,description,unit_price,retail,type}, … ] }.
+    Product-only search, paged.
+    Accepts ?q=&page=&limit=&fields=id,name,…
+    Returns { products: [ {id,name,description,unit_price,retail,type}, … ],
+              page, has_more }.
     """
     q = request.args.get('q', '')
-    page = int(request.args.get('page', 1))
-    prods = search_products(q, page=page)
-    return jsonify(products=prods)
+    page = clamp_page(request.args.get('page', 1, type=int))
+    limit = request.args.get('limit', PAGE_SIZE, type=int)
+    prods, has_more = search_product_page(
+        q, page=page, limit=limit, fields=request.args.get('fields')
+    )
+    return hashed_json({'products': prods, 'page': page, 'has_more': has_more})
 
 
 @bp.route('/bundles/search')
@@ -88,8 +155,9 @@ def search_bundles_endpoint():
     Returns { bundles: [ {id,name,description,cost,retail,type}, … ] }.
     """
     q = request.args.get('q', '')
-    blst = search_bundles(q)
-    return jsonify(bundles=blst)
+    heads = bundle_payloads.search_heads(q)
+    etag = etag_for('bundle-search', q, [(h.id, h.version) for h in heads])
+    return versioned_json(etag, lambda: {'bundles': bundle_payloads.summaries(heads)})
 
 
 @bp.route('/bundles/<int:bundle_id>/clone')
@@ -97,23 +165,17 @@ def clone_bundle_endpoint(bundle_id):
     """
     Clone a saved bundle’s items for client-side addition.
     Optional ?qty= to scale line-item quantities.
-    Returns { items: [ {id,name,description,quantity,unit_price,retail,type}, … ] }.
+    Returns { items: [ {id,product_id,name,description,quantity,unit_price,retail,type}, … ] }.
+    Items are served from the versioned bundle payload cache.
     """
     qty = int(request.args.get('qty', 1))
-    bundle = Bundle.query.get_or_404(bundle_id)
-    items  = clone_bundle_to_items(bundle, None)
-    for it in items:
-        it.quantity *= qty
-    serialized = [{
-        'id'          : it.object_id,
-        'name'        : it.name,
-        'description' : it.description or '',
-        'quantity'    : it.quantity,
-        'unit_price'  : it.unit_price,
-        'retail'      : it.retail,
-        'type'        : 'product'
-    } for it in items]
-    return jsonify(items=serialized)
+    head = bundle_payloads.head(bundle_id)
+    if head is None:
+        abort(404)
+    etag = etag_for('bundle-clone', bundle_id, head.version, qty)
+    return versioned_json(
+        etag, lambda: {'items': bundle_payloads.clone_items(bundle_id, qty, head)}
+    )
 
 
 @bp.route('/<int:estimate_id>/add-item', methods=['POST'])
@@ -122,11 +184,10 @@ def add_estimate_item(estimate_id):
     Estimate.query.get_or_404(estimate_id)
 
     if data.get('type') == 'bundle':
-        bundle = Bundle.query.get_or_404(data['id'])
+        bundle = Bundle.query.options(selectinload(Bundle.items)) \
+            .filter_by(id=data['id']).first_or_404()
         qty    = int(data.get('quantity', 1))
-        cloned = clone_bundle_to_items(bundle, None)
-        total_cost   = sum(it.unit_price * it.quantity for it in cloned)
-        total_retail = sum(it.retail * it.quantity for it in cloned)
+        rows   = bundle_child_rows(bundle, estimate_id, qty)
 
         parent = EstimateItem(
             estimate_id = estimate_id,
@@ -135,53 +196,60 @@ def add_estimate_item(estimate_id):
             name        = bundle.name,
             description = bundle.description,
             quantity    = qty,
-            unit_price  = total_cost,
-            retail      = total_retail,
+            # per-bundle price; the children carry the scaled quantities
+            unit_price  = sum(bi.unit_price * bi.quantity for bi in bundle.items),
+            retail      = sum(bi.retail * bi.quantity for bi in bundle.items),
         )
         db.session.add(parent)
         db.session.flush()  # obtain parent.id
 
-        items = []
-        serialized = []
-        for it in cloned:
-            it.estimate_id = estimate_id
-            it.quantity   *= qty
-            it.parent_id   = parent.id
-            db.session.add(it)
-            db.session.flush()
-            items.append(it)
-            prod = next((p for p in search_products(it.name)
-                         if p.get('name') == it.name), None)
-            stock = prod.get('stock', 0) if prod else 0
-            serialized.append({
-                'id'         : it.id,
-                'name'       : it.name,
-                'description': it.description,
-                'quantity'   : it.quantity,
-                'unit_price' : it.unit_price,
-                'retail'     : it.retail,
-                'parent_id'  : it.parent_id,
-                'stock'      : stock,
-            })
+        # All children go in with a single INSERT … RETURNING.  RETURNING
+        # order isn't guaranteed, so ids are matched back by object_id
+        # (the BundleItem each child was cloned from).
+        for row in rows:
+            row['parent_id'] = parent.id
+        if rows:
+            table = EstimateItem.__table__
+            returned = db.session.execute(
+                insert(table).returning(table.c.id, table.c.object_id), rows
+            )
+            ids = {object_id: item_id for item_id, object_id in returned}
+            for row in rows:
+                row['id'] = ids[row['object_id']]
+        parent_json = {
+            'id'         : parent.id,
+            'name'       : parent.name,
+            'description': parent.description,
+            'quantity'   : parent.quantity,
+            'unit_price' : parent.unit_price,
+            'retail'     : parent.retail,
+        }
         db.session.commit()
 
-        return jsonify(
-            parent={
-                'id'         : parent.id,
-                'name'       : parent.name,
-                'description': parent.description,
-                'quantity'   : parent.quantity,
-                'unit_price' : parent.unit_price,
-                'retail'     : parent.retail,
-            },
-            items=serialized
+        levels = stock_levels(
+            names=[r['name'] for r in rows if not r['product_id']],
+            ids=[r['product_id'] for r in rows if r['product_id']],
         )
+        serialized = [{
+            'id'         : r['id'],
+            'name'       : r['name'],
+            'description': r['description'],
+            'quantity'   : r['quantity'],
+            'unit_price' : r['unit_price'],
+            'retail'     : r['retail'],
+            'parent_id'  : r['parent_id'],
+            'stock'      : (levels['ids'].get(r['product_id'], 0) if r['product_id']
+                            else levels['names'].get(r['name'], 0)),
+        } for r in rows]
+
+        return jsonify(parent=parent_json, items=serialized)
 
     # Single-product path
     it = EstimateItem(
         estimate_id = estimate_id,
         type        = data.get('type'),
         object_id   = data.get('id'),
+        product_id  = data.get('id') if data.get('type') == 'product' else None,
         name        = data.get('name'),
         description = data.get('description'),
         quantity    = data.get('quantity', 1),
@@ -197,7 +265,8 @@ def add_estimate_item(estimate_id):
 
 @bp.route('/<int:estimate_id>/remove-item/<int:item_id>', methods=['POST'])
 def remove_estimate_item(estimate_id, item_id):
-    it = EstimateItem.query.get_or_404(item_id)
+    it = EstimateItem.query.options(selectinload(EstimateItem.children)) \
+        .filter_by(id=item_id).first_or_404()
     # delete children if removing a bundle parent
     for child in list(it.children):
         db.session.delete(child)
@@ -206,90 +275,172 @@ def remove_estimate_item(estimate_id, item_id):
     return jsonify(success=True)
 
 
+EDITABLE_FIELDS = ('quantity', 'unit_price', 'retail', 'notes', 'name', 'description')
+
+
+def _apply_edit(it, data):
+    for field in EDITABLE_FIELDS:
+        if field in data:
+            setattr(it, field, data[field])
+
+
+def _bundle_to_recalc(it):
+    """The bundle parent whose price depends on ``it``, if any."""
+    if it.parent:
+        return it.parent
+    return it if it.children else None
+
+
+def _recalc_bundle(target):
+    """Set a bundle parent's per-bundle cost/retail from its children."""
+    total_cost = sum(ch.quantity * ch.unit_price for ch in target.children)
+    total_ret  = sum(ch.quantity * ch.retail     for ch in target.children)
+    qty = target.quantity or 1
+    target.unit_price = total_cost / qty if qty else 0
+    target.retail     = total_ret  / qty if qty else 0
+
+
 @bp.route('/<int:estimate_id>/update-item/<int:item_id>', methods=['POST'])
 def update_estimate_item(estimate_id, item_id):
     data = request.get_json()
-    it   = EstimateItem.query.get_or_404(item_id)
-    it.quantity   = data.get('quantity', it.quantity)
-    it.unit_price = data.get('unit_price', it.unit_price)
-    it.retail     = data.get('retail', it.retail)
-    it.notes      = data.get('notes', it.notes)
-    it.name       = data.get('name', it.name)
-    it.description= data.get('description', it.description)
+    it   = EstimateItem.query.options(
+        selectinload(EstimateItem.children),
+        joinedload(EstimateItem.parent).selectinload(EstimateItem.children),
+    ).filter_by(id=item_id).first_or_404()
+    _apply_edit(it, data)
 
     # If this item belongs to a bundle, recalculate the parent bundle's
     # cost/retail to reflect the updated child items.  Conversely if the
     # item is itself a bundle parent, recalc using its children.
-    parent = it.parent
-    target = parent if parent else it
-    if parent or it.children:
-        total_cost = sum(ch.quantity * ch.unit_price for ch in target.children)
-        total_ret  = sum(ch.quantity * ch.retail     for ch in target.children)
-        qty = target.quantity or 1
-        target.unit_price = total_cost / qty if qty else 0
-        target.retail     = total_ret  / qty if qty else 0
+    target = _bundle_to_recalc(it)
+    if target is not None:
+        _recalc_bundle(target)
 
     db.session.commit()
     return jsonify(success=True)
 
 
+@bp.route('/<int:estimate_id>/update-items', methods=['POST'])
+def update_estimate_items(estimate_id):
+    """
+    Apply many item edits in one transaction.
+    Body: {"items": [{"id": ..., "quantity": ..., ...}, ...]}
+    Each affected bundle parent is recalculated once, after all edits.
+    """
+    body = request.get_json(silent=True) or {}
+    if not isinstance(body, dict):
+        return jsonify(success=False, error='expected a JSON object with items'), 400
+    edits = body.get('items') or []
+    if not isinstance(edits, list) or not all(isinstance(e, dict) for e in edits):
+        return jsonify(success=False, error='items must be a list of objects'), 400
+    try:
+        by_id = {int(e['id']): e for e in edits}
+    except (KeyError, TypeError, ValueError):
+        return jsonify(success=False, error='each item needs an id'), 400
+    if not by_id:
+        return jsonify(success=True, updated=0)
+
+    items = EstimateItem.query.options(
+        selectinload(EstimateItem.children),
+        joinedload(EstimateItem.parent).selectinload(EstimateItem.children),
+    ).filter(EstimateItem.estimate_id == estimate_id,
+             EstimateItem.id.in_(by_id)).all()
+    missing = sorted(by_id.keys() - {it.id for it in items})
+    if missing:
+        return jsonify(success=False, error='unknown items', missing=missing), 404
+
+    parents = {}
+    for it in items:
+        _apply_edit(it, by_id[it.id])
+        target = _bundle_to_recalc(it)
+        if target is not None:
+            parents[target.id] = target
+    for target in parents.values():
+        _recalc_bundle(target)
+
+    db.session.commit()
+    return jsonify(success=True, updated=len(items))
+
+
 @bp.route('/<int:estimate_id>/refresh', methods=['POST'])
 def refresh_estimate(estimate_id):
-    """Update line items with current cost from RepairShopr."""
-    est = Estimate.query.get_or_404(estimate_id)
+    """Update line items with current cost from RepairShopr.
+
+    Distinct product ids are resolved in one batch and lines saved before
+    ids were recorded by one batch of exact-name lookups (their id is
+    backfilled); misses are fetched concurrently under the shared rate
+    limit.  Changed lines and bundle parents are written with one bulk
+    UPDATE, and every resolved line is reported with its cost ``delta``.
+    """
+    est = Estimate.query.options(
+        selectinload(Estimate.items).selectinload(EstimateItem.children)
+    ).filter_by(id=estimate_id).first_or_404()
+    products = [it for it in est.items if it.type == 'product']
+    by_id = lookup_products({it.product_id for it in products if it.product_id})
+    by_name = lookup_products_by_name({it.name for it in products if not it.product_id})
+
+    cost = {}      # item id -> refreshed unit cost
+    changes = []   # rows for the bulk UPDATE
     updated = []
-    for it in est.items:
-        if it.type != 'product':
+    for it in products:
+        prod = by_id.get(it.product_id) if it.product_id else by_name.get(it.name)
+        if not prod:
             continue
-        prod = next((p for p in search_products(it.name)
-                     if p.get('name') == it.name), None)
-        if prod:
-            new_cost = prod.get('unit_price', it.unit_price)
-            it.unit_price = new_cost
-            updated.append({
-                'id': it.id,
-                'unit_price': new_cost,
-            })
-    # Recalculate parent bundle lines
+        new_cost = prod.get('unit_price', it.unit_price)
+        product_id = it.product_id or prod.get('id')
+        cost[it.id] = new_cost
+        if new_cost != it.unit_price or product_id != it.product_id:
+            changes.append({'id': it.id, 'product_id': product_id,
+                            'unit_price': new_cost, 'retail': it.retail})
+        updated.append({
+            'id': it.id,
+            'unit_price': new_cost,
+            'delta': {'unit_price': new_cost - (it.unit_price or 0)},
+        })
+    # Recalculate parent bundle lines (per-bundle price, as in update-item)
     for parent in [i for i in est.items if i.type == 'bundle']:
-        total_cost   = sum(ch.quantity * ch.unit_price for ch in parent.children)
+        qty = parent.quantity or 1
+        total_cost   = sum(ch.quantity * cost.get(ch.id, ch.unit_price) for ch in parent.children)
         total_retail = sum(ch.quantity * ch.retail for ch in parent.children)
-        parent.unit_price = total_cost
-        parent.retail     = total_retail
+        unit_price, retail = total_cost / qty, total_retail / qty
+        if (unit_price, retail) != (parent.unit_price, parent.retail):
+            changes.append({'id': parent.id, 'product_id': parent.product_id,
+                            'unit_price': unit_price, 'retail': retail})
         updated.append({
             'id': parent.id,
-            'unit_price': parent.unit_price,
-            'retail': parent.retail,
+            'unit_price': unit_price,
+            'retail': retail,
+            'delta': {'unit_price': unit_price - (parent.unit_price or 0),
+                      'retail': retail - (parent.retail or 0)},
         })
+    if changes:
+        db.session.execute(update(EstimateItem), changes)
+        recompute_totals(db.session.connection(), [est.id])
     db.session.commit()
-    return jsonify(items=updated)
+    return jsonify(items=updated, changed=len(changes))
 
 
 @bp.route('/<int:estimate_id>/push', methods=['POST'])
 def push_estimate(estimate_id):
-    est = Estimate.query.get_or_404(estimate_id)
+    """
+    Queue a push to RepairShopr and return the job at once (202).
+    Poll status_url for the outcome; resending the same Idempotency-Key
+    returns the same job.
+    """
+    est = Estimate.query.options(selectinload(Estimate.items)) \
+        .filter_by(id=estimate_id).first_or_404()
     if not est.customer_id:
         return jsonify(error='Customer required'), 400
-    last = rs_api.get_last_estimate()
-    next_number = None
-    if last:
-        try:
-            next_number = int(last.get('number', 0)) + 1
-        except (TypeError, ValueError):
-            next_number = None
-    line_items = []
-    for it in est.items:
-        if it.type != 'product':
-            continue
-        line_items.append({
-            'name': it.name,
-            'quantity': it.quantity,
-            'price': it.retail,
-            'cost': it.unit_price,
-            'product_id': it.object_id,
-        })
-    created = rs_api.create_estimate(est.customer_id, line_items, number=next_number)
-    return jsonify(estimate=created or {})
+    job, _ = push.enqueue(est, request.headers.get('Idempotency-Key'))
+    status_url = url_for('estimates.push_job_status', job_id=job.id)
+    return jsonify(job=push.job_status(job), status_url=status_url), 202, \
+        {'Location': status_url}
+
+
+@bp.route('/push-jobs/<int:job_id>')
+def push_job_status(job_id):
+    job = PushJob.query.get_or_404(job_id)
+    return jsonify(job=push.job_status(job))
 
 @bp.route('/<int:estimate_id>/delete', methods=['POST'])
 def delete_estimate(estimate_id):
@@ -0,0 +1,100 @@
+"""Persisted estimate totals.
+
+``Estimate.total_cost`` and ``Estimate.total_retail`` are real columns so
+list and report pages can sort and filter on them without reading
+``estimate_item``.  Whenever a flush adds, changes or deletes line items,
+the totals of the affected estimates are recomputed with one set-based
+``UPDATE`` in the same transaction, so they commit (or roll back) together
+with the items.  Writes that bypass the ORM unit of work (bulk
+``update()``/``delete()`` statements) must call :func:`recompute_totals`
+themselves.  ``flask estimates recompute-totals`` repairs every estimate.
+"""
+import logging
+
+import click
+from sqlalchemy import event, func, inspect, select, text, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
+
+from app import db
+from app.models import Estimate, EstimateItem
+
+logger = logging.getLogger(__name__)
+
+_estimate = Estimate.__table__
+_item = EstimateItem.__table__
+
+
+def _line_sum(column):
+    return (
+        select(func.coalesce(func.sum(_item.c.quantity * column), 0.0))
+        .where(_item.c.estimate_id == _estimate.c.id, _item.c.parent_id.is_(None))
+        .scalar_subquery()
+    )
+
+
+def recompute_totals(connection, estimate_ids=None) -> int:
+    """Recompute totals for ``estimate_ids`` (all estimates if ``None``).
+
+    Returns the number of estimates updated.
+    """
+    stmt = update(_estimate).values(
+        total_cost=_line_sum(_item.c.unit_price),
+        total_retail=_line_sum(_item.c.retail),
+    )
+    if estimate_ids is not None:
+        ids = sorted({i for i in estimate_ids if i is not None})
+        if not ids:
+            return 0
+        stmt = stmt.where(_estimate.c.id.in_(ids))
+    return connection.execute(stmt).rowcount
+
+
+@event.listens_for(Session, "after_flush")
+def _collect(session, flush_context):
+    touched = session.info.setdefault("estimate_totals", set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, EstimateItem):
+            touched.add(obj.estimate_id)
+            hist = inspect(obj).attrs.estimate_id.history
+            touched.update(hist.deleted or ())
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def _apply(session, flush_context):
+    touched = session.info.pop("estimate_totals", None)
+    if not touched:
+        return
+    recompute_totals(session.connection(), touched)
+    for estimate_id in touched - {None}:
+        obj = session.identity_map.get(identity_key(Estimate, estimate_id))
+        if obj is not None:
+            session.expire(obj, ["total_cost", "total_retail"])
+
+
+def ensure_columns() -> None:
+    """Add and fill the total columns on databases that predate them."""
+    with db.engine.begin() as conn:
+        existing = {c["name"] for c in inspect(conn).get_columns("estimate")}
+        if "total_cost" in existing:
+            return
+        for name in ("total_cost", "total_retail"):
+            conn.execute(text(
+                f"ALTER TABLE estimate ADD COLUMN {name} FLOAT NOT NULL DEFAULT 0"
+            ))
+            conn.execute(text(f"CREATE INDEX ix_estimate_{name} ON estimate ({name})"))
+        count = recompute_totals(conn)
+    logger.info("Added estimate total columns; filled %d estimates", count)
+
+
+@click.group("estimates")
+def estimates_cli() -> None:
+    """Estimate maintenance commands."""
+
+
+@estimates_cli.command("recompute-totals")
+def recompute_totals_command() -> None:
+    """Recompute every estimate's stored totals from its line items."""
+    with db.engine.begin() as conn:
+        count = recompute_totals(conn)
+    click.echo(f"Recomputed totals for {count} estimates")
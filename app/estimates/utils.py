@@ -2,97 +2,91 @@
 
 """Utility functions for the estimates blueprint."""
 
-from app.api.repairshopr import (
-    search_products as _search_products,
+from app.inventory import (
+    PAGE_SIZE,
+    products_by_id,
+    products_by_name,
+    project,
     search_customers,
+    search_product_page as _search_product_page,
 )
-from app.models import Bundle, EstimateItem
 
 
-def search_products(q: str, page: int = 1) -> list:
-    """Search RepairShopr for products matching ``q``.
+def _to_row(p: dict) -> dict:
+    return {
+        "id": p.get("id"),
+        "name": p.get("name"),
+        "description": p.get("description"),
+        "unit_price": float(p.get("price_cost", 0.0)),
+        "retail": float(p.get("price_retail", 0.0)),
+        "stock": float(p.get("quantity", 0.0)),
+        "type": "product",
+    }
 
-    Previously this consulted a local inventory mirror and only fetched from
-    the network when necessary.  To simplify the system and remove the local
-    database dependency we now issue API requests directly for each search.
-    The ``page`` parameter is ignored but kept for backwards compatibility.
+
+def search_product_page(q: str, page: int = 1, limit: int = PAGE_SIZE, fields=None):
+    """One page of products matching ``q``.
+
+    The in-memory typeahead index (when enabled) or the ``rs_product``
+    full-text index is consulted first and the RepairShopr API only on a
+    miss.
+
+    Returns ``(rows, has_more)``.  Pages are cut from one cached ranking per
+    query, and ``fields`` optionally limits the keys of each row.
     """
 
-    rows = _search_products(q or "")
-    return [
-        {
-            "id": p.get("id"),
-            "name": p.get("name"),
-            "description": p.get("description"),
-            "unit_price": float(p.get("price_cost", 0.0)),
-            "retail": float(p.get("price_retail", 0.0)),
-            "stock": float(p.get("quantity", 0.0)),
-            "type": "product",
-        }
-        for p in rows
-    ]
+    rows, has_more = _search_product_page(q or "", page=page, limit=limit)
+    return project([_to_row(p) for p in rows], fields), has_more
 
 
-def search_customers_util(q: str) -> list:
+def search_products(q: str, page: int = 1, limit: int = PAGE_SIZE, fields=None) -> list:
+    """Rows of :func:`search_product_page` without the paging flag."""
+    return search_product_page(q, page=page, limit=limit, fields=fields)[0]
+
+
+def lookup_products(ids) -> dict:
+    """Current product data keyed by RepairShopr product id.
+
+    Uses the mirror first and ``/products/{id}`` for the rest; rows have the
+    same shape as :func:`search_products`.
     """
-    Called by /estimates/search-customer
-    Wraps the RepairShopr customer search into {id,name,address,email}.
+    return {pid: _to_row(p) for pid, p in products_by_id(ids).items()}
+
+
+def lookup_products_by_name(names) -> dict:
+    """Current product data keyed by exact product name.
+
+    For lines saved before product ids were recorded.  Distinct names are
+    resolved against the mirror first and the rest searched on the API
+    concurrently; rows have the same shape as :func:`search_products`.
     """
-    raw = search_customers(q or '') or []
-    out = []
-    for c in raw:
-        full_name = " ".join(filter(None, [c.get('first_name'), c.get('last_name')]))
-        out.append({
-            'id'      : c.get('id'),
-            'name'    : full_name,
-            'address' : c.get('billing_address') or '',
-            'email'   : c.get('email')
-        })
-    return out
-
-
-def search_bundles(q: str) -> list:
+    return {name: _to_row(p) for name, p in products_by_name(names).items()}
+
+
+def search_customers_util(q: str) -> list:
     """
-    Called by /estimates/bundles/search
-    Returns saved bundles as:
-      id, name, description, cost, retail, type='bundle'
+    Called by /estimates/search-customer
+    Serves {id,name,address,email} from the local customer index, falling
+    back to the (cached) RepairShopr customer search.
     """
-    term = f"%{q}%"
-    bundles = Bundle.query.filter(Bundle.name.ilike(term)).all() if q else []
-    results = []
-    for b in bundles:
-        total_cost   = sum(item.unit_price for item in b.items)
-        total_retail = sum(item.retail     for item in b.items)
-        results.append({
-            'id'          : b.id,
-            'name'        : b.name,
-            'description' : (b.description or '')[:100],
-            'cost'        : float(total_cost),
-            'retail'      : float(total_retail),
-            'type'        : 'bundle'
-        })
-    return results
-
-
-def clone_bundle_to_items(bundle, estimate) -> list:
+    return search_customers(q or '')
+
+
+def bundle_child_rows(bundle, estimate_id, qty: int = 1) -> list:
     """
-    Used by the server‐side clone endpoint and
-    legacy bundle‐POST path in add‐item.
-    Produces un‐saved EstimateItem objects with:
-      estimate_id, type='product', object_id, name,
-      description, quantity, unit_price, retail, notes
+    Column dicts for the child lines of ``bundle`` added ``qty`` times to
+    an estimate, ready for a bulk INSERT (``parent_id`` is left to the
+    caller).  Quantities are already scaled by ``qty``.
     """
-    clones = []
-    for bi in bundle.items:
-        clones.append(EstimateItem(
-            estimate_id = (estimate.id if estimate else None),
-            type        = 'product',
-            object_id   = bi.id,  # reference original BundleItem
-            name        = bi.product_name,
-            description = bi.description,
-            quantity    = bi.quantity,
-            unit_price  = bi.unit_price,
-            retail      = bi.retail,
-            notes       = ''
-        ))
-    return clones
+    return [{
+        'estimate_id': estimate_id,
+        'type'       : 'product',
+        'object_id'  : bi.id,  # reference original BundleItem
+        'product_id' : bi.product_id,
+        'name'       : bi.product_name,
+        'description': bi.description,
+        'quantity'   : (bi.quantity or 0) * qty,
+        'unit_price' : bi.unit_price,
+        'retail'     : bi.retail,
+        'notes'      : '',
+    } for bi in bundle.items]
@@ -0,0 +1,54 @@
+"""Conditional GET helpers for the JSON endpoints.
+
+Responses are tagged with an ``ETag`` and sent with ``Cache-Control:
+private, no-cache``, so browsers keep the body and revalidate it with
+``If-None-Match``.  A matching tag is answered with an empty ``304``.  The
+comparison is weak because :mod:`app.assets` marks the tag weak when it
+compresses a response.  With :func:`versioned_json` the tag comes from data
+versions, so a match is answered without building the body at all; with
+:func:`hashed_json` it is a hash of the serialized body.
+"""
+import hashlib
+
+from flask import current_app, request
+
+CACHE_CONTROL = "private, no-cache"
+
+
+def etag_for(*parts) -> str:
+    """Strong tag for a tuple of data versions."""
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def _not_modified(etag: str):
+    resp = current_app.response_class(status=304)
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = CACHE_CONTROL
+    return resp
+
+
+def _json(body: str, etag: str):
+    resp = current_app.response_class(body, mimetype="application/json")
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = CACHE_CONTROL
+    return resp
+
+
+def _dumps(payload) -> str:
+    return current_app.json.dumps(payload)
+
+
+def versioned_json(etag: str, build):
+    """Answer 304 if the client has ``etag``, else JSON of ``build()``."""
+    if request.if_none_match.contains_weak(etag):
+        return _not_modified(etag)
+    return _json(_dumps(build()), etag)
+
+
+def hashed_json(payload):
+    """JSON of ``payload`` tagged with a hash of its body."""
+    body = _dumps(payload)
+    etag = hashlib.sha1(body.encode()).hexdigest()
+    if request.if_none_match.contains_weak(etag):
+        return _not_modified(etag)
+    return _json(body, etag)
@@ -294,6 +294,23 @@ def full_command(include_serials: bool) -> None:
     full_export(include_serials=include_serials)
 
 
+@rs_export_cli.command("reindex")
+def reindex_command() -> None:
+    """Rebuild the local product and customer search indexes."""
+    from app.inventory import customers, index, typeahead
+
+    for label, module in (("Product", index), ("Customer", customers)):
+        if module.rebuild_index():
+            click.echo(f"{label} index rebuilt")
+        else:
+            click.echo(f"{label} index unavailable for this database")
+    stats = typeahead.rebuild()
+    click.echo(
+        f"Typeahead index: {stats['products']} products, "
+        f"{stats['memory_bytes'] / 1024:.0f} KiB, built in {stats['build_seconds']:.3f}s"
+    )
+
+
 def full_export(include_serials: bool = False) -> None:
     logging.basicConfig(level=logging.INFO)
     _register_models()
@@ -0,0 +1,258 @@
+"""Continuous sync of the RepairShopr product and customer mirrors.
+
+``flask rs-sync run`` is meant to run next to gunicorn.  Every cycle it
+polls a bounded amount of upstream data so the local ``rs_product`` and
+``rs_customer`` tables stay current without a full ``rs-export``:
+
+* customers are fetched with a ``since_updated_at`` cursor, so only records
+  changed since the last poll are transferred;
+* products carry no reliable change timestamp, so they are swept in id
+  order and every product is refreshed once per lap.  The sweep resumes
+  from the last id it stored rather than a page number: each cycle it
+  re-enters the id-sorted listing one page before that id (located from
+  the mirror's own count) and steps back further if rows upstream shifted,
+  so inserts and deletes during a lap never make it skip products.  Each
+  cycle fetches enough pages (at least ``RS_SYNC_SWEEP_PAGES``) for a lap
+  to finish within half of ``RS_SYNC_MAX_STALENESS``.
+
+Progress is kept in ``rs_sync_state``; ``flask rs-sync status`` reports the
+lag and staleness of each stream.  While the product mirror is fresher than
+``RS_SYNC_MAX_STALENESS`` seconds, name lookups trust it and stop falling
+back to live API calls for names it doesn't hold.
+"""
+import logging
+import math
+import os
+import time
+from datetime import datetime
+
+import click
+
+from app import db, repairshopr_client
+from app.models import RSCustomer, RSProduct, RSSyncState, utcnow
+
+logger = logging.getLogger(__name__)
+
+SYNC_INTERVAL = float(os.getenv("RS_SYNC_INTERVAL", "60"))
+SWEEP_PAGES = int(os.getenv("RS_SYNC_SWEEP_PAGES", "5"))
+MAX_STALENESS = float(os.getenv("RS_SYNC_MAX_STALENESS", "900"))
+PAGE_SIZE = int(os.getenv("RS_SYNC_PAGE_SIZE", "25"))  # products per API page
+
+
+def _state(stream: str) -> RSSyncState:
+    state = db.session.get(RSSyncState, stream)
+    if state is None:
+        state = RSSyncState(stream=stream, page=1, records=0)
+        db.session.add(state)
+    return state
+
+
+def upsert_records(model_cls, items) -> int:
+    """Upsert API payloads into ``model_cls`` without committing."""
+    columns = model_cls.__table__.columns.keys()
+    count = 0
+    for item in items:
+        if not item.get("id"):
+            continue
+        db.session.merge(model_cls(**{c: item[c] for c in columns if c in item}))
+        count += 1
+    return count
+
+
+def sweep_budget() -> int:
+    """Pages per cycle needed to finish a lap in half of ``MAX_STALENESS``.
+
+    Staleness is measured from the start of the last complete lap, so it
+    peaks at about two lap durations.
+    """
+    lap_pages = math.ceil(RSProduct.query.count() / PAGE_SIZE) + 1
+    cycles = max(MAX_STALENESS / 2 / SYNC_INTERVAL, 1)
+    return max(SWEEP_PAGES, math.ceil(lap_pages / cycles))
+
+
+def _resume(last_id):
+    """``(page, items)`` of the first page holding ``last_id`` or earlier ids.
+
+    The mirror's count of ids up to the cursor estimates where it sits in
+    the id-sorted listing; if upstream deletes moved it to an earlier page
+    the first id fetched is past the cursor and the search steps back.
+    """
+    page = max(RSProduct.query.filter(RSProduct.id <= last_id).count() // PAGE_SIZE, 1)
+    while True:
+        items = repairshopr_client.fetch_products_page(page, sort="id ASC")
+        if page == 1 or (items and items[0].get("id", 0) <= last_id):
+            return page, items
+        page -= 1
+
+
+def sync_products(pages: int | None = None) -> int:
+    """Refresh the next ``pages`` pages of the id-ordered product sweep.
+
+    Returns the number of products written.  Reaching the end of the
+    catalogue completes a lap and starts the next one from the lowest id.
+    """
+    state = _state("products")
+    now = utcnow()
+    state.last_run_at = now
+    if state.lap_started_at is None:
+        state.lap_started_at = now
+    pages = sweep_budget() if pages is None else pages
+    written = 0
+    if state.last_id:
+        page, items = _resume(state.last_id)
+    else:
+        page, items = 1, repairshopr_client.fetch_products_page(1, sort="id ASC")
+    for n in range(pages):
+        if n:
+            items = repairshopr_client.fetch_products_page(page, sort="id ASC")
+        if not items:
+            state.lap_completed_at = state.lap_started_at
+            state.lap_started_at = utcnow()
+            state.last_id = None
+            state.page = 1
+            break
+        fresh = [i for i in items if i.get("id", 0) > (state.last_id or 0)]
+        written += upsert_records(RSProduct, fresh)
+        if fresh:
+            state.last_id = fresh[-1]["id"]
+        page += 1
+        state.page = page
+        db.session.commit()
+    state.records = (state.records or 0) + written
+    state.last_success_at = utcnow()
+    state.last_error = None
+    db.session.commit()
+    return written
+
+
+def sync_customers(pages: int = SWEEP_PAGES) -> int:
+    """Fetch customers changed since the stored cursor (at most ``pages`` pages)."""
+    state = _state("customers")
+    state.last_run_at = utcnow()
+    params = {"sort": "updated_at ASC"}
+    if state.cursor:
+        params["since_updated_at"] = state.cursor
+    written = 0
+    for n, (_, items) in enumerate(
+        repairshopr_client.client.paginate("/customers", params=params), 1
+    ):
+        written += upsert_records(RSCustomer, items)
+        for item in items:
+            val = item.get("updated_at")
+            if val and (not state.cursor or val > state.cursor):
+                state.cursor = val
+        db.session.commit()
+        if n >= pages:  # pick up from the advanced cursor next cycle
+            break
+    state.records = (state.records or 0) + written
+    state.last_success_at = utcnow()
+    state.last_error = None
+    db.session.commit()
+    return written
+
+
+STREAMS = (
+    ("products", sync_products),
+    ("customers", sync_customers),
+)
+
+
+def sync_once() -> dict:
+    """Run one cycle of every stream, recording failures per stream.
+
+    Webhook events that could not be applied when they arrived are retried
+    here as well.
+    """
+    results = {}
+    for name, step in STREAMS:
+        try:
+            results[name] = step()
+        except Exception as e:  # keep the other streams and the loop going
+            db.session.rollback()
+            logger.exception("rs-sync %s failed", name)
+            state = _state(name)
+            state.last_error = str(e)
+            db.session.commit()
+            results[name] = None
+    from app.integrations.repairshopr_webhooks import process_pending
+
+    try:
+        results["webhooks"] = process_pending()
+    except Exception:
+        db.session.rollback()
+        logger.exception("rs-sync webhook queue failed")
+        results["webhooks"] = None
+    return results
+
+
+def _age(ts, now):
+    return None if ts is None else (now - ts).total_seconds()
+
+
+def sync_status(now: datetime | None = None) -> dict:
+    """Per-stream progress with ``lag`` and ``staleness`` in seconds.
+
+    ``lag`` is the time since the stream last synced successfully.
+    ``staleness`` bounds how old any mirrored row can be: for products the
+    time since the last complete sweep began, for customers the lag.
+    """
+    now = now or utcnow()
+    out = {}
+    for name, _ in STREAMS:
+        state = db.session.get(RSSyncState, name)
+        if state is None:
+            out[name] = {"lag": None, "staleness": None, "records": 0,
+                         "last_success_at": None, "last_error": None}
+            continue
+        lag = _age(state.last_success_at, now)
+        staleness = _age(state.lap_completed_at, now) if name == "products" else lag
+        out[name] = {
+            "lag": lag,
+            "staleness": staleness,
+            "records": state.records or 0,
+            "last_success_at": state.last_success_at,
+            "last_error": state.last_error,
+        }
+    return out
+
+
+def mirror_is_current(stream: str = "products") -> bool:
+    """True while ``stream`` is within ``RS_SYNC_MAX_STALENESS``."""
+    staleness = sync_status()[stream]["staleness"]
+    return staleness is not None and staleness <= MAX_STALENESS
+
+
+@click.group("rs-sync")
+def rs_sync_cli() -> None:
+    """Keep the RepairShopr product and customer mirrors current."""
+
+
+@rs_sync_cli.command("run")
+@click.option("--interval", type=float, default=SYNC_INTERVAL, show_default=True,
+              help="Seconds between sync cycles.")
+@click.option("--once", is_flag=True, help="Run a single cycle and exit.")
+def run_command(interval: float, once: bool) -> None:
+    """Poll RepairShopr for changes until interrupted."""
+    try:
+        while True:
+            started = time.monotonic()
+            results = sync_once()
+            logger.info("rs-sync cycle: %s", results)
+            if once:
+                break
+            time.sleep(max(interval - (time.monotonic() - started), 0))
+    except KeyboardInterrupt:
+        click.echo("rs-sync stopped")
+
+
+@rs_sync_cli.command("status")
+def status_command() -> None:
+    """Show lag and staleness of each mirrored stream."""
+    for name, info in sync_status().items():
+        def fmt(v):
+            return "never" if v is None else f"{v:.0f}s"
+        line = (f"{name}: lag {fmt(info['lag'])}, staleness {fmt(info['staleness'])}, "
+                f"{info['records']} records synced")
+        if info["last_error"]:
+            line += f", last error: {info['last_error']}"
+        click.echo(line)
@@ -0,0 +1,221 @@
+"""Signed RepairShopr webhooks that update the local mirror.
+
+RepairShopr posts product, customer and invoice changes to
+``/webhooks/repairshopr/<resource>``.  Each request must carry
+``X-RS-Signature: sha256=<hex>``, an HMAC-SHA256 of the raw body keyed with
+``REPAIRSHOPR_WEBHOOK_SECRET``; without a configured secret the endpoint
+refuses everything.
+
+Accepted events are stored in ``rs_webhook_event`` first and then applied
+straight away: the record is upserted into (or deleted from) its mirror
+table and only the cached searches and lookups that could include it,
+before or after the change, are dropped.  An event that fails to apply
+stays queued and is retried by ``flask rs-webhook process`` and every
+``rs-sync`` cycle.  ``flask rs-webhook replay`` feeds recorded events from a
+JSON-lines file through the same path.
+"""
+import hashlib
+import hmac
+import json
+import logging
+import os
+
+import click
+from flask import Blueprint, abort, jsonify, request
+
+from app import db
+from app.integrations.repairshopr_sync import upsert_records
+from app.models import RSCustomer, RSInvoice, RSProduct, RSWebhookEvent, utcnow
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_SECRET = os.getenv("REPAIRSHOPR_WEBHOOK_SECRET", "")
+MAX_ATTEMPTS = int(os.getenv("RS_WEBHOOK_MAX_ATTEMPTS", "5"))
+
+RESOURCES = {
+    "products": ("product", RSProduct),
+    "customers": ("customer", RSCustomer),
+    "invoices": ("invoice", RSInvoice),
+}
+DELETE_ACTIONS = {"delete", "deleted", "destroy", "destroyed"}
+
+bp = Blueprint("rs_webhooks", __name__)
+
+
+def sign(body: bytes, secret: str | None = None) -> str:
+    """Signature header value for ``body``."""
+    key = (secret if secret is not None else WEBHOOK_SECRET).encode()
+    return "sha256=" + hmac.new(key, body, hashlib.sha256).hexdigest()
+
+
+def verify(body: bytes, signature: str, secret: str | None = None) -> bool:
+    secret = secret if secret is not None else WEBHOOK_SECRET
+    if not secret or not signature:
+        return False
+    return hmac.compare_digest(sign(body, secret), signature)
+
+
+def _record(resource: str, payload: dict) -> dict:
+    """Pull the changed record out of a webhook payload."""
+    singular = RESOURCES[resource][0]
+    for key in ("attributes", singular, "data"):
+        if isinstance(payload.get(key), dict):
+            return payload[key]
+    return payload
+
+
+def queue_event(resource: str, payload: dict) -> RSWebhookEvent:
+    record = _record(resource, payload)
+    action = payload.get("action") or payload.get("event") or "updated"
+    try:
+        record_id = int(record.get("id"))
+    except (TypeError, ValueError):
+        record_id = None
+    event = RSWebhookEvent(
+        resource=resource,
+        action=str(action).rsplit(".", 1)[-1].lower(),
+        record_id=record_id,
+        payload=payload,
+    )
+    db.session.add(event)
+    db.session.commit()
+    return event
+
+
+# Fields a cached search may have matched a record on.
+SEARCH_FIELDS = {
+    "products": ("name", "sku", "upc_code", "description"),
+    "customers": ("firstname", "lastname", "fullname", "business_name",
+                  "email", "phone", "mobile"),
+}
+
+
+def _search_texts(resource: str, record) -> list:
+    fields = SEARCH_FIELDS.get(resource, ())
+    if record is None:
+        return []
+    if not isinstance(record, dict):
+        record = {f: getattr(record, f, None) for f in fields}
+    return [record.get(f) for f in fields]
+
+
+def _invalidate(resource: str, record_id, texts) -> None:
+    """Drop the cached searches and lookups a change to one record affects.
+
+    ``texts`` are the record's searchable fields before and after the
+    change; unrelated cache entries are kept.
+    """
+    from app import inventory
+    from app.api import repairshopr as rs_api
+    from app.api.cache import query_matches
+    from app.inventory import typeahead
+
+    if resource == "products":
+        rs_api.invalidate_product(record_id, *texts)
+        inventory.result_cache.invalidate_where(
+            lambda key, rows: any(r.get("id") == record_id for r in rows)
+            or query_matches(key, *texts)
+        )
+        typeahead.mark_stale()
+    elif resource == "customers":
+        rs_api.invalidate_customer(record_id, *texts)
+
+
+def apply_event(event: RSWebhookEvent) -> bool:
+    """Apply one queued event to the mirror; returns ``True`` on success."""
+    model_cls = RESOURCES[event.resource][1]
+    attempts = (event.attempts or 0) + 1
+    record = _record(event.resource, event.payload)
+    old = None
+    if event.resource in SEARCH_FIELDS and event.record_id:
+        old = db.session.get(model_cls, event.record_id)
+    texts = _search_texts(event.resource, old)
+    try:
+        if event.action in DELETE_ACTIONS:
+            obj = db.session.get(model_cls, event.record_id)
+            if obj is not None:
+                db.session.delete(obj)
+        else:
+            upsert_records(model_cls, [record])
+            texts += _search_texts(event.resource, record)
+        event.attempts = attempts
+        event.processed_at = utcnow()
+        event.error = None
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.exception("Applying webhook event %s failed", event.id)
+        event.attempts = attempts
+        event.error = str(e)
+        db.session.commit()
+        return False
+    _invalidate(event.resource, event.record_id, texts)
+    return True
+
+
+def process_pending(limit: int = 500) -> int:
+    """Apply queued events in arrival order; returns how many succeeded."""
+    pending = (
+        RSWebhookEvent.query
+        .filter(RSWebhookEvent.processed_at.is_(None),
+                RSWebhookEvent.attempts < MAX_ATTEMPTS)
+        .order_by(RSWebhookEvent.id)
+        .limit(limit)
+        .all()
+    )
+    return sum(apply_event(e) for e in pending)
+
+
+@bp.route("/<resource>", methods=["POST"])
+def receive(resource):
+    if resource not in RESOURCES:
+        abort(404)
+    body = request.get_data()
+    if not verify(body, request.headers.get("X-RS-Signature", "")):
+        abort(401)
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        abort(400)
+    if not isinstance(payload, dict):
+        abort(400)
+    event = queue_event(resource, payload)
+    applied = apply_event(event)
+    return jsonify(id=event.id, applied=applied), 202
+
+
+def replay(lines) -> int:
+    """Queue and apply recorded events.
+
+    Each line is a JSON object ``{"resource": ..., "payload": {...}}``.
+    Returns the number applied.
+    """
+    applied = 0
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        entry = json.loads(line)
+        if entry.get("resource") not in RESOURCES:
+            logger.warning("Skipping event for unknown resource %r", entry.get("resource"))
+            continue
+        applied += apply_event(queue_event(entry["resource"], entry.get("payload") or {}))
+    return applied
+
+
+@click.group("rs-webhook")
+def rs_webhook_cli() -> None:
+    """RepairShopr webhook queue commands."""
+
+
+@rs_webhook_cli.command("process")
+def process_command() -> None:
+    """Retry queued events that have not been applied yet."""
+    click.echo(f"Applied {process_pending()} queued events")
+
+
+@rs_webhook_cli.command("replay")
+@click.argument("path", type=click.File("r"))
+def replay_command(path) -> None:
+    """Feed recorded events from a JSON-lines file through the queue."""
+    click.echo(f"Applied {replay(path)} events")
@@ -0,0 +1,129 @@
+"""Local lookups backed by the RepairShopr mirror tables.
+
+The ``rs_product`` and ``rs_customer`` tables are filled by ``rs-export``
+(with ``REPAIRSHOPR_EXPORT_TO_DB=true``).  Searches consult their full-text
+indexes first and only reach the RepairShopr API when the mirror has no
+match.
+"""
+import os
+
+from app.api import repairshopr as rs_api
+from app.api.cache import SearchCache, make_backend, normalize_query
+from app.inventory import customers, index, typeahead
+from app.inventory.lookup import (
+    parse_stock_request,
+    products_by_id,
+    products_by_name,
+    stock_levels,
+)
+
+PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+# Longest ranked result list kept per query; deeper pages come back empty.
+MAX_RESULTS = int(os.getenv('RS_SEARCH_MAX_RESULTS', '500'))
+RESULT_CACHE_TTL = float(os.getenv('RS_RESULT_CACHE_TTL', '60'))
+
+# Ranked results per normalised query, so later pages are a slice of the
+# list page 1 produced instead of a new search.
+result_cache = SearchCache(
+    ttl=RESULT_CACHE_TTL,
+    stale_ttl=0,
+    backend=make_backend('results', 128, RESULT_CACHE_TTL),
+)
+
+
+def _ranked_products(query: str) -> list:
+    rows = typeahead.search(query, limit=MAX_RESULTS)
+    if rows:
+        return rows
+    rows = index.search(query, limit=MAX_RESULTS)
+    if rows:
+        return [rs_api.summarize_product(p) for p in rows]
+    return rs_api.search_products(query)[:MAX_RESULTS]
+
+
+def search_product_page(query: str, page: int = 1, limit: int = PAGE_SIZE):
+    """Return ``(rows, has_more)`` for one page of a product search.
+
+    The full ranked list comes from the typeahead index, the full-text
+    index or the RepairShopr API, in that order of preference, and is
+    cached for ``RS_RESULT_CACHE_TTL`` seconds.  Every page of a query is
+    therefore cut from the same ordering.
+    """
+    page = max(page, 1)
+    limit = min(max(limit, 1), MAX_PAGE_SIZE)
+    key = normalize_query(query)
+    found, rows = result_cache.lookup(key)
+    if not found:
+        rows = _ranked_products(query)
+        if rows:  # an empty list may be an API failure
+            result_cache.set(key, rows)
+    start = (page - 1) * limit
+    return rows[start:start + limit], len(rows) > start + limit
+
+
+def search_products(query: str, limit: int = PAGE_SIZE, page: int = 1) -> list:
+    """Search the local mirror, falling back to the API on a miss.
+
+    Returns one page of the same summarised dicts as
+    :func:`app.api.repairshopr.search_products`.
+    """
+    return search_product_page(query, page=page, limit=limit)[0]
+
+
+def project(rows: list, fields) -> list:
+    """Keep only ``fields`` (a list or comma separated string) of each row.
+
+    Unknown names are ignored; with no usable names the rows are unchanged.
+    """
+    if isinstance(fields, str):
+        fields = fields.split(',')
+    wanted = [f.strip() for f in fields or () if f.strip()]
+    if not rows or not wanted:
+        return rows
+    wanted = [f for f in wanted if f in rows[0]]
+    if not wanted:
+        return rows
+    return [{f: r.get(f) for f in wanted} for r in rows]
+
+
+def search_customers(query: str, limit: int = 20) -> list:
+    """Customer typeahead: mirror first, cached API search on a miss.
+
+    Returns dicts with ``id``, ``name``, ``address`` and ``email``.
+    """
+    rows = customers.search(query, limit=limit)
+    if rows:
+        return rows
+    out = []
+    for c in rs_api.search_customers(query) or []:
+        full_name = " ".join(filter(None, [c.get('first_name'), c.get('last_name')]))
+        out.append({
+            'id'      : c.get('id'),
+            'name'    : full_name,
+            'address' : c.get('billing_address') or '',
+            'email'   : c.get('email')
+        })
+    return out
+
+
+def ensure_indexes() -> None:
+    """Create the full-text indexes on databases that predate them."""
+    index.ensure_index()
+    customers.ensure_index()
+
+
+__all__ = [
+    "customers",
+    "ensure_indexes",
+    "index",
+    "parse_stock_request",
+    "products_by_id",
+    "products_by_name",
+    "project",
+    "search_customers",
+    "search_product_page",
+    "search_products",
+    "stock_levels",
+    "typeahead",
+]
@@ -0,0 +1,154 @@
+"""Customer lookups backed by the ``rs_customer`` mirror.
+
+On SQLite an FTS5 table indexes each customer's name, business name, email
+and phone numbers.  Phone numbers are also stored as bare digits so
+``5551234`` finds ``(555) 123-4567``.  Triggers keep it in step with the
+exporter's upserts.  Searches the mirror can't answer go to the
+RepairShopr API through its TTL cache.
+"""
+import logging
+import re
+
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+
+from app import db
+from app.inventory.index import match_expression
+from app.models import RSCustomer
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "rs_customer_fts"
+FTS_COLUMNS = ("name", "business_name", "email", "phones", "digits")
+
+
+def _digits(col: str) -> str:
+    expr = f"coalesce({col}, '')"
+    for ch in "-() .+":
+        expr = f"replace({expr}, '{ch}', '')"
+    return expr
+
+
+def _values(row: str) -> str:
+    return ", ".join((
+        f"{row}.id",
+        (
+            f"coalesce(nullif({row}.fullname, ''), "
+            f"trim(coalesce({row}.firstname, '') || ' ' || coalesce({row}.lastname, '')))"
+        ),
+        f"{row}.business_name",
+        f"{row}.email",
+        f"coalesce({row}.phone, '') || ' ' || coalesce({row}.mobile, '')",
+        f"{_digits(row + '.phone')} || ' ' || {_digits(row + '.mobile')}",
+    ))
+
+
+_cols = ", ".join(FTS_COLUMNS)
+
+CREATE_STATEMENTS = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5({_cols})",
+    (
+        f"CREATE TRIGGER IF NOT EXISTS rs_customer_fts_ai AFTER INSERT ON rs_customer BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, {_cols}) VALUES ({_values('new')}); END"
+    ),
+    (
+        f"CREATE TRIGGER IF NOT EXISTS rs_customer_fts_ad AFTER DELETE ON rs_customer BEGIN "
+        f"DELETE FROM {FTS_TABLE} WHERE rowid = old.id; END"
+    ),
+    (
+        f"CREATE TRIGGER IF NOT EXISTS rs_customer_fts_au AFTER UPDATE ON rs_customer BEGIN "
+        f"DELETE FROM {FTS_TABLE} WHERE rowid = old.id; "
+        f"INSERT INTO {FTS_TABLE}(rowid, {_cols}) VALUES ({_values('new')}); END"
+    ),
+)
+
+_RANK = f"bm25({FTS_TABLE}, 10.0, 8.0, 5.0, 2.0, 2.0)"
+
+
+def create_index(connection, rebuild: bool = False) -> bool:
+    """Create the customer FTS table and triggers; see ``index.create_index``."""
+    if connection.dialect.name != "sqlite":
+        return False
+    exists = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type='table' AND name=:n"),
+        {"n": FTS_TABLE},
+    ).first() is not None
+    try:
+        for stmt in CREATE_STATEMENTS:
+            connection.execute(text(stmt))
+        if rebuild or not exists:
+            connection.execute(text(f"DELETE FROM {FTS_TABLE}"))
+            connection.execute(text(
+                f"INSERT INTO {FTS_TABLE}(rowid, {_cols}) "
+                f"SELECT {_values('rs_customer')} FROM rs_customer"
+            ))
+    except OperationalError as e:
+        logger.warning("Customer full-text index unavailable: %s", e)
+        return False
+    return True
+
+
+@event.listens_for(RSCustomer.__table__, "after_create")
+def _after_create(target, connection, **kw):
+    create_index(connection)
+
+
+@event.listens_for(RSCustomer.__table__, "before_drop")
+def _before_drop(target, connection, **kw):
+    if connection.dialect.name == "sqlite":
+        connection.execute(text(f"DROP TABLE IF EXISTS {FTS_TABLE}"))
+
+
+def ensure_index() -> bool:
+    with db.engine.begin() as conn:
+        return create_index(conn)
+
+
+def rebuild_index() -> bool:
+    with db.engine.begin() as conn:
+        return create_index(conn, rebuild=True)
+
+
+def _match(query: str) -> str | None:
+    """Phone-like input matches the digits column; anything else every word."""
+    query = (query or "").strip()
+    if query and not re.search(r"[^\d\s\-().+]", query):
+        digits = re.sub(r"\D", "", query)
+        if len(digits) >= 3:
+            return f'digits : "{digits}"*'
+    return match_expression(query)
+
+
+def summarize_customer(c) -> dict:
+    """Shape an ``RSCustomer`` row like the picker expects."""
+    name = c.fullname or " ".join(filter(None, [c.firstname, c.lastname])) \
+        or c.business_name or ""
+    city_line = " ".join(filter(None, [c.city, c.state, c.zip]))
+    address = ", ".join(filter(None, [c.address, c.address2, city_line]))
+    return {
+        "id": c.id,
+        "name": name,
+        "address": address,
+        "email": c.email,
+    }
+
+
+def search(query: str, limit: int = 20) -> list | None:
+    """Return matching mirror customers, or ``None`` if the index can't answer."""
+    expr = _match(query)
+    if expr is None or db.engine.dialect.name != "sqlite":
+        return None
+    try:
+        ids = [row[0] for row in db.session.execute(
+            text(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :expr "
+                 f"ORDER BY {_RANK}, rowid LIMIT :limit"),
+            {"expr": expr, "limit": limit},
+        )]
+    except OperationalError as e:
+        logger.warning("Customer full-text search failed: %s", e)
+        return None
+    if not ids:
+        return []
+    rows = {c.id: c for c in RSCustomer.query.filter(RSCustomer.id.in_(ids))}
+    return [summarize_customer(rows[i]) for i in ids if i in rows]
+
@@ -0,0 +1,133 @@
+"""Full-text index over the ``rs_product`` mirror.
+
+On SQLite the index is an FTS5 external-content table kept in sync with
+``rs_product`` by triggers, so every upsert done by ``rs-export`` (or any
+other writer) is reflected immediately.  Other databases simply report the
+index as unavailable and callers fall back to the RepairShopr API.
+"""
+import logging
+import re
+
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+
+from app import db
+from app.models import RSProduct
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "rs_product_fts"
+FTS_COLUMNS = ("name", "sku", "upc_code", "description")
+
+_cols = ", ".join(FTS_COLUMNS)
+_new = ", ".join(f"new.{c}" for c in FTS_COLUMNS)
+_old = ", ".join(f"old.{c}" for c in FTS_COLUMNS)
+
+CREATE_STATEMENTS = (
+    (
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        f"{_cols}, content='rs_product', content_rowid='id')"
+    ),
+    (
+        f"CREATE TRIGGER IF NOT EXISTS rs_product_fts_ai AFTER INSERT ON rs_product BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, {_cols}) VALUES (new.id, {_new}); END"
+    ),
+    (
+        f"CREATE TRIGGER IF NOT EXISTS rs_product_fts_ad AFTER DELETE ON rs_product BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_cols}) "
+        f"VALUES ('delete', old.id, {_old}); END"
+    ),
+    (
+        f"CREATE TRIGGER IF NOT EXISTS rs_product_fts_au AFTER UPDATE ON rs_product BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_cols}) "
+        f"VALUES ('delete', old.id, {_old}); "
+        f"INSERT INTO {FTS_TABLE}(rowid, {_cols}) VALUES (new.id, {_new}); END"
+    ),
+)
+
+# Column weights for bm25(): name matches rank above SKU/UPC, then description.
+_RANK = f"bm25({FTS_TABLE}, 10.0, 5.0, 5.0, 1.0)"
+
+
+def create_index(connection, rebuild: bool = False) -> bool:
+    """Create the FTS table and triggers if missing.
+
+    Returns ``True`` when the index exists afterwards.  A freshly created
+    index (or ``rebuild=True``) is populated from the rows already present
+    in ``rs_product``.
+    """
+    if connection.dialect.name != "sqlite":
+        return False
+    exists = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type='table' AND name=:n"),
+        {"n": FTS_TABLE},
+    ).first() is not None
+    try:
+        for stmt in CREATE_STATEMENTS:
+            connection.execute(text(stmt))
+        if rebuild or not exists:
+            connection.execute(
+                text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+            )
+    except OperationalError as e:  # SQLite built without FTS5
+        logger.warning("Product full-text index unavailable: %s", e)
+        return False
+    return True
+
+
+def drop_index(connection) -> None:
+    if connection.dialect.name == "sqlite":
+        connection.execute(text(f"DROP TABLE IF EXISTS {FTS_TABLE}"))
+
+
+@event.listens_for(RSProduct.__table__, "after_create")
+def _after_create(target, connection, **kw):
+    create_index(connection)
+
+
+@event.listens_for(RSProduct.__table__, "before_drop")
+def _before_drop(target, connection, **kw):
+    drop_index(connection)
+
+
+def ensure_index() -> bool:
+    """Create the index for databases whose ``rs_product`` predates it."""
+    with db.engine.begin() as conn:
+        return create_index(conn)
+
+
+def rebuild_index() -> bool:
+    with db.engine.begin() as conn:
+        return create_index(conn, rebuild=True)
+
+
+def match_expression(query: str) -> str | None:
+    """Turn free text into an FTS5 query matching every word as a prefix."""
+    tokens = re.findall(r"\w+", (query or "").casefold())
+    if not tokens:
+        return None
+    return " ".join(f'"{t}"*' for t in tokens)
+
+
+def search(query: str, limit: int = 50) -> list | None:
+    """Return raw product dicts matching ``query`` from the local index.
+
+    The dicts use the same keys as the RepairShopr ``/products`` payload.
+    ``None`` means the index can't answer (no usable query or no index),
+    as opposed to ``[]`` for a search with no matches.
+    """
+    expr = match_expression(query)
+    if expr is None or db.engine.dialect.name != "sqlite":
+        return None
+    sql = text(
+        "SELECT p.id, p.name, p.description, p.sku, p.upc_code, "
+        "p.price_cost, p.price_retail, p.quantity "
+        f"FROM {FTS_TABLE} JOIN rs_product p ON p.id = {FTS_TABLE}.rowid "
+        f"WHERE {FTS_TABLE} MATCH :expr ORDER BY {_RANK}, p.id LIMIT :limit"
+    )
+    try:
+        rows = db.session.execute(sql, {"expr": expr, "limit": limit}).mappings()
+        return [dict(r) for r in rows]
+    except OperationalError as e:
+        logger.warning("Product full-text search failed: %s", e)
+        return None
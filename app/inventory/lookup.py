@@ -0,0 +1,124 @@
+"""Batch lookups of product data by name or RepairShopr product id."""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from app.api import repairshopr as rs_api
+from app.integrations.repairshopr_sync import mirror_is_current
+from app.models import RSProduct
+
+# Mirror misses are resolved against the API on their own pool so they never
+# wait on the per-field search pool that each API search uses internally.
+_batch_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv('RS_BATCH_WORKERS', '4')),
+    thread_name_prefix='rs-batch',
+)
+
+_MIRROR_COLUMNS = (
+    RSProduct.id, RSProduct.name, RSProduct.description,
+    RSProduct.price_cost, RSProduct.price_retail, RSProduct.quantity,
+)
+
+
+def _exact_match(name):
+    """Find the API product whose name is exactly ``name``."""
+    return next((p for p in rs_api.search_products(name)
+                 if p.get('name') == name), None)
+
+
+def _fetch_by_id(product_id):
+    raw = rs_api.get_product(product_id)
+    return rs_api.summarize_product(raw) if raw else None
+
+
+def _mirror_rows(column, keys):
+    rows = RSProduct.query.with_entities(*_MIRROR_COLUMNS) \
+        .filter(column.in_(keys)).order_by(RSProduct.id).all()
+    return [rs_api.summarize_product(r._asdict()) for r in rows]
+
+
+def products_by_id(ids) -> dict:
+    """Return ``{product_id: product}`` for the given RepairShopr ids.
+
+    Products come from the ``rs_product`` mirror in one query; ids it
+    doesn't hold are fetched from ``/products/{id}`` concurrently, even
+    while ``rs-sync`` keeps the mirror current, since an id taken from a
+    live search may simply not be mirrored yet.  Products use the summarised
+    shape of :func:`app.api.repairshopr.search_products` and unknown ids
+    are left out.
+    """
+    ids = {int(i) for i in ids if i not in (None, '')}
+    if not ids:
+        return {}
+    found = {p['id']: p for p in _mirror_rows(RSProduct.id, ids)}
+    missing = sorted(ids - found.keys())
+    for pid, prod in zip(missing, _batch_pool.map(_fetch_by_id, missing), strict=True):
+        if prod:
+            found[pid] = prod
+    return found
+
+
+def products_by_name(names) -> dict:
+    """Return ``{name: product}`` for exact product names.
+
+    The mirror is checked first; remaining names are searched on the API
+    concurrently (through the search cache) and matched exactly, unless
+    ``rs-sync`` keeps the mirror current.
+    """
+    names = {n for n in names if n}
+    if not names:
+        return {}
+    found = {}
+    for p in _mirror_rows(RSProduct.name, names):
+        found.setdefault(p['name'], p)
+    missing = sorted(names - found.keys())
+    if missing and mirror_is_current():
+        return found
+    for name, prod in zip(missing, _batch_pool.map(_exact_match, missing), strict=True):
+        if prod:
+            found[name] = prod
+    return found
+
+
+def parse_stock_request(data) -> tuple:
+    """Validate a ``{names: [...], ids: [...]}`` stock request body.
+
+    Returns ``(names, ids)`` with ids as ints; raises ``TypeError`` or
+    ``ValueError`` with a message fit for the client when the body doesn't
+    have that shape.
+    """
+    if not isinstance(data, dict):
+        raise TypeError('Expected a JSON object with names and ids')
+    names = data.get('names') or []
+    ids = data.get('ids') or []
+    if not isinstance(names, list) or not all(isinstance(n, str) for n in names):
+        raise TypeError('names must be a list of strings')
+    if not isinstance(ids, list):
+        raise TypeError('ids must be a list of integers')
+    parsed = []
+    for i in ids:
+        if i is None or i == '':
+            continue
+        if isinstance(i, int) and not isinstance(i, bool):
+            parsed.append(i)
+        elif isinstance(i, str) and i.strip().isdigit():
+            parsed.append(int(i))
+        else:
+            raise ValueError(f'ids must be integers, got {i!r}')
+    return names, parsed
+
+
+def stock_levels(names=(), ids=()) -> dict:
+    """Resolve stock quantities for many products at once.
+
+    Returns ``{'names': {name: qty}, 'ids': {id: qty}}`` using
+    :func:`products_by_name` and :func:`products_by_id`.  Unknown products
+    report ``0``.
+    """
+    names = {n for n in names if n}
+    ids = {int(i) for i in ids if i not in (None, '')}
+    by_id = products_by_id(ids)
+    by_name = products_by_name(names)
+    return {
+        'names': {n: by_name[n]['quantity'] if n in by_name else 0.0 for n in names},
+        'ids': {i: by_id[i]['quantity'] if i in by_id else 0.0 for i in ids},
+    }
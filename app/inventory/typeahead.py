@@ -0,0 +1,272 @@
+"""In-process prefix index over the ``rs_product`` mirror for typeahead.
+
+Each keystroke in the product pickers would otherwise cost an FTS query.
+When ``TYPEAHEAD_ENABLED`` is set the app keeps a compact snapshot of the
+mirror in memory instead: products sorted by name in parallel arrays, plus
+a sorted list of every word in their name, SKU and UPC with an ``array`` of
+the products each word belongs to.  A query is a bisect per word, so first
+page results come back in microseconds.  The snapshot is built at startup.
+On SQLite, triggers bump the single ``rs_product_revision`` row whenever a
+product is added, removed or has an indexed column changed, by any writer.
+Every ``RS_TYPEAHEAD_CHECK`` seconds a search starts a background check
+that reads that row and, if it moved, builds a new snapshot and swaps it in
+with a single assignment, so readers never see a half-built index.  Other
+databases have no triggers; there the snapshot is rebuilt only after
+:func:`mark_stale` (called for webhook changes) or ``rs-export reindex``.
+"""
+import heapq
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+from flask import current_app
+from sqlalchemy import event, select, text
+
+from app import db
+from app.models import RSProduct, RSProductRevision
+
+logger = logging.getLogger(__name__)
+
+CHECK_INTERVAL = float(os.getenv("RS_TYPEAHEAD_CHECK", "30"))
+
+_WORD = re.compile(r"\w+")
+
+
+def _words(*values) -> set:
+    return {w for v in values if v for w in _WORD.findall(str(v).casefold())}
+
+
+class TypeaheadIndex:
+    """Immutable snapshot of the product mirror keyed by word prefixes."""
+
+    __slots__ = (
+        "build_seconds", "built_at", "descriptions", "ids", "names",
+        "offsets", "postings", "price_cost", "price_retail", "quantity",
+        "revision", "words",
+    )
+
+    def __init__(self, rows, revision=None) -> None:
+        start = time.perf_counter()
+        rows = sorted(rows, key=lambda r: ((r[1] or "").casefold(), r[0]))
+        self.ids = array("q", (r[0] for r in rows))
+        self.names = [r[1] or "" for r in rows]
+        self.descriptions = []
+        for r in rows:
+            desc = (r[4] or "").strip()
+            self.descriptions.append(desc[:100] + "…" if len(desc) > 100 else desc)
+        self.price_cost = array("d", (float(r[5] or 0) for r in rows))
+        self.price_retail = array("d", (float(r[6] or 0) for r in rows))
+        self.quantity = array("d", (float(r[7] or 0) for r in rows))
+
+        by_word: dict = {}
+        for pos, r in enumerate(rows):
+            for w in _words(r[1], r[2], r[3]):
+                by_word.setdefault(w, []).append(pos)
+        # Postings for words[i] are postings[offsets[i]:offsets[i + 1]],
+        # ascending positions (i.e. name order).
+        self.words = sorted(by_word)
+        self.offsets = array("l", [0])
+        self.postings = array("l")
+        for w in self.words:
+            self.postings.extend(by_word[w])
+            self.offsets.append(len(self.postings))
+
+        self.revision = revision
+        self.build_seconds = time.perf_counter() - start
+        self.built_at = time.time()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _positions(self, prefix: str) -> set:
+        out: set = set()
+        i = bisect_left(self.words, prefix)
+        while i < len(self.words) and self.words[i].startswith(prefix):
+            out.update(self.postings[self.offsets[i]:self.offsets[i + 1]])
+            i += 1
+        return out
+
+    def search(self, query: str, limit: int = 50) -> list | None:
+        """Products with a word starting with every word of ``query``.
+
+        Names starting with the query rank first, then name order.  Returns
+        ``None`` when the query has no words.
+        """
+        terms = sorted(_words(query), key=len, reverse=True)
+        if not terms:
+            return None
+        hits = self._positions(terms[0])
+        for t in terms[1:]:
+            if not hits:
+                break
+            hits &= self._positions(t)
+        # Rows are in name order, so names starting with the query are one
+        # contiguous run of positions.
+        needle = " ".join((query or "").split()).casefold()
+        lo = bisect_left(self.names, needle, key=str.casefold)
+        hi = bisect_left(self.names, needle + "\U0010ffff", key=str.casefold)
+        ranked = heapq.nsmallest(limit, hits, key=lambda pos: (not lo <= pos < hi, pos))
+        return [self.row(pos) for pos in ranked]
+
+    def row(self, pos: int) -> dict:
+        """A product in the shape of :func:`app.api.repairshopr.summarize_product`."""
+        return {
+            "id": self.ids[pos],
+            "name": self.names[pos],
+            "description": self.descriptions[pos],
+            "price_cost": self.price_cost[pos],
+            "price_retail": self.price_retail[pos],
+            "quantity": self.quantity[pos],
+        }
+
+    def memory_bytes(self) -> int:
+        """Approximate footprint of the snapshot's containers and strings."""
+        size = sum(sys.getsizeof(a) for a in (
+            self.ids, self.price_cost, self.price_retail, self.quantity,
+            self.offsets, self.postings, self.names, self.descriptions, self.words,
+        ))
+        for strings in (self.names, self.descriptions, self.words):
+            size += sum(sys.getsizeof(s) for s in strings)
+        return size
+
+    def stats(self) -> dict:
+        return {
+            "products": len(self),
+            "words": len(self.words),
+            "memory_bytes": self.memory_bytes(),
+            "build_seconds": round(self.build_seconds, 4),
+            "built_at": self.built_at,
+        }
+
+
+_index: TypeaheadIndex | None = None
+_lock = threading.Lock()
+_rebuilding = False
+_forced = False
+_last_check = 0.0
+
+
+def enabled() -> bool:
+    return bool(current_app.config.get("TYPEAHEAD_ENABLED"))
+
+
+_COLUMNS = (
+    RSProduct.id, RSProduct.name, RSProduct.sku, RSProduct.upc_code,
+    RSProduct.description, RSProduct.price_cost, RSProduct.price_retail,
+    RSProduct.quantity,
+)
+_INDEXED = ", ".join(c.key for c in _COLUMNS[1:])
+_BUMP = "UPDATE rs_product_revision SET value = value + 1 WHERE id = 1;"
+
+REVISION_STATEMENTS = (
+    "INSERT OR IGNORE INTO rs_product_revision (id, value) VALUES (1, 0)",
+    *(
+        f"CREATE TRIGGER IF NOT EXISTS rs_product_rev_{name} AFTER {when} "
+        f"ON rs_product BEGIN {_BUMP} END"
+        for name, when in (
+            ("ai", "INSERT"), ("ad", "DELETE"), ("au", f"UPDATE OF {_INDEXED}"),
+        )
+    ),
+)
+
+
+def create_revision_triggers(connection) -> bool:
+    """Create the revision row and its triggers; ``False`` off SQLite."""
+    if connection.dialect.name != "sqlite":
+        return False
+    for stmt in REVISION_STATEMENTS:
+        connection.execute(text(stmt))
+    return True
+
+
+@event.listens_for(db.Model.metadata, "after_create")
+def _after_create(target, connection, **kw):
+    # after every table, since the triggers span rs_product and the counter
+    create_revision_triggers(connection)
+
+
+def revision() -> int | None:
+    """Current mirror revision, or ``None`` where no trigger maintains it."""
+    if db.engine.dialect.name != "sqlite":
+        return None
+    return db.session.execute(
+        select(RSProductRevision.value).where(RSProductRevision.id == 1)
+    ).scalar()
+
+
+def rebuild() -> dict:
+    """Build a fresh snapshot from the mirror and swap it in."""
+    global _index, _last_check
+    # read before the rows: a write in between only causes another rebuild
+    rev = revision()
+    rows = db.session.query(*_COLUMNS).order_by(RSProduct.id).all()
+    new = TypeaheadIndex(rows, rev)
+    _index = new
+    _last_check = time.monotonic()
+    stats = new.stats()
+    logger.info(
+        "Typeahead index rebuilt: %d products, %d words, %.1f KiB in %.3fs",
+        stats["products"], stats["words"], stats["memory_bytes"] / 1024,
+        stats["build_seconds"],
+    )
+    return stats
+
+
+def _refresh_if_changed(app, force: bool = False) -> None:
+    global _rebuilding
+    try:
+        with app.app_context():
+            current = _index
+            rev = revision()
+            if current is None or (force if rev is None else rev != current.revision):
+                rebuild()
+    except Exception:  # keep serving the previous snapshot
+        logger.exception("Typeahead index refresh failed")
+    finally:
+        with _lock:
+            _rebuilding = False
+
+
+def _maybe_refresh() -> None:
+    global _last_check, _rebuilding, _forced
+    now = time.monotonic()
+    with _lock:
+        if _rebuilding or now - _last_check < CHECK_INTERVAL:
+            return
+        _last_check = now
+        _rebuilding = True
+        force, _forced = _forced, False
+    threading.Thread(
+        target=_refresh_if_changed,
+        args=(current_app._get_current_object(), force),
+        daemon=True,
+    ).start()
+
+
+def mark_stale() -> None:
+    """Have the next search check the mirror for changes right away."""
+    global _last_check, _forced
+    with _lock:
+        _last_check = 0.0
+        _forced = True
+
+
+def search(query: str, limit: int = 50) -> list | None:
+    """Answer from the in-memory snapshot, or ``None`` if it can't."""
+    if not enabled():
+        return None
+    index = _index
+    if index is None:
+        return None
+    _maybe_refresh()
+    return index.search(query, limit)
+
+
+def stats() -> dict | None:
+    index = _index
+    return index.stats() if index is not None else None
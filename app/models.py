@@ -1,10 +1,27 @@
+import logging
+from datetime import UTC, datetime
+
+from sqlalchemy import inspect, text
+from sqlalchemy.ext.hybrid import hybrid_property
+
 from app import db
 
+logger = logging.getLogger(__name__)
+
+
+def utcnow() -> datetime:
+    """Current UTC time as a naive datetime, the form stored in every column."""
+    return datetime.now(UTC).replace(tzinfo=None)
+
+
 class Bundle(db.Model):
     __tablename__ = 'bundle'
     id          = db.Column(db.Integer, primary_key=True)
     name        = db.Column(db.String(100), unique=True, nullable=False)
     description = db.Column(db.Text, nullable=True)
+    # Redrawn from BundleVersionCounter on every change to the bundle or its
+    # items, so no two states of any bundle share a version (app.bundles.payloads)
+    version     = db.Column(db.Integer, nullable=False, default=1, server_default='1')
     items       = db.relationship(
                     'BundleItem',
                     backref='bundle',
@@ -12,11 +29,18 @@ class Bundle(db.Model):
                     cascade='all, delete-orphan'
                   )
 
+class BundleVersionCounter(db.Model):
+    """Single-row clock that bundle versions are drawn from (app.bundles.payloads)."""
+    __tablename__ = 'bundle_version_counter'
+    id    = db.Column(db.Integer, primary_key=True)
+    value = db.Column(db.Integer, nullable=False)
+
 class BundleItem(db.Model):
     __tablename__ = 'bundle_item'
     id           = db.Column(db.Integer, primary_key=True)
     bundle_id    = db.Column(db.Integer, db.ForeignKey('bundle.id'), nullable=False)
     product_name = db.Column(db.String(200), nullable=False)
+    product_id   = db.Column(db.Integer, nullable=True, index=True)  # RepairShopr product id
     description  = db.Column(db.Text, nullable=True, default='')    # ← NEW
     quantity     = db.Column(db.Integer, default=1)
     unit_price   = db.Column(db.Float, default=0.0)
@@ -29,6 +53,19 @@ class Estimate(db.Model):
     customer_name     = db.Column(db.String(200), nullable=False)
     customer_address  = db.Column(db.String(200))
     status            = db.Column(db.String(32), nullable=False, default='draft')
+    # Filtered on by exports (app.estimates.export); NULL for older rows
+    created_at        = db.Column(db.DateTime, default=utcnow, index=True)
+
+    # Totals of visible line items only, kept current by app.estimates.totals.
+    #
+    # When a bundle is added to an estimate we store a parent line for the
+    # bundle itself and child lines for each product in that bundle.  The
+    # child lines allow per‑estimate price customisation but should not be
+    # counted again when calculating estimate totals.  Therefore only
+    # top‑level items (those without a parent) contribute to the summary
+    # figures.
+    total_cost        = db.Column(db.Float, nullable=False, default=0.0, index=True)
+    total_retail      = db.Column(db.Float, nullable=False, default=0.0, index=True)
 
     items = db.relationship(
         'EstimateItem',
@@ -37,28 +74,13 @@ class Estimate(db.Model):
         cascade='all, delete-orphan'
     )
 
-    @property
-    def total_cost(self):
-        """Total cost of visible line items only.
-
-        When a bundle is added to an estimate we store a parent line for the
-        bundle itself and child lines for each product in that bundle.  The
-        child lines allow per‑estimate price customisation but should not be
-        counted again when calculating estimate totals.  Therefore only
-        top‑level items (those without a parent) contribute to the summary
-        figures.
-        """
-        return sum(
-            i.quantity * i.unit_price for i in self.items if i.parent_id is None
-        )
-
-    @property
-    def total_retail(self):
-        return sum(
-            i.quantity * i.retail for i in self.items if i.parent_id is None
-        )
+    # The list page filters by status or customer and pages by id
+    __table_args__ = (
+        db.Index('ix_estimate_status_id', 'status', 'id'),
+        db.Index('ix_estimate_customer_id_id', 'customer_id', 'id'),
+    )
 
-    @property
+    @hybrid_property
     def profit(self):
         return self.total_retail - self.total_cost
 
@@ -68,6 +90,7 @@ class EstimateItem(db.Model):
     estimate_id  = db.Column(db.Integer, db.ForeignKey('estimate.id'), nullable=False)
     type         = db.Column(db.String(32), nullable=False)  # 'product' or 'bundle'
     object_id    = db.Column(db.Integer, nullable=False)     # product.id or bundle.id
+    product_id   = db.Column(db.Integer, nullable=True, index=True)  # RepairShopr product id
     name         = db.Column(db.String(200), nullable=False)
     description  = db.Column(db.Text)
     quantity     = db.Column(db.Integer, default=1)
@@ -86,6 +109,13 @@ class EstimateItem(db.Model):
     def line_total(self):
         return self.quantity * self.unit_price
 
+class RSProductRevision(db.Model):
+    """Single-row counter bumped by a trigger on each ``rs_product`` change (app.inventory.typeahead)."""
+    __tablename__ = 'rs_product_revision'
+    id    = db.Column(db.Integer, primary_key=True)
+    value = db.Column(db.Integer, nullable=False)
+
+
 class RSProduct(db.Model):
     __tablename__ = 'rs_product'
     id = db.Column(db.Integer, primary_key=True)
@@ -202,3 +232,89 @@ class RSPurchaseOrder(db.Model):
     shipping = db.Column(db.Float)
     other = db.Column(db.Float)
     line_items = db.Column(db.JSON)
+
+
+class RSSyncState(db.Model):
+    """Progress of the ``rs-sync`` worker for one mirrored stream."""
+    __tablename__ = 'rs_sync_state'
+    stream = db.Column(db.String(32), primary_key=True)
+    cursor = db.Column(db.String)            # highest updated_at seen
+    page = db.Column(db.Integer, default=1)  # next page of the id-ordered sweep
+    last_id = db.Column(db.Integer)          # sweep cursor: highest product id done this lap
+    records = db.Column(db.Integer, default=0)
+    last_run_at = db.Column(db.DateTime)
+    last_success_at = db.Column(db.DateTime)
+    lap_started_at = db.Column(db.DateTime)
+    lap_completed_at = db.Column(db.DateTime)  # start of the last complete sweep
+    last_error = db.Column(db.Text)
+
+
+class RSWebhookEvent(db.Model):
+    """A RepairShopr webhook delivery, kept until applied to the mirror."""
+    __tablename__ = 'rs_webhook_event'
+    id = db.Column(db.Integer, primary_key=True)
+    resource = db.Column(db.String(32), nullable=False)  # products, customers, invoices
+    action = db.Column(db.String(32))
+    record_id = db.Column(db.Integer)
+    payload = db.Column(db.JSON)
+    received_at = db.Column(db.DateTime, default=utcnow)
+    processed_at = db.Column(db.DateTime, index=True)
+    attempts = db.Column(db.Integer, default=0)
+    error = db.Column(db.Text)
+
+
+class PushJob(db.Model):
+    """A queued push of an estimate to RepairShopr (see ``app.estimates.push``)."""
+    __tablename__ = 'push_job'
+    id = db.Column(db.Integer, primary_key=True)
+    estimate_id = db.Column(db.Integer, db.ForeignKey('estimate.id'), nullable=False, index=True)
+    idempotency_key = db.Column(db.String(64), unique=True)
+    status = db.Column(db.String(16), nullable=False, default='queued')
+    payload = db.Column(db.JSON)               # customer and line items as pushed
+    number = db.Column(db.Integer)             # estimate number, fixed on first attempt
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=utcnow)
+    rs_estimate_id = db.Column(db.Integer)
+    result = db.Column(db.JSON)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_push_job_due', 'status', 'next_attempt_at'),
+        # At most one unfinished push per estimate, enforced under concurrency
+        db.Index('ux_push_job_unfinished', 'estimate_id', unique=True,
+                 sqlite_where=text("status IN ('queued', 'retrying', 'running')"),
+                 postgresql_where=text("status IN ('queued', 'retrying', 'running')")),
+    )
+
+
+class EstimateNumberSequence(db.Model):
+    """Next RepairShopr estimate number to hand out (see ``app.estimates.numbers``)."""
+    __tablename__ = 'estimate_number_seq'
+    name = db.Column(db.String(32), primary_key=True)
+    next_number = db.Column(db.Integer, nullable=False)
+    seeded_at = db.Column(db.DateTime)  # last time checked against RepairShopr
+
+
+def ensure_product_id_columns() -> None:
+    """Add ``product_id`` to line-item tables that predate it."""
+    added = []
+    with db.engine.begin() as conn:
+        for table in (BundleItem.__table__, EstimateItem.__table__):
+            existing = {c["name"] for c in inspect(conn).get_columns(table.name)}
+            if "product_id" in existing:
+                continue
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN product_id INTEGER"))
+            added.append(table.name)
+    if added:
+        logger.info("Added product_id column to %s", ", ".join(added))
+
+
+def create_missing_indexes() -> None:
+    """Add indexes declared here to tables created before they existed."""
+    for table in (Estimate.__table__, Bundle.__table__,
+                  EstimateItem.__table__, BundleItem.__table__, PushJob.__table__):
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
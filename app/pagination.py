@@ -0,0 +1,51 @@
+"""Keyset pagination for the list pages.
+
+Pages are addressed by the sort key of a row on the neighbouring page
+rather than by an offset, so every page is one indexed range scan of
+``limit + 1`` rows however deep into the table it is, and rows inserted
+meanwhile don't shift later pages.
+"""
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+def clamp_limit(limit) -> int:
+    return max(1, min(limit or DEFAULT_LIMIT, MAX_LIMIT))
+
+
+def clamp_page(page) -> int:
+    """Page numbers for the offset-paged searches start at 1."""
+    return max(page or 1, 1)
+
+
+def keyset_page(query, column, after=None, before=None, limit=DEFAULT_LIMIT,
+                descending=False):
+    """One page of ``query`` ordered by the unique ``column``.
+
+    ``after`` returns the rows that follow that key in display order and
+    ``before`` the rows that precede it; with neither the first page is
+    returned.  Returns ``(rows, next_cursor, prev_cursor)`` where each
+    cursor is the key to pass as ``after``/``before`` for the adjacent page,
+    or ``None`` at either end.
+    """
+    limit = clamp_limit(limit)
+    forward = column.asc() if not descending else column.desc()
+    backward = column.desc() if not descending else column.asc()
+    if before is None:
+        if after is not None:
+            query = query.filter(column < after if descending else column > after)
+        rows = query.order_by(forward).limit(limit + 1).all()
+        has_next, has_prev = len(rows) > limit, after is not None
+        rows = rows[:limit]
+    else:
+        query = query.filter(column > before if descending else column < before)
+        rows = query.order_by(backward).limit(limit + 1).all()
+        has_next, has_prev = True, len(rows) > limit
+        rows = rows[:limit][::-1]
+    if not rows:
+        return rows, None, None
+    key = column.key
+    return (rows,
+            getattr(rows[-1], key) if has_next else None,
+            getattr(rows[0], key) if has_prev else None)
@@ -0,0 +1,82 @@
+"""Upgrades for databases created before the current models.
+
+Tables, columns and indexes added since a database was created are applied
+by ``flask schema upgrade``.  Run it once per deploy, before starting the
+web workers: ``CREATE TABLE`` and ``ALTER TABLE`` are not safe to race, so
+workers only create the tables of an empty database and otherwise check
+for pending changes at startup and log a warning.
+"""
+import logging
+
+import click
+from sqlalchemy import inspect
+
+from app import db, models
+from app.bundles import payloads
+from app.estimates import export, totals
+from app.inventory import ensure_indexes
+
+logger = logging.getLogger(__name__)
+
+# (table, column) pairs added to tables that already existed in deployments
+COLUMNS = (
+    ("bundle", "version"),
+    ("bundle_item", "product_id"),
+    ("estimate", "created_at"),
+    ("estimate", "total_cost"),
+    ("estimate", "total_retail"),
+    ("estimate_item", "product_id"),
+)
+
+
+def pending() -> list:
+    """Tables and ``table.column`` names the database is still missing."""
+    inspector = inspect(db.engine)
+    tables = set(inspector.get_table_names())
+    missing = [name for name in db.metadata.tables if name not in tables]
+    for table, column in COLUMNS:
+        if table not in tables:
+            continue
+        existing = {c["name"] for c in inspector.get_columns(table)}
+        if column not in existing:
+            missing.append(f"{table}.{column}")
+    return missing
+
+
+def upgrade() -> list:
+    """Apply every pending table, column, index and full-text change.
+
+    Returns what was missing beforehand.
+    """
+    missing = pending()
+    db.create_all()
+    models.ensure_product_id_columns()
+    totals.ensure_columns()
+    export.ensure_created_at_column()
+    payloads.ensure_version_column()
+    models.create_missing_indexes()
+    ensure_indexes()
+    return missing
+
+
+def create_or_check() -> None:
+    """Startup hook: create an empty database, else report pending upgrades."""
+    if not inspect(db.engine).get_table_names():
+        db.create_all()
+        return
+    missing = pending()
+    if missing:
+        logger.warning("Database schema is out of date (missing %s); "
+                       "run `flask schema upgrade`", ", ".join(missing))
+
+
+@click.group("schema")
+def schema_cli() -> None:
+    """Database schema commands."""
+
+
+@schema_cli.command("upgrade")
+def upgrade_command() -> None:
+    """Add the tables, columns, indexes and search tables newer code expects."""
+    missing = upgrade()
+    click.echo(f"Added {', '.join(missing)}" if missing else "Schema is up to date")
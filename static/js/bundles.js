@@ -12,6 +12,22 @@ document.addEventListener('DOMContentLoaded', () => {
   let page = 1;
   let draggedRow;
 
+  // Recent search results by URL, so retyping a query doesn't refetch it.
+  // Older entries are refetched; the browser revalidates those with
+  // If-None-Match and the server answers 304 when nothing changed.
+  const jsonCache = new Map();
+  const JSON_CACHE_MS = 30000;
+  async function getJSON(url, opts = {}) {
+    const hit = jsonCache.get(url);
+    if (hit && Date.now() - hit.at < JSON_CACHE_MS) return hit.data;
+    const res = await fetch(url, opts);
+    if (!res.ok) throw new Error(`HTTP ${res.status}`);
+    const data = await res.json();
+    jsonCache.set(url, { at: Date.now(), data });
+    if (jsonCache.size > 100) jsonCache.delete(jsonCache.keys().next().value);
+    return data;
+  }
+
   function recalcTotals() {
     let totalCost = 0, totalRetail = 0;
     itemsBody.querySelectorAll('tr').forEach(row => {
@@ -36,8 +52,34 @@ document.addEventListener('DOMContentLoaded', () => {
   // Initial calc on page load
   recalcTotals();
 
+  // Stock levels are fetched in one batch after the page renders
+  async function loadStock() {
+    const cells = [...itemsBody.querySelectorAll('.stock-cell[data-stock-name]')];
+    if (!cells.length) return;
+    const ids   = [...new Set(cells.filter(c => c.dataset.stockId).map(c => c.dataset.stockId))];
+    const names = [...new Set(cells.filter(c => !c.dataset.stockId).map(c => c.dataset.stockName))];
+    try {
+      const res = await fetch('/bundles/stock', {
+        method: 'POST',
+        headers: {'Content-Type':'application/json'},
+        body: JSON.stringify({ ids, names })
+      });
+      if (!res.ok) throw new Error(await res.text());
+      const stock = await res.json();
+      cells.forEach(c => {
+        const qty = (c.dataset.stockId ? stock.ids[c.dataset.stockId]
+                                       : stock.names[c.dataset.stockName]) ?? 0;
+        c.textContent = qty;
+        c.closest('tr').classList.toggle('table-danger', qty === 0);
+      });
+    } catch (err) {
+      console.error('Stock lookup error:', err);
+    }
+  }
+  loadStock();
+
   // Live search
-  function renderResults(products, reset = true) {
+  function renderResults(products, reset = true, hasMore = false) {
     if (reset) resultsList.innerHTML = '';
     resultsList.innerHTML += products.map(p => `
       <li class="list-group-item d-flex justify-content-between align-items-center"
@@ -61,7 +103,7 @@ document.addEventListener('DOMContentLoaded', () => {
         </div>
       </li>
     `).join('');
-    if (products.length === 25) {
+    if (hasMore) {
       const li = document.createElement('li');
       li.className = 'list-group-item text-center load-more';
       li.textContent = 'Load more…';
@@ -87,9 +129,9 @@ document.addEventListener('DOMContentLoaded', () => {
       try {
         if (abortCtrl) abortCtrl.abort();
         abortCtrl = new AbortController();
-        const res = await fetch(`/bundles/search?q=${encodeURIComponent(q)}&page=${page}`, { signal: abortCtrl.signal });
-        const { products } = await res.json();
-        renderResults(products, true);
+        const { products, has_more } = await getJSON(
+          `/bundles/search?q=${encodeURIComponent(q)}&page=${page}`, { signal: abortCtrl.signal });
+        renderResults(products, true, has_more);
       } catch (err) {
         if (err.name !== 'AbortError') {
           console.error('Search fetch error:', err);
@@ -105,9 +147,9 @@ document.addEventListener('DOMContentLoaded', () => {
       const q = searchInput.value.trim();
       e.target.remove();
       page += 1;
-      const res = await fetch(`/bundles/search?q=${encodeURIComponent(q)}&page=${page}`);
-      const { products } = await res.json();
-      renderResults(products, false);
+      const { products, has_more } = await getJSON(
+        `/bundles/search?q=${encodeURIComponent(q)}&page=${page}`);
+      renderResults(products, false, has_more);
       return;
     }
     if (!e.target.classList.contains('add-btn')) return;
@@ -11,6 +11,22 @@ document.addEventListener('DOMContentLoaded', () => {
     };
   }
 
+  // Recent search results by URL, so retyping a query doesn't refetch it.
+  // Older entries are refetched; the browser revalidates those with
+  // If-None-Match and the server answers 304 when nothing changed.
+  const jsonCache = new Map();
+  const JSON_CACHE_MS = 30000;
+  async function getJSON(url, opts = {}) {
+    const hit = jsonCache.get(url);
+    if (hit && Date.now() - hit.at < JSON_CACHE_MS) return hit.data;
+    const res = await fetch(url, opts);
+    if (!res.ok) throw new Error(`HTTP ${res.status}`);
+    const data = await res.json();
+    jsonCache.set(url, { at: Date.now(), data });
+    if (jsonCache.size > 100) jsonCache.delete(jsonCache.keys().next().value);
+    return data;
+  }
+
   // --- Customer search ---
   const csIn  = document.getElementById('customer-search');
   const csId  = document.getElementById('customer-id');
@@ -91,18 +107,41 @@ document.addEventListener('DOMContentLoaded', () => {
   }
 
   // --- Push to RepairShopr ---
+  // The push runs as a background job; poll its status until it finishes.
+  // One key per page load makes repeated clicks reuse the same job.
   const pushBtn = document.getElementById('push-rs');
+  const pushKey = (window.crypto && crypto.randomUUID)
+    ? crypto.randomUUID() : `${estId}-${Date.now()}-${Math.random()}`;
   if (pushBtn) {
     pushBtn.addEventListener('click', async () => {
+      pushBtn.disabled = true;
       try {
-        const res = await fetch(`/estimates/${estId}/push`, { method: 'POST' });
-        if (res.ok) {
+        const res = await fetch(`/estimates/${estId}/push`, {
+          method: 'POST',
+          headers: { 'Idempotency-Key': pushKey }
+        });
+        if (!res.ok) {
+          alert('Error pushing to RepairShopr');
+          return;
+        }
+        let { job, status_url } = await res.json();
+        // Retries back off for minutes; stop watching after two of them.
+        const deadline = Date.now() + 2 * 60 * 1000;
+        while (!['succeeded', 'failed'].includes(job.status) && Date.now() < deadline) {
+          await new Promise(r => setTimeout(r, 1500));
+          job = (await (await fetch(status_url)).json()).job;
+        }
+        if (job.status === 'succeeded') {
           alert('Estimate pushed to RepairShopr');
+        } else if (job.status !== 'failed') {
+          alert('The push is still in progress; check the estimate in RepairShopr later');
         } else {
-          alert('Error pushing to RepairShopr');
+          alert(`Error pushing to RepairShopr: ${job.error || 'unknown error'}`);
         }
       } catch (err) {
         console.error('Push error:', err);
+      } finally {
+        pushBtn.disabled = false;
       }
     });
   }
@@ -116,8 +155,7 @@ document.addEventListener('DOMContentLoaded', () => {
       bsSug.innerHTML = '';
       return;
     }
-    const res = await fetch(`/bundles/search-bundles?q=${encodeURIComponent(q)}`);
-    const { bundles } = await res.json();
+    const { bundles } = await getJSON(`/bundles/search-bundles?q=${encodeURIComponent(q)}`);
     bsSug.innerHTML = bundles.map(p => `
       <li class="list-group-item d-flex justify-content-between align-items-center"
           data-id="${p.id}"
@@ -171,7 +209,7 @@ bsSug.addEventListener('click', async e => {
     return isBarcode || isSku || q.length >= 2;
   }
 
-  function renderProd(products, reset = true) {
+  function renderProd(products, reset = true, hasMore = false) {
     if (reset) psSug.innerHTML = '';
     psSug.innerHTML += products.map(p => `
       <li class="list-group-item d-flex justify-content-between align-items-center"
@@ -195,7 +233,7 @@ bsSug.addEventListener('click', async e => {
         </div>
       </li>
     `).join('');
-    if (products.length === 25) {
+    if (hasMore) {
       const li = document.createElement('li');
       li.className = 'list-group-item text-center load-more';
       li.textContent = 'Load more…';
@@ -213,9 +251,9 @@ bsSug.addEventListener('click', async e => {
     try {
       if (psAbort) psAbort.abort();
       psAbort = new AbortController();
-      const res = await fetch(`/estimates/search?q=${encodeURIComponent(q)}&page=${psPage}`, { signal: psAbort.signal });
-      const { products } = await res.json();
-      renderProd(products, true);
+      const { products, has_more } = await getJSON(
+        `/estimates/search?q=${encodeURIComponent(q)}&page=${psPage}`, { signal: psAbort.signal });
+      renderProd(products, true, has_more);
     } catch (err) {
       if (err.name !== 'AbortError') {
         console.error('Search fetch error:', err);
@@ -229,9 +267,9 @@ bsSug.addEventListener('click', async e => {
       const q = psIn.value.trim();
       e.target.remove();
       psPage += 1;
-      const res = await fetch(`/estimates/search?q=${encodeURIComponent(q)}&page=${psPage}`);
-      const { products } = await res.json();
-      renderProd(products, false);
+      const { products, has_more } = await getJSON(
+        `/estimates/search?q=${encodeURIComponent(q)}&page=${psPage}`);
+      renderProd(products, false, has_more);
       return;
     }
     if (!e.target.classList.contains('add-btn')) return;
@@ -473,33 +511,31 @@ bsSug.addEventListener('click', async e => {
     const descInp = row.querySelector('.item-desc');
     if (nameInp) payload.name = nameInp.value;
     if (descInp) payload.description = descInp.value;
-    await fetch(`/estimates/${estId}/update-item/${id}`, {
-      method:'POST',
-      headers:{'Content-Type':'application/json'},
-      body:JSON.stringify(payload)
-    });
+    const edits = [{ id, ...payload }];
 
-    // If the bundle quantity changed, update child line quantities accordingly
+    // If the bundle quantity changed, scale the child line quantities too;
+    // the parent and all its children are saved in one request.
     if (row.dataset.type === 'bundle' && e.target.classList.contains('qty')) {
       const oldQty = parseFloat(row.dataset.qty || '1');
       const newQty = parseFloat(row.querySelector('.qty').value) || 0;
       if (oldQty > 0) {
         const ratio = newQty / oldQty;
         row.dataset.qty = newQty;
-        const children = document.querySelectorAll(`tr[data-parent-id="${id}"]`);
-        for (const child of children) {
+        document.querySelectorAll(`tr[data-parent-id="${id}"]`).forEach(child => {
           const qInput = child.querySelector('.qty');
           const newChildQty = parseFloat(qInput.value) * ratio;
           qInput.value = newChildQty;
-          await fetch(`/estimates/${estId}/update-item/${child.dataset.itemId}`, {
-            method:'POST',
-            headers:{'Content-Type':'application/json'},
-            body:JSON.stringify({ quantity: newChildQty })
-          });
-        }
+          edits.push({ id: child.dataset.itemId, quantity: newChildQty });
+        });
       }
     }
 
+    await fetch(`/estimates/${estId}/update-items`, {
+      method:'POST',
+      headers:{'Content-Type':'application/json'},
+      body:JSON.stringify({ items: edits })
+    });
+
     recalc();
   });
 
@@ -550,6 +586,32 @@ bsSug.addEventListener('click', async e => {
     draggedRows = [];
   });
 
+  // --- Stock levels: fetched in one batch after the page renders ---
+  async function loadStock() {
+    const cells = [...document.querySelectorAll('#items-body .stock-cell[data-stock-name]')];
+    if (!cells.length) return;
+    const ids   = [...new Set(cells.filter(c => c.dataset.stockId).map(c => c.dataset.stockId))];
+    const names = [...new Set(cells.filter(c => !c.dataset.stockId).map(c => c.dataset.stockName))];
+    try {
+      const res = await fetch('/estimates/stock', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ ids, names })
+      });
+      if (!res.ok) throw new Error(await res.text());
+      const stock = await res.json();
+      cells.forEach(c => {
+        const qty = c.dataset.stockId ? stock.ids[c.dataset.stockId]
+                                      : stock.names[c.dataset.stockName];
+        c.textContent = qty ?? 0;
+      });
+      recalc();
+    } catch (err) {
+      console.error('Stock lookup error:', err);
+    }
+  }
+
   // Initial calculation
   recalc();
+  loadStock();
 }); // end DOMContentLoaded
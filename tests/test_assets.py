@@ -0,0 +1,79 @@
+import gzip
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import assets, create_app, db
+from app.models import RSProduct
+
+
+def setup_app():
+    os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+    app = create_app('development')
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite:///:memory:')
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return app
+
+
+def test_templates_emit_fingerprinted_static_urls():
+    app = setup_app()
+    client = app.test_client()
+    html = client.get('/bundles/').get_data(as_text=True)
+    url = re.search(r'href="(/static/css/style\.css\?v=[0-9a-f]{12})"', html).group(1)
+
+    resp = client.get(url)
+    assert resp.status_code == 200
+    assert resp.headers['Cache-Control'] == assets.IMMUTABLE
+    resp = client.get('/static/css/style.css?v=stale')
+    assert 'immutable' not in resp.headers.get('Cache-Control', '')
+
+
+def test_large_json_is_compressed_for_clients_that_accept_it():
+    app = setup_app()
+    with app.app_context():
+        db.session.add_all([RSProduct(id=n, name=f'Widget {n}', description='x' * 40,
+                                      price_cost=1.0, quantity=1) for n in range(1, 40)])
+        db.session.commit()
+    client = app.test_client()
+    plain = client.get('/estimates/search?q=widget&limit=25')
+    assert 'Content-Encoding' not in plain.headers
+
+    packed = client.get('/estimates/search?q=widget&limit=25',
+                        headers={'Accept-Encoding': 'gzip'})
+    assert packed.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in packed.headers['Vary']
+    assert gzip.decompress(packed.data) == plain.data
+    assert packed.headers['ETag'] == 'W/' + plain.headers['ETag']
+    again = client.get('/estimates/search?q=widget&limit=25',
+                       headers={'Accept-Encoding': 'gzip',
+                                'If-None-Match': packed.headers['ETag']})
+    assert again.status_code == 304
+
+    small = client.get('/estimates/search?q=nothing', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in small.headers
+
+
+def test_precompressed_assets_are_served_until_the_source_changes(tmp_path):
+    app = setup_app()
+    (tmp_path / 'js').mkdir()
+    source = tmp_path / 'js' / 'app.js'
+    source.write_text('console.log("hi");\n' * 50)
+    app.static_folder = str(tmp_path)
+    assert sorted(os.path.basename(p) for p in assets.precompress(str(tmp_path))) \
+        in (['app.js.gz'], ['app.js.br', 'app.js.gz'])
+
+    client = app.test_client()
+    resp = client.get('/static/js/app.js', headers={'Accept-Encoding': 'gzip'})
+    assert resp.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(resp.data) == source.read_bytes()
+    resp.close()
+
+    source.write_text('console.log("changed");\n')
+    resp = client.get('/static/js/app.js', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in resp.headers
+    assert resp.data == source.read_bytes()
+    resp.close()
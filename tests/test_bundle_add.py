@@ -0,0 +1,74 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import event
+
+from app import create_app, db
+from app.models import Bundle, BundleItem, Estimate, EstimateItem
+
+
+def setup_app():
+    os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+    app = create_app('development')
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite:///:memory:')
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return app
+
+
+def test_bundle_children_are_inserted_in_bulk(monkeypatch):
+    app = setup_app()
+    stock_calls = []
+
+    def fake_stock(names=(), ids=()):
+        stock_calls.append((list(names), list(ids)))
+        return {'names': {n: 1.0 for n in names}, 'ids': {i: 7.0 for i in ids}}
+
+    monkeypatch.setattr('app.estimates.routes.stock_levels', fake_stock)
+    with app.app_context():
+        est = Estimate(customer_name='Cust', customer_address='')
+        bundle = Bundle(name='Kit')
+        db.session.add_all([est, bundle])
+        db.session.flush()
+        db.session.add_all([
+            BundleItem(bundle_id=bundle.id, product_name=f'Part {n}',
+                       product_id=(100 + n if n % 2 else None),
+                       quantity=2, unit_price=1.5, retail=3.0)
+            for n in range(25)
+        ])
+        db.session.commit()
+        est_id, bundle_id = est.id, bundle.id
+
+        inserts = []
+
+        def before(conn, cursor, statement, params, context, executemany):
+            if statement.lstrip().upper().startswith('INSERT'):
+                inserts.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', before)
+        try:
+            resp = app.test_client().post(f'/estimates/{est_id}/add-item',
+                                          json={'type': 'bundle', 'id': bundle_id,
+                                                'quantity': 3})
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before)
+
+        data = resp.get_json()
+        assert len(inserts) == 2  # parent, then every child at once
+        assert len(stock_calls) == 1
+        assert data['parent']['unit_price'] == 25 * 2 * 1.5
+        assert len(data['items']) == 25
+        assert len({i['id'] for i in data['items']}) == 25
+        first, second = data['items'][:2]
+        assert first['quantity'] == 6 and first['stock'] == 1.0
+        assert second['stock'] == 7.0
+
+        children = EstimateItem.query.filter_by(parent_id=data['parent']['id']) \
+            .order_by(EstimateItem.id).all()
+        assert [c.id for c in children] == [i['id'] for i in data['items']]
+        assert [c.name for c in children] == [f'Part {n}' for n in range(25)]
+        est = db.session.get(Estimate, est_id)
+        assert est.total_cost == 3 * 25 * 2 * 1.5
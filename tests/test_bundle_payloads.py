@@ -0,0 +1,111 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import event
+
+from app import create_app, db
+from app.bundles import payloads
+from app.models import Bundle, BundleItem
+
+
+def setup_app():
+    os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+    app = create_app('development')
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite:///:memory:')
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    payloads.clear()
+    return app
+
+
+def test_item_changes_bump_the_bundle_version():
+    app = setup_app()
+    with app.app_context():
+        b = Bundle(name='Kit', description='')
+        db.session.add(b)
+        db.session.commit()
+        seen = [b.version]
+        item = BundleItem(bundle=b, product_name='Widget', quantity=1,
+                          unit_price=1.0, retail=2.0)
+        db.session.add(item)
+        db.session.commit()
+        seen.append(b.version)
+        item.unit_price = 3.0
+        db.session.commit()
+        seen.append(b.version)
+        b.description = 'Starter kit'
+        db.session.commit()
+        seen.append(b.version)
+        db.session.delete(item)
+        db.session.commit()
+        seen.append(b.version)
+        assert seen == sorted(set(seen))
+
+
+def test_recreated_bundle_never_reuses_a_cached_version():
+    app = setup_app()
+    client = app.test_client()
+    with app.app_context():
+        old = Bundle(name='Old kit', description='')
+        db.session.add_all([old, BundleItem(bundle=old, product_name='Widget', quantity=1,
+                                            unit_price=1.0, retail=2.0)])
+        db.session.commit()
+        old_id, old_version = old.id, old.version
+        stale = client.get(f'/estimates/bundles/{old_id}/clone')
+        assert stale.get_json()['items'][0]['name'] == 'Widget'
+        client.get('/estimates/bundles/search?q=kit')
+        client.post(f'/bundles/{old_id}/delete')
+        assert all(key[0] != old_id for key in payloads._cache)
+
+        # SQLite hands the freed id to the next bundle
+        new = Bundle(name='New kit', description='')
+        db.session.add_all([new, BundleItem(bundle=new, product_name='Gadget', quantity=1,
+                                            unit_price=4.0, retail=8.0)])
+        db.session.commit()
+        assert new.id == old_id and new.version != old_version
+
+        assert client.get(f'/estimates/bundles/{new.id}/clone') \
+            .get_json()['items'][0]['name'] == 'Gadget'
+        assert client.get('/estimates/bundles/search?q=kit').get_json()['bundles'][0]['name'] \
+            == 'New kit'
+
+
+def test_clone_and_search_serve_cached_payloads():
+    app = setup_app()
+    with app.app_context():
+        b = Bundle(name='Kit', description='')
+        db.session.add_all([b] + [BundleItem(bundle=b, product_name=f'P{n}', quantity=2,
+                                             unit_price=1.0, retail=2.0) for n in range(3)])
+        db.session.commit()
+        bundle_id, first_item = b.id, b.items[0]
+        client = app.test_client()
+
+        loaded = []
+
+        def on_load(target, context):
+            loaded.append(target)
+
+        event.listen(Bundle, 'load', on_load)
+        event.listen(BundleItem, 'load', on_load)
+        try:
+            resp = client.get(f'/estimates/bundles/{bundle_id}/clone?qty=3')
+            items = resp.get_json()['items']
+            assert [it['quantity'] for it in items] == [6, 6, 6]
+            assert client.get('/estimates/bundles/search?q=kit').get_json()['bundles'][0]['cost'] == 3.0
+            assert client.get('/estimates/bundles/999/clone').status_code == 404
+        finally:
+            event.remove(Bundle, 'load', on_load)
+            event.remove(BundleItem, 'load', on_load)
+        assert loaded == []  # served from column rows, no ORM objects
+        assert len(payloads._cache) == 1
+
+        # an edit moves the bundle to a new version, so the old payload is ignored
+        first_item.unit_price = 5.0
+        db.session.commit()
+        data = client.get('/bundles/search-bundles?q=kit').get_json()
+        assert data['bundles'][0]['cost'] == 7.0
+        items = client.get(f'/estimates/bundles/{bundle_id}/clone').get_json()['items']
+        assert sorted(it['unit_price'] for it in items) == [1.0, 1.0, 5.0]
@@ -4,6 +4,7 @@ import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from app import create_app, db
+from app.api import repairshopr as rs_api
 from app.models import Bundle, BundleItem
 
 
@@ -26,11 +27,11 @@ def test_refresh_bundle_updates_cost(monkeypatch):
         db.session.add_all([b, item])
         db.session.commit()
 
-        def fake_search_products(q, page=1):
+        def fake_search_products(q):
             return [{'id': 1, 'name': 'Widget', 'description': '',
-                     'cost': 7.5, 'retail': 10.0, 'stock': 3, 'type': 'product'}]
+                     'price_cost': 7.5, 'price_retail': 10.0, 'quantity': 3}]
 
-        monkeypatch.setattr('app.bundles.routes.search_products', fake_search_products)
+        monkeypatch.setattr(rs_api, 'search_products', fake_search_products)
 
         client = app.test_client()
         resp = client.post(f'/bundles/{b.id}/refresh')
@@ -0,0 +1,91 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db, inventory
+from app.bundles import payloads
+from app.models import Bundle, BundleItem, RSProduct
+
+
+def setup_app():
+    os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+    app = create_app('development')
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite:///:memory:')
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    payloads.clear()
+    inventory.result_cache.clear()
+    return app
+
+
+def test_bundle_endpoints_revalidate_by_version(monkeypatch):
+    app = setup_app()
+    with app.app_context():
+        b = Bundle(name='Kit', description='')
+        item = BundleItem(bundle=b, product_name='Widget', quantity=1,
+                          unit_price=1.0, retail=2.0)
+        db.session.add_all([b, item])
+        db.session.commit()
+        client = app.test_client()
+
+        for url in ('/bundles/search-bundles?q=kit', '/estimates/bundles/search?q=kit',
+                    f'/estimates/bundles/{b.id}/clone?qty=2'):
+            first = client.get(url)
+            assert first.status_code == 200 and first.headers['ETag']
+            assert first.headers['Cache-Control'] == 'private, no-cache'
+
+            def fail(heads):
+                raise AssertionError('matched ETag must not build a body')
+
+            monkeypatch.setattr(payloads, 'payloads', fail)
+            again = client.get(url, headers={'If-None-Match': first.headers['ETag']})
+            monkeypatch.undo()
+            assert again.status_code == 304 and again.data == b''
+
+            item.unit_price += 1
+            db.session.commit()
+            changed = client.get(url, headers={'If-None-Match': first.headers['ETag']})
+            assert changed.status_code == 200
+            assert changed.headers['ETag'] != first.headers['ETag']
+
+
+def test_product_search_etag_is_content_hash():
+    app = setup_app()
+    with app.app_context():
+        db.session.add(RSProduct(id=1, name='Widget', price_cost=1.0, quantity=3))
+        db.session.commit()
+        client = app.test_client()
+        for url in ('/estimates/search?q=widget', '/bundles/search?q=widget'):
+            first = client.get(url)
+            assert first.get_json()['products'][0]['name'] == 'Widget'
+            again = client.get(url, headers={'If-None-Match': first.headers['ETag']})
+            assert again.status_code == 304
+
+
+def test_recreated_bundle_does_not_match_a_deleted_bundles_etag():
+    app = setup_app()
+    client = app.test_client()
+    with app.app_context():
+        old = Bundle(name='Kit', description='')
+        db.session.add_all([old, BundleItem(bundle=old, product_name='Widget', quantity=1,
+                                            unit_price=1.0, retail=2.0)])
+        db.session.commit()
+        bundle_id = old.id
+        urls = ('/bundles/search-bundles?q=kit', '/estimates/bundles/search?q=kit',
+                f'/estimates/bundles/{bundle_id}/clone?qty=1')
+        tags = {url: client.get(url).headers['ETag'] for url in urls}
+        client.post(f'/bundles/{bundle_id}/delete')
+
+        new = Bundle(name='Kit', description='')
+        db.session.add_all([new, BundleItem(bundle=new, product_name='Gadget', quantity=1,
+                                            unit_price=4.0, retail=8.0)])
+        db.session.commit()
+        assert new.id == bundle_id
+
+        for url in urls:
+            resp = client.get(url, headers={'If-None-Match': tags[url]})
+            assert resp.status_code == 200, url
+            assert resp.headers['ETag'] != tags[url]
+        assert 'Gadget' in client.get(urls[2]).get_data(as_text=True)
@@ -0,0 +1,73 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from app.api import repairshopr as rs_api
+from app.api.cache import SearchCache
+from app.inventory import customers
+from app.models import RSCustomer
+
+
+def setup_app():
+    os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+    app = create_app('development')
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite:///:memory:')
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return app
+
+
+def test_customer_index_matches_names_emails_and_phones():
+    app = setup_app()
+    with app.app_context():
+        db.session.add_all([
+            RSCustomer(id=1, firstname='Jane', lastname='Doe', email='jane@example.com',
+                       phone='(555) 123-4567', address='1 Main St', city='Springfield'),
+            RSCustomer(id=2, fullname='Bob Smith', business_name='Acme Repairs',
+                       mobile='555.987.6543'),
+        ])
+        db.session.commit()
+
+        assert [c['id'] for c in customers.search('jan do')] == [1]
+        assert [c['id'] for c in customers.search('acme')] == [2]
+        assert [c['id'] for c in customers.search('jane@example')] == [1]
+        assert [c['id'] for c in customers.search('555-123')] == [1]
+        assert [c['id'] for c in customers.search('5559876')] == [2]
+        assert customers.search('nobody') == []
+
+        jane = customers.search('jane')[0]
+        assert jane == {'id': 1, 'name': 'Jane Doe',
+                        'address': '1 Main St, Springfield',
+                        'email': 'jane@example.com'}
+
+        c = db.session.get(RSCustomer, 2)
+        c.mobile = '555-000-1111'
+        db.session.commit()
+        assert customers.search('5559876') == []
+        assert [r['id'] for r in customers.search('5550001')] == [2]
+
+
+def test_search_route_falls_back_to_cached_api(monkeypatch):
+    app = setup_app()
+    monkeypatch.setattr(rs_api, 'customer_cache', SearchCache(maxsize=8, ttl=60))
+    calls = []
+
+    def fake_request(method, path, **kw):
+        calls.append((path, kw.get('params')))
+        return {'customers': [{'id': 7, 'first_name': 'Remote', 'last_name': 'Only',
+                               'email': 'r@example.com'}]}
+
+    monkeypatch.setattr(rs_api, '_request', fake_request)
+    client = app.test_client()
+    for q in ('Remote', '  remote '):
+        resp = client.get('/estimates/search-customer', query_string={'q': q})
+        assert resp.get_json()['customers'][0]['name'] == 'Remote Only'
+    assert len(calls) == 1
+
+    rs_api.invalidate_customers()
+    client.get('/estimates/search-customer', query_string={'q': 'remote'})
+    assert len(calls) == 2
+
@@ -0,0 +1,101 @@
+import csv
+import io
+import json
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import event
+
+from app import create_app, db
+from app.estimates import export
+from app.models import Estimate, EstimateItem
+
+
+def setup_app():
+    os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+    app = create_app('development')
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite:///:memory:')
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        estimates = [
+            Estimate(customer_name='Ann', status='approved', created_at=datetime(2026, 8, 30)),
+            Estimate(customer_name='Bob', status='approved', created_at=datetime(2026, 9, 2)),
+            Estimate(customer_name='Cy', status='draft', created_at=datetime(2026, 9, 5)),
+        ]
+        db.session.add_all(estimates)
+        db.session.flush()
+        for est, count in zip(estimates, (2, 3, 0), strict=True):
+            db.session.add_all([
+                EstimateItem(estimate_id=est.id, type='product', object_id=n, name=f'Part {n}',
+                             quantity=1, unit_price=float(n), retail=2.0 * n)
+                for n in range(1, count + 1)
+            ])
+        db.session.commit()
+    return app
+
+
+def test_csv_export_streams_one_row_per_line():
+    app = setup_app()
+    client = app.test_client()
+    resp = client.get('/estimates/export?format=csv')
+    assert resp.status_code == 200 and resp.is_streamed
+    assert resp.mimetype == 'text/csv'
+    rows = list(csv.DictReader(io.StringIO(resp.get_data(as_text=True))))
+    assert [(r['estimate_customer_name'], r['item_name']) for r in rows] == [
+        ('Ann', 'Part 1'), ('Ann', 'Part 2'),
+        ('Bob', 'Part 1'), ('Bob', 'Part 2'), ('Bob', 'Part 3'),
+        ('Cy', ''),
+    ]
+    assert rows[4]['estimate_total_retail'] == '12.0'
+
+
+def test_jsonl_export_filters_and_groups_across_chunks(monkeypatch):
+    app = setup_app()
+    monkeypatch.setattr(export, 'CHUNK_SIZE', 2)  # Bob's lines span two chunks
+    client = app.test_client()
+    resp = client.get('/estimates/export?format=jsonl&status=approved&since=2026-09-01')
+    lines = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+    assert [e['customer_name'] for e in lines] == ['Bob']
+    assert [i['name'] for i in lines[0]['items']] == ['Part 1', 'Part 2', 'Part 3']
+    assert lines[0]['created_at'] == '2026-09-02T00:00:00'
+
+    resp = client.get('/estimates/export?format=jsonl&until=2026-09-05')
+    assert [json.loads(line)['customer_name']
+            for line in resp.get_data(as_text=True).splitlines()] == ['Ann', 'Bob']
+
+    assert client.get('/estimates/export?since=yesterday').status_code == 400
+    assert client.get('/estimates/export?format=xml').status_code == 400
+
+
+def test_export_is_one_query_read_in_chunks(monkeypatch):
+    app = setup_app()
+    monkeypatch.setattr(export, 'CHUNK_SIZE', 2)
+    with app.app_context():
+        statements = []
+
+        def listener(*args):
+            statements.append(args[2])
+
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            chunks = list(export.export_chunks('csv'))
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+    assert len(statements) == 1
+    assert len(chunks) == 3  # header + rows 1-2, rows 3-4, rows 5-6
+
+
+def test_cli_writes_export_file(tmp_path):
+    app = setup_app()
+    out = tmp_path / 'drafts.csv'
+    with app.app_context():
+        result = app.test_cli_runner().invoke(
+            args=['estimates', 'export', '--status', 'draft', '-o', str(out)])
+    assert result.exit_code == 0, result.output
+    rows = list(csv.reader(out.open()))
+    assert rows[0] == export.CSV_HEADER
+    assert [r[2] for r in rows[1:]] == ['Cy']
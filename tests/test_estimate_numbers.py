@@ -0,0 +1,100 @@
+import os
+import sys
+import threading
+from datetime import timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import create_app, db
+from app.api import repairshopr as rs_api
+from app.estimates import numbers, push
+from app.models import Estimate, EstimateItem, utcnow
+
+
+def setup_app(uri='sqlite:///:memory:'):
+    os.environ['DATABASE_URL'] = uri
+    app = create_app('development')
+    app.config.update(SQLALCHEMY_DATABASE_URI=uri, PUSH_WORKERS=0)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return app
+
+
+def count_last_calls(monkeypatch, number='100'):
+    calls = []
+    monkeypatch.setattr(rs_api, 'get_last_estimate',
+                        lambda: calls.append(1) or {'number': number})
+    return calls
+
+
+def test_numbers_seed_once_then_come_from_the_sequence(monkeypatch):
+    app = setup_app()
+    calls = count_last_calls(monkeypatch)
+    with app.app_context():
+        assert [numbers.allocate() for _ in range(3)] == [101, 102, 103]
+        assert len(calls) == 1
+
+        # a scheduled resync never moves the sequence backwards ...
+        later = utcnow() + timedelta(seconds=numbers.RESYNC_INTERVAL + 1)
+        assert numbers.allocate(now=later) == 104
+        assert len(calls) == 2
+        # ... but catches up with estimates created elsewhere
+        count_last_calls(monkeypatch, number='500')
+        assert numbers.resync() == 501
+        assert numbers.allocate() == 501
+
+
+def test_concurrent_allocations_are_unique(monkeypatch, tmp_path):
+    app = setup_app(f"sqlite:///{tmp_path / 'seq.db'}")
+    count_last_calls(monkeypatch)
+    with app.app_context():
+        numbers.allocate()
+    got, errors = [], []
+
+    def worker():
+        with app.app_context():
+            try:
+                for _ in range(10):
+                    got.append(numbers.allocate())
+            except SQLAlchemyError as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+    assert sorted(got) == list(range(102, 142))
+
+
+def test_taken_number_resyncs_and_retries(monkeypatch):
+    app = setup_app()
+    count_last_calls(monkeypatch)
+    tried = []
+
+    def create(customer_id, line_items, number=None):
+        tried.append(number)
+        if number == 101:
+            count_last_calls(monkeypatch, number='150')  # someone else took it
+            raise rs_api.EstimateNumberTaken(number)
+        return {'id': 1}
+
+    monkeypatch.setattr(rs_api, 'create_estimate', create)
+    with app.app_context():
+        est = Estimate(customer_id=1, customer_name='Cust', customer_address='')
+        db.session.add(est)
+        db.session.commit()
+        db.session.add(EstimateItem(estimate_id=est.id, type='product', object_id=1,
+                                    name='Widget', quantity=1, unit_price=1, retail=2))
+        db.session.commit()
+        job, _ = push.enqueue(est)
+
+        push.process_next()
+        push.process_next()
+        db.session.refresh(job)
+        assert job.status == 'succeeded'
+        assert tried == [101, 151]
@@ -0,0 +1,104 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import text
+
+from app import create_app, db, schema
+from app.models import Estimate, EstimateItem
+
+
+def setup_app():
+    os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+    app = create_app('development')
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite:///:memory:')
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return app
+
+
+def test_item_routes_keep_totals_current():
+    app = setup_app()
+    client = app.test_client()
+    with app.app_context():
+        est = Estimate(customer_name='Cust', customer_address='')
+        db.session.add(est)
+        db.session.commit()
+        est_id = est.id
+
+    item_id = client.post(f'/estimates/{est_id}/add-item', json={
+        'type': 'product', 'id': 1, 'name': 'Widget', 'quantity': 2,
+        'unit_price': 10.0, 'retail': 15.0}).get_json()['item_id']
+    client.post(f'/estimates/{est_id}/add-item', json={
+        'type': 'product', 'id': 2, 'name': 'Gadget', 'quantity': 1,
+        'unit_price': 5.0, 'retail': 8.0})
+    with app.app_context():
+        est = db.session.get(Estimate, est_id)
+        assert (est.total_cost, est.total_retail, est.profit) == (25.0, 38.0, 13.0)
+
+    client.post(f'/estimates/{est_id}/update-item/{item_id}', json={'quantity': 3})
+    with app.app_context():
+        assert db.session.get(Estimate, est_id).total_cost == 35.0
+
+    client.post(f'/estimates/{est_id}/remove-item/{item_id}')
+    with app.app_context():
+        est = db.session.get(Estimate, est_id)
+        assert (est.total_cost, est.total_retail) == (5.0, 8.0)
+
+
+def test_sort_and_filter_by_stored_totals():
+    app = setup_app()
+    with app.app_context():
+        for n, price in enumerate((30.0, 10.0, 20.0)):
+            est = Estimate(customer_name=f'C{n}', customer_address='')
+            db.session.add(est)
+            db.session.flush()
+            db.session.add(EstimateItem(estimate_id=est.id, type='product', object_id=1,
+                                        name='X', quantity=1, unit_price=price,
+                                        retail=price * 2))
+        db.session.commit()
+        by_value = Estimate.query.order_by(Estimate.total_retail.desc()).all()
+        assert [e.total_cost for e in by_value] == [30.0, 20.0, 10.0]
+        assert Estimate.query.filter(Estimate.profit > 15).count() == 2
+
+
+def test_recompute_command_repairs_drift():
+    app = setup_app()
+    with app.app_context():
+        est = Estimate(customer_name='Cust', customer_address='')
+        db.session.add(est)
+        db.session.flush()
+        db.session.add(EstimateItem(estimate_id=est.id, type='product', object_id=1,
+                                    name='X', quantity=4, unit_price=2.5, retail=5.0))
+        db.session.commit()
+        db.session.execute(text('UPDATE estimate SET total_cost = 0, total_retail = 0'))
+        db.session.commit()
+
+        result = app.test_cli_runner().invoke(args=['estimates', 'recompute-totals'])
+        assert 'Recomputed totals for 1 estimates' in result.output
+        db.session.expire_all()
+        assert (est.total_cost, est.total_retail) == (10.0, 20.0)
+
+
+def test_schema_upgrade_fills_totals_on_old_schema():
+    app = setup_app()
+    with app.app_context():
+        db.session.execute(text('DROP TABLE estimate_item'))
+        db.session.execute(text('DROP TABLE estimate'))
+        db.session.execute(text(
+            'CREATE TABLE estimate (id INTEGER PRIMARY KEY, customer_id INTEGER, '
+            'customer_name VARCHAR(200) NOT NULL, customer_address VARCHAR(200), '
+            'status VARCHAR(32) NOT NULL)'))
+        db.session.execute(text("INSERT INTO estimate VALUES (1, NULL, 'Old', '', 'draft')"))
+        db.session.commit()
+        EstimateItem.__table__.create(db.engine)
+        db.session.execute(text(
+            "INSERT INTO estimate_item (estimate_id, type, object_id, name, quantity, "
+            "unit_price, retail) VALUES (1, 'product', 1, 'X', 2, 3.0, 4.0)"))
+        db.session.commit()
+
+        schema.upgrade()
+        est = db.session.get(Estimate, 1)
+        assert (est.total_cost, est.total_retail) == (6.0, 8.0)
@@ -0,0 +1,78 @@
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import text
+
+from app import create_app, db
+from app.models import Bundle, Estimate
+
+
+def setup_app():
+    os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+    app = create_app('development')
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite:///:memory:')
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return app
+
+
+def edit_ids(html):
+    return [int(i) for i in re.findall(r'/estimates/(\d+)/edit', html)]
+
+
+def test_estimates_list_pages_by_id_cursor():
+    app = setup_app()
+    with app.app_context():
+        db.session.add_all([
+            Estimate(customer_id=n % 3, customer_name=f'Cust {n % 3}', customer_address='',
+                     status='sent' if n % 2 else 'draft')
+            for n in range(1, 121)
+        ])
+        db.session.commit()
+    client = app.test_client()
+
+    first = client.get('/estimates/?limit=50').get_data(as_text=True)
+    assert edit_ids(first) == list(range(120, 70, -1))
+    assert 'after=71' in first and 'before=' not in first
+
+    second = client.get('/estimates/?limit=50&after=71').get_data(as_text=True)
+    assert edit_ids(second) == list(range(70, 20, -1))
+    back = client.get('/estimates/?limit=50&before=70').get_data(as_text=True)
+    assert edit_ids(back) == edit_ids(first)
+
+    last = client.get('/estimates/?limit=50&after=21').get_data(as_text=True)
+    assert edit_ids(last) == list(range(20, 0, -1))
+    assert 'after=' not in last
+
+    sent = client.get('/estimates/?status=sent&customer=1&limit=5').get_data(as_text=True)
+    assert edit_ids(sent) == [115, 109, 103, 97, 91]
+    assert 'customer=1' in sent and 'status=sent' in sent  # filters survive paging
+    by_name = client.get('/estimates/?customer=Cust 2&limit=3').get_data(as_text=True)
+    assert edit_ids(by_name) == [119, 116, 113]
+
+
+def test_status_filter_uses_index():
+    app = setup_app()
+    with app.app_context():
+        plan = db.session.execute(text(
+            "EXPLAIN QUERY PLAN SELECT * FROM estimate "
+            "WHERE status = 'draft' AND id < 100 ORDER BY id DESC LIMIT 51"
+        )).all()
+        assert 'ix_estimate_status_id' in ' '.join(str(r[-1]) for r in plan)
+
+
+def test_bundles_list_pages_by_name():
+    app = setup_app()
+    with app.app_context():
+        db.session.add_all([Bundle(name=f'Kit {n:03d}') for n in range(30)])
+        db.session.commit()
+    client = app.test_client()
+    page = client.get('/bundles/?limit=20').get_data(as_text=True)
+    assert 'Kit 000' in page and 'Kit 019' in page and 'Kit 020' not in page
+    page = client.get('/bundles/?limit=20&after=Kit+019').get_data(as_text=True)
+    assert 'Kit 020' in page and 'Kit 029' in page and 'Kit 019' not in page
+    assert 'before=Kit+020' in page
@@ -0,0 +1,79 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import event
+
+from app import create_app, db
+from app.api import repairshopr as rs_api
+from app.models import Estimate, EstimateItem, RSProduct
+
+
+def setup_app():
+    os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+    app = create_app('development')
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite:///:memory:')
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return app
+
+
+def test_refresh_dedupes_lookups_and_updates_in_bulk(monkeypatch):
+    app = setup_app()
+    searched = []
+
+    def fake_search(q):
+        searched.append(q)
+        return [{'id': 8, 'name': q, 'price_cost': 3.0, 'price_retail': 6.0, 'quantity': 1}]
+
+    monkeypatch.setattr(rs_api, 'search_products', fake_search)
+    with app.app_context():
+        db.session.add(RSProduct(id=42, name='Widget', price_cost=2.5, quantity=4))
+        est = Estimate(customer_name='Cust', customer_address='')
+        db.session.add(est)
+        db.session.commit()
+        parent = EstimateItem(estimate_id=est.id, type='bundle', object_id=1, name='Kit',
+                              quantity=2, unit_price=17.5, retail=35.0)
+        db.session.add(parent)
+        db.session.flush()
+        # five children share one legacy name, five share one product id
+        for n in range(5):
+            db.session.add(EstimateItem(estimate_id=est.id, type='product', object_id=n,
+                                        name='Cable', quantity=2, unit_price=1.0,
+                                        retail=2.0, parent_id=parent.id))
+            db.session.add(EstimateItem(estimate_id=est.id, type='product', object_id=n,
+                                        product_id=42, name='Widget', quantity=2,
+                                        unit_price=2.5, retail=5.0, parent_id=parent.id))
+        db.session.commit()
+        est_id, parent_id = est.id, parent.id
+
+        updates = []
+
+        def before(conn, cursor, statement, params, context, executemany):
+            if statement.lstrip().upper().startswith('UPDATE'):
+                updates.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', before)
+        try:
+            resp = app.test_client().post(f'/estimates/{est_id}/refresh')
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before)
+
+        assert searched == ['Cable']
+        # one bulk UPDATE of the lines, one for the estimate totals
+        assert len(updates) == 2
+        data = resp.get_json()
+        assert data['changed'] == 6  # five backfilled cables and the parent
+        deltas = {it['id']: it['delta'] for it in data['items']}
+        assert deltas[parent_id] == {'unit_price': 10.0, 'retail': 0.0}
+        assert sorted(d['unit_price'] for i, d in deltas.items() if i != parent_id) \
+            == [0.0] * 5 + [2.0] * 5
+
+        db.session.expire_all()
+        parent = db.session.get(EstimateItem, parent_id)
+        # per-bundle price: 5 * 2 * (3.0 + 2.5) / 2
+        assert parent.unit_price == 27.5
+        assert {ch.product_id for ch in parent.children} == {8, 42}
+        assert db.session.get(Estimate, est_id).total_cost == 55.0
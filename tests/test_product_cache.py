@@ -0,0 +1,127 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.api import repairshopr as rs_api
+from app.api.cache import SearchCache, normalize_query
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_normalize_query():
+    assert normalize_query('  iPhone   12 Screen ') == 'iphone 12 screen'
+    assert normalize_query(None) == ''
+
+
+def test_stale_entry_served_while_refreshing():
+    clock = FakeClock()
+    cache = SearchCache(maxsize=4, ttl=10, stale_ttl=30, timer=clock)
+    cache.set('k', ['old'])
+    assert cache.lookup('k') == (True, ['old'])
+
+    refreshed = threading.Event()
+
+    def refresh():
+        cache.set('k', ['new'])
+        refreshed.set()
+
+    clock.now += 15
+    assert cache.lookup('k', refresh=refresh) == (True, ['old'])
+    assert refreshed.wait(2)
+    assert cache.lookup('k') == (True, ['new'])
+
+    clock.now += 100
+    assert cache.lookup('k') == (False, None)
+    stats = cache.stats()
+    assert stats['hits'] == 2 and stats['stale_hits'] == 1 and stats['misses'] == 1
+
+
+def test_get_products_uses_cache(monkeypatch):
+    monkeypatch.setattr(rs_api, 'product_cache', SearchCache(maxsize=8, ttl=60))
+    calls = []
+
+    def fake_fetch(query):
+        calls.append(query)
+        return [{'id': 1, 'name': 'Widget'}], True
+
+    monkeypatch.setattr(rs_api, '_fetch_products', fake_fetch)
+    assert rs_api.get_products('Widget') == [{'id': 1, 'name': 'Widget'}]
+    assert rs_api.get_products('  widget ') == [{'id': 1, 'name': 'Widget'}]
+    assert calls == ['Widget']
+
+    rs_api.invalidate_products('WIDGET')
+    rs_api.get_products('widget')
+    assert len(calls) == 2
+
+
+def test_incomplete_results_not_cached(monkeypatch):
+    monkeypatch.setattr(rs_api, 'product_cache', SearchCache(maxsize=8, ttl=60))
+    calls = []
+
+    def fake_fetch(query):
+        calls.append(query)
+        return [], False
+
+    monkeypatch.setattr(rs_api, '_fetch_products', fake_fetch)
+    rs_api.get_products('Widget')
+    rs_api.get_products('Widget')
+    assert len(calls) == 2
+    assert rs_api.product_cache_stats()['size'] == 0
+
+
+def test_sqlite_backend_is_shared_between_workers(tmp_path):
+    from app.api.cache import SQLiteBackend
+
+    path = str(tmp_path / 'cache.sqlite')
+    worker_a = SearchCache(ttl=60, backend=SQLiteBackend(path, 'products', 3, 360))
+    worker_b = SearchCache(ttl=60, backend=SQLiteBackend(path, 'products', 3, 360))
+
+    worker_a.set('widget', [{'id': 1}])
+    assert worker_b.lookup('widget') == (True, [{'id': 1}])
+
+    worker_b.clear()
+    assert worker_a.lookup('widget') == (False, None)
+
+    for i in range(5):
+        worker_a.set(f'q{i}', [i])
+    assert worker_b.stats()['size'] == 3
+    assert worker_b.lookup('q0') == (False, None)
+    assert worker_b.lookup('q4') == (True, [4])
+
+    worker_a.invalidate('q4')
+    assert worker_b.lookup('q4') == (False, None)
+
+
+def test_sqlite_backend_namespaces_and_expiry(tmp_path):
+    from app.api.cache import SQLiteBackend
+
+    path = str(tmp_path / 'cache.sqlite')
+    products = SQLiteBackend(path, 'products', 10, 60)
+    customers = SQLiteBackend(path, 'customers', 10, 60)
+    products.set('k', 'p', time.time())
+    customers.set('k', 'c', time.time() - 120)
+    assert products.get('k')[0] == 'p'
+    assert customers.get('k') is None
+    customers.clear()
+    assert products.get('k')[0] == 'p'
+
+
+def test_invalidate_where_on_both_backends(tmp_path):
+    from app.api.cache import SQLiteBackend
+
+    for backend in (None, SQLiteBackend(str(tmp_path / 'cache.sqlite'), 'products', 10, 60)):
+        cache = SearchCache(ttl=60, backend=backend)
+        cache.set('widget', [{'id': 1}])
+        cache.set('cable', [{'id': 2}])
+        assert cache.invalidate_where(lambda key, rows: rows[0]['id'] == 1) == 1
+        assert cache.lookup('widget') == (False, None)
+        assert cache.lookup('cable') == (True, [{'id': 2}])
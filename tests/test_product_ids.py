@@ -0,0 +1,165 @@
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import inspect
+
+from app import create_app, db, schema
+from app.api import repairshopr as rs_api
+from app.config import DevConfig
+from app.models import Bundle, BundleItem, Estimate, EstimateItem, RSProduct
+
+
+def setup_app():
+    os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+    app = create_app('development')
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite:///:memory:')
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return app
+
+
+def no_search(*a, **kw):
+    raise AssertionError('id lookups must not run a name search')
+
+
+def no_name_lookups(names):
+    assert not set(names), 'id lookups must not run a name search'
+    return {}
+
+
+def test_add_bundle_item_keeps_product_id(monkeypatch):
+    app = setup_app()
+    monkeypatch.setattr(rs_api, 'search_products', no_search)
+    with app.app_context():
+        db.session.add(RSProduct(id=42, name='Widget', description='', price_cost=3.0,
+                                 price_retail=6.0, quantity=2))
+        b = Bundle(name='Kit', description='')
+        db.session.add(b)
+        db.session.commit()
+
+        client = app.test_client()
+        resp = client.post(f'/bundles/{b.id}/add-item',
+                           json={'id': '42', 'q': 'wid', 'type': 'product', 'quantity': 2})
+        assert resp.status_code == 200
+        item = db.session.get(BundleItem, resp.get_json()['item_id'])
+        assert item.product_id == 42
+        assert item.unit_price == 3.0
+
+
+def test_refresh_bundle_survives_rename(monkeypatch):
+    app = setup_app()
+    monkeypatch.setattr('app.bundles.routes.lookup_products_by_name', no_name_lookups)
+    with app.app_context():
+        db.session.add(RSProduct(id=42, name='Widget v2', price_cost=8.0, quantity=5))
+        b = Bundle(name='Kit', description='')
+        item = BundleItem(bundle=b, product_id=42, product_name='Widget',
+                          quantity=1, unit_price=5.0, retail=10.0)
+        db.session.add_all([b, item])
+        db.session.commit()
+
+        resp = app.test_client().post(f'/bundles/{b.id}/refresh')
+        assert resp.get_json()['items'] == [{'id': item.id, 'cost': 8.0, 'stock': 5.0,
+                                             'delta': 3.0}]
+        db.session.refresh(item)
+        assert item.unit_price == 8.0
+
+
+def test_refresh_estimate_fetches_unmirrored_ids(monkeypatch):
+    app = setup_app()
+    monkeypatch.setattr('app.estimates.routes.lookup_products_by_name', no_name_lookups)
+    fetched = []
+
+    def fake_get_product(pid):
+        fetched.append(pid)
+        return {'id': pid, 'name': 'Gadget', 'price_cost': 4.25,
+                'price_retail': 9.0, 'quantity': 1}
+
+    monkeypatch.setattr(rs_api, 'get_product', fake_get_product)
+    with app.app_context():
+        est = Estimate(customer_id=None, customer_name='Cust', customer_address='')
+        db.session.add(est)
+        db.session.commit()
+        line = EstimateItem(estimate_id=est.id, type='product', object_id=7, product_id=7,
+                            name='Gadget', quantity=1, unit_price=1.0, retail=2.0)
+        db.session.add(line)
+        db.session.commit()
+
+        resp = app.test_client().post(f'/estimates/{est.id}/refresh')
+        assert resp.status_code == 200
+        assert fetched == [7]
+        db.session.refresh(line)
+        assert line.unit_price == 4.25
+
+
+def test_refresh_backfills_legacy_items(monkeypatch):
+    app = setup_app()
+
+    def fake_search(q):
+        return [{'id': 5, 'name': 'Widget', 'description': '', 'price_cost': 2.0,
+                 'price_retail': 4.0, 'quantity': 1}]
+
+    monkeypatch.setattr(rs_api, 'search_products', fake_search)
+    with app.app_context():
+        est = Estimate(customer_id=None, customer_name='Cust', customer_address='')
+        db.session.add(est)
+        db.session.commit()
+        line = EstimateItem(estimate_id=est.id, type='product', object_id=5,
+                            name='Widget', quantity=1, unit_price=1.0, retail=2.0)
+        db.session.add(line)
+        db.session.commit()
+
+        app.test_client().post(f'/estimates/{est.id}/refresh')
+        db.session.refresh(line)
+        assert line.product_id == 5
+        assert line.unit_price == 2.0
+
+
+def test_schema_upgrade_upgrades_baseline_tables(tmp_path, monkeypatch):
+    db_path = tmp_path / 'legacy.db'
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        CREATE TABLE bundle (id INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL UNIQUE,
+                             description TEXT);
+        CREATE TABLE bundle_item (id INTEGER PRIMARY KEY,
+                                  bundle_id INTEGER NOT NULL REFERENCES bundle(id),
+                                  product_name VARCHAR(200) NOT NULL, description TEXT,
+                                  quantity INTEGER, unit_price FLOAT, retail FLOAT);
+        CREATE TABLE estimate (id INTEGER PRIMARY KEY, customer_id INTEGER,
+                               customer_name VARCHAR(200) NOT NULL,
+                               customer_address VARCHAR(200), status VARCHAR(32) NOT NULL);
+        CREATE TABLE estimate_item (id INTEGER PRIMARY KEY,
+                                    estimate_id INTEGER NOT NULL REFERENCES estimate(id),
+                                    type VARCHAR(32) NOT NULL, object_id INTEGER NOT NULL,
+                                    name VARCHAR(200) NOT NULL, description TEXT,
+                                    quantity INTEGER, unit_price FLOAT, retail FLOAT,
+                                    notes VARCHAR(200),
+                                    parent_id INTEGER REFERENCES estimate_item(id));
+        INSERT INTO bundle VALUES (1, 'Kit', '');
+        INSERT INTO bundle_item VALUES (1, 1, 'Widget', '', 1, 1.0, 2.0);
+        INSERT INTO estimate VALUES (1, NULL, 'Old', '', 'draft');
+        INSERT INTO estimate_item VALUES (1, 1, 'product', 5, 'Widget', '', 2, 1.0, 2.0, '', NULL);
+    """)
+    conn.close()
+    monkeypatch.setattr(DevConfig, 'SQLALCHEMY_DATABASE_URI', f'sqlite:///{db_path}')
+
+    app = create_app('development')
+    with app.app_context():
+        # starting a worker never alters existing tables
+        assert 'estimate_item.product_id' in schema.pending()
+        result = app.test_cli_runner().invoke(args=['schema', 'upgrade'])
+        assert 'estimate_item.product_id' in result.output, result.output
+        assert schema.pending() == []
+        result = app.test_cli_runner().invoke(args=['schema', 'upgrade'])
+        assert 'Schema is up to date' in result.output
+    client = app.test_client()
+    assert client.get('/estimates/1/edit').status_code == 200
+    assert client.get('/bundles/1/edit').status_code == 200
+    with app.app_context():
+        indexes = {i['name'] for t in ('bundle_item', 'estimate_item')
+                   for i in inspect(db.engine).get_indexes(t)}
+        assert {'ix_bundle_item_product_id', 'ix_estimate_item_product_id'} <= indexes
+        assert db.session.get(EstimateItem, 1).product_id is None
@@ -0,0 +1,74 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db, inventory
+from app.api import repairshopr as rs_api
+from app.estimates.utils import search_products
+from app.inventory import index
+from app.models import RSProduct
+
+
+def setup_app():
+    os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+    app = create_app('development')
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite:///:memory:')
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    inventory.result_cache.clear()
+    return app
+
+
+def test_index_tracks_mirror_writes():
+    app = setup_app()
+    with app.app_context():
+        db.session.add_all([
+            RSProduct(id=1, name='iPhone 12 Screen', sku='IP12-SCR',
+                      description='OLED assembly', price_cost=40, price_retail=90, quantity=3),
+            RSProduct(id=2, name='Galaxy S21 Battery', sku='S21-BAT', upc_code='0123456789',
+                      description='', price_cost=10, price_retail=30, quantity=0),
+        ])
+        db.session.commit()
+
+        assert [p['id'] for p in index.search('iphone scr')] == [1]
+        assert [p['id'] for p in index.search('s21-bat')] == [2]
+        assert [p['id'] for p in index.search('01234')] == [2]
+        assert index.search('pixel') == []
+        assert index.search('  ') is None
+
+        p = db.session.get(RSProduct, 1)
+        p.name = 'iPhone 13 Screen'
+        db.session.commit()
+        assert index.search('iphone 12') == []
+        assert [r['id'] for r in index.search('iphone 13')] == [1]
+
+        db.session.delete(p)
+        db.session.commit()
+        assert index.search('iphone') == []
+
+
+def test_blueprint_search_prefers_mirror(monkeypatch):
+    app = setup_app()
+    calls = []
+
+    def fake_api(q):
+        calls.append(q)
+        return [{'id': 9, 'name': 'Remote', 'description': '', 'price_cost': 1.0,
+                 'price_retail': 2.0, 'quantity': 5.0}]
+
+    monkeypatch.setattr(rs_api, 'search_products', fake_api)
+    with app.app_context():
+        db.session.add(RSProduct(id=1, name='Widget', price_cost=2.5,
+                                 price_retail=5.0, quantity=4))
+        db.session.commit()
+
+        local = search_products('widg')
+        assert local[0]['name'] == 'Widget'
+        assert local[0]['unit_price'] == 2.5
+        assert calls == []
+
+        remote = search_products('remote')
+        assert remote[0]['id'] == 9
+        assert calls == ['remote']
@@ -1,15 +1,20 @@
 import os, sys
+import time
+from datetime import timedelta
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from app import create_app, db
+from app.config import DevConfig
 from app.models import Estimate, EstimateItem
 from app.api import repairshopr as rs_api
+from app.estimates import push
+from app.models import PushJob, utcnow
 
 
 def setup_app():
     os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
     app = create_app('development')
-    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite:///:memory:')
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite:///:memory:', PUSH_WORKERS=0)
     with app.app_context():
         db.drop_all()
         db.create_all()
@@ -49,7 +54,150 @@ def test_push_creates_estimate(monkeypatch):
 
         client = app.test_client()
         resp = client.post(f'/estimates/{est.id}/push')
-        assert resp.status_code == 200
+        assert resp.status_code == 202
+        job = resp.get_json()['job']
+        assert job['status'] == 'queued'
+        assert 'args' not in called  # nothing upstream until a worker runs
+
+        assert push.process_next()
         assert called['args'][0] == 1
         assert called['args'][1][0]['name'] == 'Widget'
         assert called['args'][2] == 101
+
+        status = client.get(resp.get_json()['status_url']).get_json()['job']
+        assert status['status'] == 'succeeded'
+        assert status['rs_estimate_id'] == 555
+
+
+def add_estimate():
+    est = Estimate(customer_id=1, customer_name='Cust', customer_address='A')
+    db.session.add(est)
+    db.session.commit()
+    db.session.add(EstimateItem(estimate_id=est.id, type='product', object_id=42,
+                                name='Widget', quantity=1, unit_price=1, retail=2))
+    db.session.commit()
+    return est
+
+
+def test_repeated_push_reuses_job():
+    app = setup_app()
+    with app.app_context():
+        est = add_estimate()
+        client = app.test_client()
+        headers = {'Idempotency-Key': 'abc'}
+        first = client.post(f'/estimates/{est.id}/push', headers=headers).get_json()
+        again = client.post(f'/estimates/{est.id}/push', headers=headers).get_json()
+        other = client.post(f'/estimates/{est.id}/push',
+                            headers={'Idempotency-Key': 'def'}).get_json()
+        assert first['job']['id'] == again['job']['id'] == other['job']['id']
+        assert PushJob.query.count() == 1
+
+
+
+def test_push_again_after_failure_with_same_key(monkeypatch):
+    app = setup_app()
+    monkeypatch.setattr(rs_api, 'get_last_estimate', lambda: {'number': '7'})
+    monkeypatch.setattr(push, 'MAX_ATTEMPTS', 1)
+    with app.app_context():
+        est = add_estimate()
+        client = app.test_client()
+        headers = {'Idempotency-Key': 'abc'}
+        monkeypatch.setattr(rs_api, 'create_estimate', lambda *a, **kw: None)
+        first = client.post(f'/estimates/{est.id}/push', headers=headers).get_json()['job']
+        push.process_next()
+        assert db.session.get(PushJob, first['id']).status == 'failed'
+
+        monkeypatch.setattr(rs_api, 'create_estimate', lambda *a, **kw: {'id': 9})
+        again = client.post(f'/estimates/{est.id}/push', headers=headers).get_json()['job']
+        assert again['id'] != first['id'] and again['status'] == 'queued'
+        # the retry keeps the key, so further clicks still share one job
+        repeat = client.post(f'/estimates/{est.id}/push', headers=headers).get_json()['job']
+        assert repeat['id'] == again['id']
+        push.process_next()
+        assert db.session.get(PushJob, again['id']).status == 'succeeded'
+        assert PushJob.query.count() == 2
+
+def test_concurrent_pushes_without_key_share_one_job(monkeypatch):
+    app = setup_app()
+    with app.app_context():
+        est = add_estimate()
+        first, created = push.enqueue(est)
+        assert created
+        # a second request whose check ran before the first job was inserted
+        real = push._unfinished
+        checks = []
+
+        def racing(estimate_id):
+            checks.append(estimate_id)
+            return None if len(checks) == 1 else real(estimate_id)
+
+        monkeypatch.setattr(push, '_unfinished', racing)
+        job, created = push.enqueue(est)
+        monkeypatch.undo()
+        assert (job.id, created) == (first.id, False)
+        assert PushJob.query.count() == 1
+
+        first.status = 'succeeded'
+        db.session.commit()
+        assert push.enqueue(est)[1]  # finished jobs don't block a new push
+
+
+def test_failed_push_retries_with_backoff(monkeypatch):
+    app = setup_app()
+    with app.app_context():
+        est = add_estimate()
+        numbers, calls = [], []
+        monkeypatch.setattr(rs_api, 'get_last_estimate',
+                            lambda: numbers.append(1) or {'number': '7'})
+
+        def flaky_create(customer_id, line_items, number=None):
+            calls.append(number)
+            return None if len(calls) == 1 else {'id': 9}
+
+        monkeypatch.setattr(rs_api, 'create_estimate', flaky_create)
+        job, created = push.enqueue(est)
+        assert created
+
+        push.process_next()
+        db.session.refresh(job)
+        assert job.status == 'retrying'
+        assert job.attempts == 1
+        assert job.next_attempt_at > utcnow()
+        assert not push.process_next()  # not due yet
+
+        push.process_next(now=job.next_attempt_at + timedelta(seconds=1))
+        db.session.refresh(job)
+        assert job.status == 'succeeded'
+        assert job.attempts == 2
+        assert calls == [8, 8]  # the retry reuses the number
+        assert len(numbers) == 1
+
+
+def test_workers_resume_jobs_after_a_restart(monkeypatch, tmp_path):
+    monkeypatch.setattr(DevConfig, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'push.db'}")
+    monkeypatch.setattr(push, '_threads', [])
+    monkeypatch.setattr(rs_api, 'create_estimate', lambda *a, **kw: {'id': 777})
+    app = create_app('development')
+    with app.app_context():
+        est = Estimate(customer_id=1, customer_name='Cust', customer_address='A')
+        db.session.add(est)
+        db.session.commit()
+        job = PushJob(estimate_id=est.id, status='retrying', attempts=1, number=100,
+                      payload={'customer_id': 1, 'line_items': []},
+                      next_attempt_at=utcnow() - timedelta(seconds=1))
+        db.session.add(job)
+        db.session.commit()
+        job_id = job.id
+
+    # a fresh process finds the job at startup; its first request starts
+    # the workers and they pick the job up
+    monkeypatch.setattr(DevConfig, 'PUSH_WORKERS', 1)
+    app = create_app('development')
+    client = app.test_client()
+    deadline = time.monotonic() + 10
+    status = None
+    while status != 'succeeded' and time.monotonic() < deadline:
+        status = client.get(f'/estimates/push-jobs/{job_id}').get_json()['job']['status']
+        time.sleep(0.05)
+    assert status == 'succeeded'
+    assert len(push._threads) == 1
@@ -0,0 +1,124 @@
+import os
+import sys
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import event
+
+from app import create_app, db
+from app.bundles import payloads
+from app.models import Bundle, BundleItem, Estimate, EstimateItem
+
+
+def setup_app():
+    os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+    app = create_app('development')
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite:///:memory:')
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    payloads.clear()
+    return app
+
+
+@contextmanager
+def count_selects():
+    statements = []
+
+    def before(conn, cursor, statement, params, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', before)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before)
+
+
+def add_estimate_with_bundle(children=2):
+    est = Estimate(customer_name='Cust', customer_address='')
+    db.session.add(est)
+    db.session.flush()
+    parent = EstimateItem(estimate_id=est.id, type='bundle', object_id=1, name='Kit',
+                          quantity=1, unit_price=0, retail=0)
+    db.session.add(parent)
+    db.session.flush()
+    for n in range(children):
+        db.session.add(EstimateItem(estimate_id=est.id, type='product', object_id=n,
+                                    product_id=100 + n, name=f'Part {n}', quantity=1,
+                                    unit_price=1, retail=2, parent_id=parent.id))
+    db.session.add(EstimateItem(estimate_id=est.id, type='product', object_id=9,
+                                name='Loose', quantity=2, unit_price=3, retail=5))
+    return est, parent
+
+
+def test_estimate_list_is_constant_queries():
+    app = setup_app()
+    with app.app_context():
+        for _ in range(40):
+            add_estimate_with_bundle()
+        db.session.commit()
+        with count_selects() as selects:
+            resp = app.test_client().get('/estimates/')
+        assert resp.status_code == 200
+        assert len(selects) <= 2
+
+
+def test_estimate_edit_and_refresh_batch_children(monkeypatch):
+    app = setup_app()
+    monkeypatch.setattr('app.estimates.routes.lookup_products', lambda ids: {})
+    monkeypatch.setattr('app.estimates.routes.lookup_products_by_name', lambda names: {})
+    with app.app_context():
+        est = Estimate(customer_name='Cust', customer_address='')
+        db.session.add(est)
+        db.session.commit()
+        for _ in range(10):
+            parent = EstimateItem(estimate_id=est.id, type='bundle', object_id=1,
+                                  name='Kit', quantity=1, unit_price=0, retail=0)
+            db.session.add(parent)
+            db.session.flush()
+            db.session.add_all([
+                EstimateItem(estimate_id=est.id, type='product', object_id=n,
+                             name=f'Part {n}', quantity=1, unit_price=1, retail=2,
+                             parent_id=parent.id)
+                for n in range(3)
+            ])
+        db.session.commit()
+        est_id, child_id = est.id, parent.children[0].id
+        db.session.expire_all()
+
+        client = app.test_client()
+        with count_selects() as selects:
+            assert client.get(f'/estimates/{est_id}/edit').status_code == 200
+        assert len(selects) <= 3
+
+        with count_selects() as selects:
+            client.post(f'/estimates/{est_id}/refresh')
+        assert len(selects) <= 3
+
+        with count_selects() as selects:
+            client.post(f'/estimates/{est_id}/update-item/{child_id}', json={'quantity': 2})
+        assert len(selects) <= 3
+
+
+def test_bundle_search_loads_items_in_one_query():
+    app = setup_app()
+    with app.app_context():
+        for n in range(25):
+            b = Bundle(name=f'Kit {n}')
+            db.session.add(b)
+            db.session.flush()
+            db.session.add_all([BundleItem(bundle_id=b.id, product_name='P', unit_price=1,
+                                           retail=2) for _ in range(3)])
+        db.session.commit()
+        client = app.test_client()
+        with count_selects() as selects:
+            data = client.get('/bundles/search-bundles', query_string={'q': 'kit'}).get_json()
+        assert len(data['bundles']) == 25 and data['bundles'][0]['cost'] == 3.0
+        assert len(selects) <= 2
+        with count_selects() as selects:
+            data = client.get('/estimates/bundles/search', query_string={'q': 'kit'}).get_json()
+        assert len(data['bundles']) == 25
+        assert len(selects) <= 2
@@ -0,0 +1,174 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from requests.exceptions import ConnectionError
+
+from app.api import repairshopr as rs_api
+from app.api.cache import SearchCache
+from app.integrations import repairshopr_export as rs_export
+
+
+class NoLimit:
+    def acquire(self, tokens=1):
+        pass
+
+
+class FakeSession:
+    def __init__(self, handler):
+        self.handler = handler
+        self.calls = []
+
+    def request(self, method, url, params=None, timeout=None, **kw):
+        self.calls.append((method, url, params, timeout))
+        return self.handler(params)
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self._data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._data
+
+
+def test_product_lookups_run_concurrently(monkeypatch):
+    seen = []
+    lock = threading.Lock()
+    payloads = {
+        'name': [{'id': 1, 'name': 'Widget'}, {'id': 2, 'name': 'Widget XL'}],
+        'sku': [{'id': 2, 'name': 'Widget XL'}, {'id': 3, 'name': 'W-1'}],
+    }
+
+    def handler(params):
+        with lock:
+            seen.append(params)
+        time.sleep(0.2)
+        (field,) = params
+        return FakeResponse({'products': payloads[field]})
+
+    monkeypatch.setattr(rs_export, 'bucket', NoLimit())
+    monkeypatch.setattr(rs_api, '_session', lambda: FakeSession(handler))
+    start = time.monotonic()
+    results, complete = rs_api._fetch_products('widget')
+    elapsed = time.monotonic() - start
+
+    assert complete
+    assert [p['id'] for p in results] == [1, 2, 3]
+    assert len(seen) == 2
+    assert elapsed < 0.35
+
+
+def test_failed_lookup_marks_results_incomplete(monkeypatch):
+    def handler(params):
+        if 'sku' in params:
+            raise ConnectionError('down')
+        return FakeResponse({'products': [{'id': 1, 'name': 'Widget'}]})
+
+    monkeypatch.setattr(rs_export, 'bucket', NoLimit())
+    monkeypatch.setattr(rs_api, '_session', lambda: FakeSession(handler))
+    results, complete = rs_api._fetch_products('widget')
+    assert [p['id'] for p in results] == [1]
+    assert not complete
+
+
+def test_sessions_are_per_thread_and_reused():
+    main = rs_api._session()
+    assert rs_api._session() is main
+    other = []
+    t = threading.Thread(target=lambda: other.append(rs_api._session()))
+    t.start()
+    t.join()
+    assert other[0] is not main
+    assert main.headers['Accept'] == 'application/json'
+
+
+def test_requests_use_timeouts_and_shared_limiter(monkeypatch):
+    acquired = []
+
+    class CountingBucket:
+        def acquire(self, tokens=1):
+            acquired.append(tokens)
+
+    session = FakeSession(lambda params: FakeResponse({'customer': {'id': 3}}))
+    monkeypatch.setattr(rs_api, 'customer_cache', SearchCache(maxsize=8, ttl=60))
+    monkeypatch.setattr(rs_export, 'bucket', CountingBucket())
+    monkeypatch.setattr(rs_api, '_session', lambda: session)
+    assert rs_api.get_customer(3) == {'id': 3}
+    assert acquired == [1]
+    method, url, _params, timeout = session.calls[0]
+    assert method == 'GET' and url.endswith('/customers/3')
+    assert timeout == rs_api.TIMEOUT
+
+
+def test_concurrent_identical_requests_are_coalesced(monkeypatch):
+    from app.api.singleflight import SingleFlight
+
+    session = FakeSession(lambda params: (time.sleep(0.2),
+                                          FakeResponse({'product': {'id': 5}}))[1])
+    monkeypatch.setattr(rs_export, 'bucket', NoLimit())
+    monkeypatch.setattr(rs_api, '_session', lambda: session)
+    monkeypatch.setattr(rs_api, '_flight', SingleFlight())
+
+    barrier = threading.Barrier(5)
+    results = []
+
+    def worker():
+        barrier.wait()
+        results.append(rs_api.get_product(5))
+
+    threads = [threading.Thread(target=worker) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results == [{'id': 5}] * 5
+    assert len(session.calls) == 1
+    stats = rs_api.request_stats()
+    assert stats['executed'] == 1 and stats['coalesced'] == 4
+
+
+def test_singleflight_shares_errors():
+    from app.api.singleflight import SingleFlight
+
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    errors = []
+
+    def failing():
+        started.set()
+        release.wait(2)
+        raise ValueError('boom')
+
+    def leader():
+        try:
+            flight.do('k', failing)
+        except ValueError as e:
+            errors.append(e)
+
+    def follower():
+        try:
+            flight.do('k', lambda: 'unused')
+        except ValueError as e:
+            errors.append(e)
+
+    t1 = threading.Thread(target=leader)
+    t1.start()
+    started.wait(2)
+    t2 = threading.Thread(target=follower)
+    t2.start()
+    while flight.stats()['coalesced'] == 0:
+        time.sleep(0.01)
+    release.set()
+    t1.join()
+    t2.join()
+    assert len(errors) == 2
+    assert flight.stats()['in_flight'] == 0
@@ -0,0 +1,147 @@
+import os
+import sys
+from datetime import timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db, repairshopr_client
+from app.api import repairshopr as rs_api
+from app.integrations import repairshopr_sync as rs_sync
+from app.inventory import products_by_id, products_by_name
+from app.models import RSCustomer, RSProduct, RSSyncState, utcnow
+
+
+def setup_app():
+    os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+    app = create_app('development')
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite:///:memory:')
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return app
+
+
+def fake_catalogue(monkeypatch, pages):
+    calls = []
+
+    def fetch(page, sort='id ASC'):
+        calls.append((page, sort))
+        return pages[page - 1] if page <= len(pages) else []
+
+    monkeypatch.setattr(repairshopr_client, 'fetch_products_page', fetch)
+    return calls
+
+
+def test_product_sweep_completes_laps(monkeypatch):
+    app = setup_app()
+    pages = [[{'id': 1, 'name': 'A', 'quantity': 2}], [{'id': 2, 'name': 'B', 'quantity': 0}]]
+    calls = fake_catalogue(monkeypatch, pages)
+    monkeypatch.setattr(rs_sync, 'PAGE_SIZE', 1)
+    with app.app_context():
+        assert not rs_sync.mirror_is_current()
+        assert rs_sync.sync_products(pages=2) == 2
+        assert rs_sync.sync_status()['products']['staleness'] is None
+
+        pages[0][0]['quantity'] = 7
+        assert rs_sync.sync_products(pages=2) == 0  # end of catalogue: lap done
+        assert rs_sync.mirror_is_current()
+        assert rs_sync.sync_products(pages=1) == 1
+        assert db.session.get(RSProduct, 1).quantity == 7
+        # the second cycle re-enters at the cursor's page before moving on
+        assert [c[0] for c in calls] == [1, 2, 2, 3, 1]
+        assert all(sort == 'id ASC' for _, sort in calls)
+
+        status = rs_sync.sync_status(now=utcnow() + timedelta(hours=1))
+        assert status['products']['staleness'] >= 3600
+        assert status['products']['records'] == 3
+
+
+def test_sweep_resumes_by_id_when_upstream_rows_shift(monkeypatch):
+    app = setup_app()
+    catalogue = [{'id': i, 'name': f'P{i}', 'quantity': 1} for i in range(1, 10)]
+
+    def fetch(page, sort='id ASC'):
+        return catalogue[(page - 1) * 3:page * 3]
+
+    monkeypatch.setattr(repairshopr_client, 'fetch_products_page', fetch)
+    monkeypatch.setattr(rs_sync, 'PAGE_SIZE', 3)
+    with app.app_context():
+        assert rs_sync.sync_products(pages=2) == 6
+        # deleting upstream rows moves id 7 from page 3 to page 2
+        del catalogue[0:2]
+        catalogue.append({'id': 10, 'name': 'P10', 'quantity': 1})
+        assert rs_sync.sync_products(pages=3) == 4
+        assert db.session.query(RSProduct.id).order_by(RSProduct.id).all() == \
+            [(i,) for i in range(1, 11)]
+        assert rs_sync.sync_status()['products']['staleness'] is not None
+
+
+def test_sweep_budget_keeps_up_with_max_staleness(monkeypatch):
+    app = setup_app()
+    monkeypatch.setattr(rs_sync, 'PAGE_SIZE', 25)
+    with app.app_context():
+        assert rs_sync.sweep_budget() == rs_sync.SWEEP_PAGES
+        db.session.add_all([RSProduct(id=i, name=f'P{i}') for i in range(1, 5001)])
+        db.session.commit()
+        # 201 pages per lap, 7.5 cycles of 60s in half of 900s
+        assert rs_sync.sweep_budget() == 27
+
+
+def test_current_mirror_skips_name_fallback_but_fetches_unmirrored_ids(monkeypatch):
+    app = setup_app()
+    fetched = []
+
+    def fail(q):
+        raise AssertionError('mirror is current; no live name searches expected')
+
+    def get_product(pid):
+        fetched.append(pid)
+        return {'id': pid, 'name': 'New', 'price_cost': 1.0, 'quantity': 2}
+
+    monkeypatch.setattr(rs_api, 'search_products', fail)
+    monkeypatch.setattr(rs_api, 'get_product', get_product)
+    with app.app_context():
+        db.session.add(RSProduct(id=1, name='A', quantity=3))
+        now = utcnow()
+        db.session.add(RSSyncState(stream='products', page=1, records=1,
+                                   last_success_at=now, lap_completed_at=now))
+        db.session.commit()
+        assert set(products_by_name(['A', 'Nope'])) == {'A'}
+        assert set(products_by_id([1, 99])) == {1, 99}
+        assert fetched == [99]
+
+
+def test_customers_use_updated_at_cursor(monkeypatch):
+    app = setup_app()
+    seen = []
+
+    def paginate(path, params=None, start_page=1, tokens=1):
+        seen.append(dict(params))
+        yield 1, [{'id': 5, 'firstname': 'Ann', 'updated_at': '2024-01-02T00:00:00Z'},
+                  {'id': 6, 'firstname': 'Ben', 'updated_at': '2024-01-01T00:00:00Z'}]
+
+    monkeypatch.setattr(repairshopr_client.client, 'paginate', paginate)
+    with app.app_context():
+        assert rs_sync.sync_customers() == 2
+        rs_sync.sync_customers()
+        assert 'since_updated_at' not in seen[0]
+        assert seen[1]['since_updated_at'] == '2024-01-02T00:00:00Z'
+        assert db.session.get(RSCustomer, 5).firstname == 'Ann'
+        assert rs_sync.sync_status()['customers']['lag'] < 60
+
+
+def test_failures_are_recorded_and_reported(monkeypatch):
+    app = setup_app()
+
+    def boom(page, sort='id ASC'):
+        raise RuntimeError('upstream down')
+
+    monkeypatch.setattr(repairshopr_client, 'fetch_products_page', boom)
+    monkeypatch.setattr(rs_sync, 'sync_customers', lambda: 0)
+    monkeypatch.setattr(rs_sync, 'STREAMS', (('products', rs_sync.sync_products),
+                                             ('customers', rs_sync.sync_customers)))
+    with app.app_context():
+        assert rs_sync.sync_once() == {'products': None, 'customers': 0, 'webhooks': 0}
+        result = app.test_cli_runner().invoke(args=['rs-sync', 'status'])
+        assert 'products: lag never' in result.output
+        assert 'upstream down' in result.output
@@ -0,0 +1,144 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db, inventory
+from app.api import repairshopr as rs_api
+from app.api.cache import SearchCache
+from app.integrations import repairshopr_webhooks as rs_hooks
+from app.models import RSCustomer, RSProduct, RSWebhookEvent
+
+SECRET = 's3cret'
+
+
+def setup_app(monkeypatch):
+    os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+    monkeypatch.setattr(rs_hooks, 'WEBHOOK_SECRET', SECRET)
+    app = create_app('development')
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite:///:memory:')
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    inventory.result_cache.clear()
+    return app
+
+
+def post(client, resource, payload, secret=SECRET):
+    body = json.dumps(payload).encode()
+    return client.post(f'/webhooks/repairshopr/{resource}', data=body,
+                       headers={'X-RS-Signature': rs_hooks.sign(body, secret),
+                                'Content-Type': 'application/json'})
+
+
+def test_rejects_unsigned_and_forged_requests(monkeypatch):
+    app = setup_app(monkeypatch)
+    client = app.test_client()
+    assert client.post('/webhooks/repairshopr/products', json={'id': 1}).status_code == 401
+    assert post(client, 'products', {'id': 1}, secret='wrong').status_code == 401
+    assert post(client, 'tickets', {'id': 1}).status_code == 404
+
+    monkeypatch.setattr(rs_hooks, 'WEBHOOK_SECRET', '')
+    assert post(client, 'products', {'id': 1}, secret='').status_code == 401
+    with app.app_context():
+        assert RSWebhookEvent.query.count() == 0
+
+
+def test_product_event_updates_mirror_and_search(monkeypatch):
+    app = setup_app(monkeypatch)
+    monkeypatch.setattr(rs_api, 'search_products', lambda q: [])
+    client = app.test_client()
+    with app.app_context():
+        db.session.add(RSProduct(id=1, name='Widget', price_cost=1, quantity=1))
+        db.session.commit()
+
+    assert client.get('/estimates/search', query_string={'q': 'widget'}) \
+        .get_json()['products'][0]['stock'] == 1.0
+
+    resp = post(client, 'products', {'action': 'product.updated',
+                                     'attributes': {'id': 1, 'name': 'Widget', 'quantity': 9}})
+    assert resp.status_code == 202 and resp.get_json()['applied']
+    assert client.get('/estimates/search', query_string={'q': 'widget'}) \
+        .get_json()['products'][0]['stock'] == 9.0
+
+    post(client, 'products', {'action': 'deleted', 'attributes': {'id': 1}})
+    assert client.get('/estimates/search', query_string={'q': 'widget'}) \
+        .get_json()['products'] == []
+    with app.app_context():
+        assert db.session.get(RSProduct, 1) is None
+        assert RSWebhookEvent.query.filter(RSWebhookEvent.processed_at.is_(None)).count() == 0
+
+
+def test_customer_event_drops_customer_cache(monkeypatch):
+    app = setup_app(monkeypatch)
+    cache = SearchCache(maxsize=8, ttl=60)
+    cache.set('id:5', {'id': 5, 'firstname': 'Old'})
+    monkeypatch.setattr(rs_api, 'customer_cache', cache)
+    post(app.test_client(), 'customers', {'customer': {'id': 5, 'firstname': 'Ann'}})
+    assert cache.lookup('id:5') == (False, None)
+    with app.app_context():
+        assert db.session.get(RSCustomer, 5).firstname == 'Ann'
+
+
+def test_failed_events_stay_queued_and_replay(monkeypatch, tmp_path):
+    app = setup_app(monkeypatch)
+    calls = []
+    real = rs_hooks.upsert_records
+
+    def flaky(model_cls, items):
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError('locked')
+        return real(model_cls, items)
+
+    monkeypatch.setattr(rs_hooks, 'upsert_records', flaky)
+    resp = post(app.test_client(), 'products', {'attributes': {'id': 3, 'name': 'Cable'}})
+    assert resp.status_code == 202 and not resp.get_json()['applied']
+    with app.app_context():
+        assert rs_hooks.process_pending() == 1
+        assert db.session.get(RSProduct, 3).name == 'Cable'
+
+    recorded = tmp_path / 'events.jsonl'
+    recorded.write_text(
+        json.dumps({'resource': 'products', 'payload': {'attributes': {'id': 4, 'name': 'Case'}}})
+        + '\n\n'
+        + json.dumps({'resource': 'customers', 'payload': {'id': 8, 'firstname': 'Cy'}})
+        + '\n'
+    )
+    with app.app_context():
+        result = app.test_cli_runner().invoke(args=['rs-webhook', 'replay', str(recorded)])
+        assert 'Applied 2 events' in result.output
+        assert db.session.get(RSProduct, 4).name == 'Case'
+        assert db.session.get(RSCustomer, 8).firstname == 'Cy'
+
+
+def test_events_only_evict_affected_cache_entries(monkeypatch):
+    app = setup_app(monkeypatch)
+    products = SearchCache(maxsize=16, ttl=60)
+    customers = SearchCache(maxsize=16, ttl=60)
+    monkeypatch.setattr(rs_api, 'product_cache', products)
+    monkeypatch.setattr(rs_api, 'customer_cache', customers)
+    with app.app_context():
+        db.session.add(RSProduct(id=1, name='Widget Blue', sku='WB-1', quantity=1))
+        db.session.commit()
+    for cache in (products, inventory.result_cache):
+        cache.set('widget', [{'id': 1, 'name': 'Widget Blue'}])
+        cache.set('gizmo', [])
+        cache.set('cable', [{'id': 2, 'name': 'Cable'}])
+    customers.set('search:ann', [])
+    customers.set('search:bob', [{'id': 6, 'firstname': 'Bob'}])
+    customers.set('id:5', {'id': 5})
+    customers.set('id:6', {'id': 6})
+
+    client = app.test_client()
+    post(client, 'products', {'attributes': {'id': 1, 'name': 'Gizmo Red', 'sku': 'GR-1'}})
+    for cache in (products, inventory.result_cache):
+        assert cache.lookup('widget') == (False, None)  # listed the old record
+        assert cache.lookup('gizmo') == (False, None)   # matches the new name
+        assert cache.lookup('cable')[0]
+
+    post(client, 'customers', {'customer': {'id': 5, 'firstname': 'Ann'}})
+    assert customers.lookup('search:ann') == (False, None)
+    assert customers.lookup('id:5') == (False, None)
+    assert customers.lookup('search:bob')[0] and customers.lookup('id:6')[0]
@@ -0,0 +1,110 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db, inventory
+from app.api import repairshopr as rs_api
+from app.inventory import index
+from app.models import RSProduct
+
+
+def setup_app():
+    os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+    app = create_app('development')
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite:///:memory:')
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    inventory.result_cache.clear()
+    return app
+
+
+def test_pages_are_stable_slices_of_one_search(monkeypatch):
+    app = setup_app()
+    calls = []
+    real_search = index.search
+
+    def counting_search(query, limit=50):
+        calls.append(query)
+        return real_search(query, limit=limit)
+
+    monkeypatch.setattr(index, 'search', counting_search)
+    with app.app_context():
+        db.session.add_all([
+            RSProduct(id=i, name=f'Cable {i:02d}', description='d' * 300,
+                      price_cost=1, price_retail=2, quantity=i)
+            for i in range(1, 61)
+        ])
+        db.session.commit()
+
+    client = app.test_client()
+    seen = []
+    page = 1
+    while True:
+        data = client.get('/bundles/search',
+                          query_string={'q': 'cable', 'page': page}).get_json()
+        assert len(data['products']) <= inventory.PAGE_SIZE
+        seen.extend(p['id'] for p in data['products'])
+        if not data['has_more']:
+            break
+        page += 1
+
+    assert page == 3
+    assert sorted(seen) == list(range(1, 61)) and len(set(seen)) == 60
+    assert calls == ['cable']
+    assert all(len(p['description']) <= 101 for p in
+               client.get('/bundles/search', query_string={'q': 'cable'}).get_json()['products'])
+
+
+def test_limit_and_field_projection():
+    app = setup_app()
+    with app.app_context():
+        db.session.add_all([RSProduct(id=i, name=f'Case {i}') for i in range(1, 8)])
+        db.session.commit()
+
+    client = app.test_client()
+    data = client.get('/estimates/search', query_string={
+        'q': 'case', 'limit': 5, 'fields': 'id,name,bogus'}).get_json()
+    assert len(data['products']) == 5 and data['has_more']
+    assert set(data['products'][0]) == {'id', 'name'}
+
+    data = client.get('/estimates/search', query_string={
+        'q': 'case', 'page': 2, 'limit': 5}).get_json()
+    assert len(data['products']) == 2 and not data['has_more']
+    assert 'unit_price' in data['products'][0]
+
+    data = client.get('/estimates/search', query_string={'q': 'case', 'limit': 10000})
+    assert len(data.get_json()['products']) == 7
+
+
+def test_api_results_are_paged_from_cache(monkeypatch):
+    app = setup_app()
+    calls = []
+
+    def fake_api(q):
+        calls.append(q)
+        return [{'id': i, 'name': f'Remote {i}', 'description': '', 'price_cost': 1.0,
+                 'price_retail': 2.0, 'quantity': 1.0} for i in range(30)]
+
+    monkeypatch.setattr(rs_api, 'search_products', fake_api)
+    client = app.test_client()
+    first = client.get('/estimates/search', query_string={'q': 'remote'}).get_json()
+    second = client.get('/estimates/search', query_string={'q': 'Remote ', 'page': 2}).get_json()
+    assert [p['id'] for p in first['products']] == list(range(25))
+    assert [p['id'] for p in second['products']] == list(range(25, 30))
+    assert calls == ['remote']
+
+
+def test_page_numbers_below_one_are_clamped(monkeypatch):
+    app = setup_app()
+    monkeypatch.setattr(rs_api, 'search_products', lambda q: [])
+    with app.app_context():
+        db.session.add(RSProduct(id=1, name='Cable', price_cost=1, price_retail=2, quantity=1))
+        db.session.commit()
+    client = app.test_client()
+    for url in ('/bundles/search', '/estimates/search'):
+        for page in ('0', '-3'):
+            data = client.get(url, query_string={'q': 'cable', 'page': page}).get_json()
+            assert data['page'] == 1
+            assert [p['id'] for p in data['products']] == [1]
@@ -0,0 +1,83 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from app.api import repairshopr as rs_api
+from app.models import Bundle, BundleItem, Estimate, EstimateItem, RSProduct
+
+
+def setup_app():
+    os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+    app = create_app('development')
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite:///:memory:')
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return app
+
+
+def test_stock_endpoint_uses_mirror_then_api(monkeypatch):
+    app = setup_app()
+    calls = []
+
+    def fake_search(q):
+        calls.append(q)
+        return [{'id': 7, 'name': 'Gadget', 'description': '', 'price_cost': 1.0,
+                 'price_retail': 2.0, 'quantity': 4.0}]
+
+    monkeypatch.setattr(rs_api, 'search_products', fake_search)
+    with app.app_context():
+        db.session.add(RSProduct(id=1, name='Widget', quantity=3))
+        db.session.commit()
+
+        client = app.test_client()
+        resp = client.post('/estimates/stock',
+                           json={'names': ['Widget', 'Gadget', 'Widget', 'Nope'],
+                                 'ids': [1, 99]})
+        data = resp.get_json()
+        assert data['names'] == {'Widget': 3.0, 'Gadget': 4.0, 'Nope': 0.0}
+        assert data['ids'] == {'1': 3.0, '99': 0.0}
+        assert sorted(calls) == ['Gadget', 'Nope']
+
+
+def test_edit_pages_render_without_stock_lookups(monkeypatch):
+    app = setup_app()
+
+    def fail(*a, **kw):
+        raise AssertionError('edit page must not search products')
+
+    monkeypatch.setattr(rs_api, 'search_products', fail)
+    monkeypatch.setattr('app.bundles.routes.lookup_products_by_name', fail)
+    with app.app_context():
+        b = Bundle(name='Kit', description='')
+        db.session.add_all([b, BundleItem(bundle=b, product_name='Widget', quantity=1,
+                                          unit_price=1.0, retail=2.0)])
+        est = Estimate(customer_id=None, customer_name='Cust', customer_address='')
+        db.session.add(est)
+        db.session.commit()
+        db.session.add(EstimateItem(estimate_id=est.id, type='product', object_id=1,
+                                    name='Widget', quantity=1, unit_price=1.0, retail=2.0))
+        db.session.commit()
+
+        client = app.test_client()
+        assert client.get(f'/bundles/{b.id}/edit').status_code == 200
+        page = client.get(f'/estimates/{est.id}/edit')
+        assert page.status_code == 200
+        assert b'data-stock-name="Widget"' in page.data
+
+
+def test_stock_endpoint_rejects_malformed_input(monkeypatch):
+    app = setup_app()
+    monkeypatch.setattr(rs_api, 'get_product', lambda pid: None)
+    client = app.test_client()
+    for url in ('/estimates/stock', '/bundles/stock'):
+        for body in ({'ids': ['abc']}, {'ids': [1.5]}, {'ids': 'abc'},
+                     {'names': [{'a': 1}]}, {'names': [['Widget']]}, {'names': 'Widget'},
+                     ['Widget']):
+            resp = client.post(url, json=body)
+            assert resp.status_code == 400, (url, body)
+            assert resp.get_json()['error']
+        ok = client.post(url, json={'names': [], 'ids': ['7', '']})
+        assert ok.status_code == 200 and ok.get_json()['ids'] == {'7': 0.0}
@@ -0,0 +1,125 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import event, text
+
+from app import create_app, db, inventory
+from app.api import repairshopr as rs_api
+from app.inventory import typeahead
+from app.inventory.typeahead import TypeaheadIndex
+from app.models import RSProduct
+
+
+def setup_app():
+    os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+    app = create_app('development')
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite:///:memory:', TYPEAHEAD_ENABLED=True)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    inventory.result_cache.clear()
+    return app
+
+
+ROWS = [
+    (1, 'iPhone 12 Screen', 'IP12-SCR', None, 'OLED assembly', 40, 90, 3),
+    (2, 'Screen Protector iPhone', 'SP-IP', None, 'x' * 150, 1, 5, 10),
+    (3, 'Galaxy S21 Battery', 'S21-BAT', '0123456789', '', 10, 30, 0),
+]
+
+
+def test_prefix_search_and_ranking():
+    idx = TypeaheadIndex(ROWS)
+    assert [p['id'] for p in idx.search('iph')] == [1, 2]
+    assert [p['id'] for p in idx.search('scr')] == [2, 1]
+    assert [p['id'] for p in idx.search('iphone scr')] == [1, 2]
+    assert [p['id'] for p in idx.search('01234')] == [3]
+    assert [p['id'] for p in idx.search('s21-b')] == [3]
+    assert idx.search('pixel') == []
+    assert idx.search('  ') is None
+
+    row = idx.search('protector')[0]
+    assert row['description'] == 'x' * 100 + '…'
+    assert row['price_retail'] == 5.0 and row['quantity'] == 10.0
+
+    stats = idx.stats()
+    assert stats['products'] == 3 and stats['memory_bytes'] > 0
+
+
+def test_picker_uses_snapshot_and_swaps_on_rebuild(monkeypatch):
+    app = setup_app()
+    monkeypatch.setattr(rs_api, 'search_products', lambda q: [])
+    with app.app_context():
+        db.session.add(RSProduct(id=1, name='iPhone 12 Screen', price_retail=90, quantity=3))
+        db.session.commit()
+        typeahead.rebuild()
+        old = typeahead._index
+
+        resp = app.test_client().get('/estimates/search', query_string={'q': 'iphone'})
+        assert [p['id'] for p in resp.get_json()['products']] == [1]
+
+        # Changes to the mirror stay invisible until the next rebuild swaps in
+        # a new snapshot; the old one is left untouched.
+        db.session.add(RSProduct(id=2, name='iPhone 13 Screen'))
+        db.session.commit()
+        assert [p['id'] for p in typeahead.search('iphone')] == [1]
+        typeahead.rebuild()
+        assert typeahead._index is not old
+        assert [p['id'] for p in typeahead.search('iphone')] == [1, 2]
+        assert len(old) == 1
+
+
+def test_disabled_by_config():
+    app = setup_app()
+    app.config['TYPEAHEAD_ENABLED'] = False
+    with app.app_context():
+        typeahead.rebuild()
+        assert typeahead.search('anything') is None
+
+
+def test_refresh_notices_in_place_edits():
+    app = setup_app()
+    with app.app_context():
+        db.session.add(RSProduct(id=1, name='iPhone 12 Screen', sku='A1', quantity=3))
+        db.session.commit()
+        typeahead.rebuild()
+        old = typeahead._index
+
+        # an unchanged mirror costs one read of the revision row
+        statements = []
+
+        def listener(*args):
+            statements.append(args[2])
+
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            typeahead._refresh_if_changed(app)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        assert typeahead._index is old
+        assert len(statements) == 1 and 'rs_product_revision' in statements[0]
+
+        # columns the snapshot doesn't hold don't count as changes
+        db.session.get(RSProduct, 1).photos = ['a.jpg']
+        db.session.commit()
+    typeahead._refresh_if_changed(app)
+    assert typeahead._index is old
+
+    with app.app_context():
+        db.session.get(RSProduct, 1).name = 'iPhone 13 Screen'
+        db.session.commit()
+    typeahead._refresh_if_changed(app)
+    assert typeahead._index is not old
+    assert [p['name'] for p in typeahead._index.search('iphone 13')] == ['iPhone 13 Screen']
+
+
+def test_revision_moves_with_bulk_sql():
+    app = setup_app()
+    with app.app_context():
+        before = typeahead.revision()
+        db.session.execute(text("INSERT INTO rs_product (id, name) VALUES (5, 'Cable')"))
+        db.session.execute(text("DELETE FROM rs_product WHERE id = 5"))
+        db.session.commit()
+        assert typeahead.revision() == before + 2
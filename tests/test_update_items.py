@@ -0,0 +1,101 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import event
+
+from app import create_app, db
+from app.models import Estimate, EstimateItem
+
+
+def setup_app():
+    os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+    app = create_app('development')
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite:///:memory:')
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return app
+
+
+def add_kit(est, children=30):
+    parent = EstimateItem(estimate_id=est.id, type='bundle', object_id=1,
+                          name='Kit', description='', quantity=1,
+                          unit_price=children * 2.0, retail=children * 3.0)
+    db.session.add(parent)
+    db.session.flush()
+    kids = [EstimateItem(estimate_id=est.id, type='product', object_id=n,
+                         name=f'Part {n}', description='', quantity=1,
+                         unit_price=2.0, retail=3.0, parent_id=parent.id)
+            for n in range(children)]
+    db.session.add_all(kids)
+    db.session.commit()
+    return parent, kids
+
+
+def test_bundle_qty_change_is_one_transaction():
+    app = setup_app()
+    with app.app_context():
+        est = Estimate(customer_name='Test', customer_address='')
+        db.session.add(est)
+        db.session.commit()
+        parent, kids = add_kit(est)
+        edits = [{'id': parent.id, 'quantity': 2}]
+        edits += [{'id': k.id, 'quantity': 2} for k in kids]
+
+        commits = []
+
+        def on_commit(conn):
+            commits.append(conn)
+
+        event.listen(db.engine, 'commit', on_commit)
+        try:
+            resp = app.test_client().post(f'/estimates/{est.id}/update-items',
+                                          json={'items': edits})
+        finally:
+            event.remove(db.engine, 'commit', on_commit)
+        assert resp.status_code == 200
+        assert resp.get_json() == {'success': True, 'updated': 31}
+        assert len(commits) == 1
+
+        db.session.expire_all()
+        parent = db.session.get(EstimateItem, parent.id)
+        assert parent.quantity == 2
+        # per-bundle price stays the same; the estimate total doubles
+        assert parent.unit_price == 60.0
+        assert parent.retail == 90.0
+        assert all(ch.quantity == 2 for ch in parent.children)
+        assert db.session.get(Estimate, est.id).total_cost == 120.0
+
+
+def test_update_items_rejects_foreign_ids():
+    app = setup_app()
+    with app.app_context():
+        est = Estimate(customer_name='A', customer_address='')
+        other = Estimate(customer_name='B', customer_address='')
+        db.session.add_all([est, other])
+        db.session.commit()
+        _, kids = add_kit(other, children=1)
+
+        resp = app.test_client().post(f'/estimates/{est.id}/update-items',
+                                      json={'items': [{'id': kids[0].id, 'quantity': 5}]})
+        assert resp.status_code == 404
+        assert resp.get_json()['missing'] == [kids[0].id]
+        db.session.expire_all()
+        assert db.session.get(EstimateItem, kids[0].id).quantity == 1
+
+
+def test_update_items_rejects_malformed_bodies():
+    app = setup_app()
+    with app.app_context():
+        est = Estimate(customer_name='A', customer_address='')
+        db.session.add(est)
+        db.session.commit()
+        client = app.test_client()
+        url = f'/estimates/{est.id}/update-items'
+        for body in ([{'id': 1}], {'items': {'id': 1}}, {'items': 'x'}, {'items': [1, 2]}):
+            resp = client.post(url, json=body)
+            assert resp.status_code == 400, body
+            assert resp.get_json()['success'] is False
+        assert client.post(url, json={'items': []}).get_json() == {'success': True, 'updated': 0}